@@ -0,0 +1,94 @@
+import argparse
+import json
+import platform
+import sys
+from typing import Callable, Dict, List, Optional
+
+from . import background, batch, compiled_plans, hooks, journal, runners
+
+# Every benchmark returns seconds per operation (lower is better) by name
+SUITES: Dict[str, Callable[[], Dict[str, float]]] = {
+    "runners": runners.run,
+    "compiled_plans": compiled_plans.run,
+    "hooks": hooks.run,
+    "journal": journal.run,
+    "batch": batch.run,
+    "background": background.run,
+}
+
+
+def collect(suites: List[str]) -> Dict[str, float]:
+    results = {}
+    for suite in suites:
+        for name, seconds in SUITES[suite]().items():
+            results[f"{suite}.{name}"] = seconds
+    return results
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[str]:
+    # Names of the benchmarks that got slower than the baseline by more than
+    # `threshold` (0.2 is 20% slower)
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:>44}: {seconds * 1e6:12.3f}us  (new)")
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:>44}: {seconds * 1e6:12.3f}us  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run the talepy benchmarks"
+    )
+    parser.add_argument(
+        "suites", nargs="*", help=f"any of {', '.join(SUITES)} (default: all)"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="a JSON file written by a previous --output")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="fractional slowdown counted as a regression (default 0.2)",
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown benchmark suite(s): {', '.join(sorted(unknown))}")
+
+    results = collect(args.suites or list(SUITES))
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "unit": "seconds",
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed", file=sys.stderr)
+            return 1
+        return 0
+
+    for name, seconds in sorted(results.items()):
+        print(f"{name:>44}: {seconds * 1e6:12.3f}us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
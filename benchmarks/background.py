@@ -0,0 +1,41 @@
+import asyncio
+import timeit
+from typing import Dict
+
+from talepy import compile_transaction
+from talepy.background import BackgroundLoop
+from talepy.steps import Step
+
+NUMBER = 2_000
+REPEAT = 5
+
+
+class AsyncIncrementStep(Step[int, int]):
+    async def execute(self, state):
+        return state + 1
+
+    async def compensate(self, state):
+        pass
+
+
+def _best(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def run() -> Dict[str, float]:
+    # Seconds per saga of one async step called from sync code
+    plan = compile_transaction([AsyncIncrementStep()])
+    with BackgroundLoop() as background:
+        shared = _best(lambda: background.run_transaction(plan, 0))
+    fresh = _best(lambda: asyncio.run(plan.run_async(0)))
+    return {"background_loop": shared, "asyncio_run": fresh}
+
+
+def main():
+    results = run()
+    print(f"background loop: {results['background_loop'] * 1e6:7.2f}us/saga")
+    print(f"asyncio.run:     {results['asyncio_run'] * 1e6:7.2f}us/saga")
+
+
+if __name__ == "__main__":
+    main()
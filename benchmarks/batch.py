@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Dict
+
+from talepy import run_transaction
+from talepy.batch import run_transactions_batch, run_transactions_batch_async
+from talepy.steps import Step
+
+ORDERS = 500
+IO_LATENCY = 0.001
+
+
+class BlockingIoStep(Step):
+    def execute(self, state):
+        time.sleep(IO_LATENCY)
+        return state
+
+    def compensate(self, state):
+        pass
+
+
+class AsyncIoStep(Step):
+    async def execute(self, state):
+        await asyncio.sleep(IO_LATENCY)
+        return state
+
+    async def compensate(self, state):
+        pass
+
+
+def _timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def naive_loop():
+    steps = [BlockingIoStep() for _ in range(4)]
+    for order in range(ORDERS):
+        run_transaction(steps, order)
+
+
+def sync_batch():
+    steps = [BlockingIoStep() for _ in range(4)]
+    for _result in run_transactions_batch(steps, range(ORDERS), max_concurrency=32):
+        pass
+
+
+def async_batch():
+    async def consume():
+        steps = [AsyncIoStep() for _ in range(4)]
+        async for _result in run_transactions_batch_async(
+            steps, range(ORDERS), max_concurrency=100
+        ):
+            pass
+
+    asyncio.run(consume())
+
+
+runners = {
+    "naive loop": naive_loop,
+    "sync batch": sync_batch,
+    "async batch": async_batch,
+}
+
+
+def run() -> Dict[str, float]:
+    # Seconds per saga
+    return {
+        name.replace(" ", "_"): _timed(func) / ORDERS
+        for (name, func) in runners.items()
+    }
+
+
+def main():
+    for name, func in runners.items():
+        elapsed = _timed(func)
+        print(f"{name:>12}: {elapsed:6.3f}s  {ORDERS / elapsed:8.0f} sagas/sec")
+
+
+if __name__ == "__main__":
+    main()
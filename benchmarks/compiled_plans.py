@@ -0,0 +1,60 @@
+import timeit
+from typing import Dict
+
+from talepy import run_transaction, compile_transaction
+from talepy.steps import Step
+
+NUMBER = 20_000
+
+
+class IncrementStep(Step[int, int]):
+    def execute(self, state):
+        return state + 1
+
+    def compensate(self, state):
+        pass
+
+
+def _increment(x):
+    return x + 1
+
+
+def _noop(_x):
+    return None
+
+
+step_kinds = {
+    "class": lambda: [IncrementStep() for _ in range(4)],
+    "lambda": lambda: [_increment for _ in range(4)],
+    "pair": lambda: [(_increment, _noop) for _ in range(4)],
+}
+
+
+def run() -> Dict[str, float]:
+    # Seconds per saga
+    results = {}
+    for name, make_steps in step_kinds.items():
+        steps = make_steps()
+        plan = compile_transaction(steps)
+        uncompiled = timeit.timeit(lambda: run_transaction(steps, 0), number=NUMBER)
+        compiled = timeit.timeit(lambda: plan.run(0), number=NUMBER)
+        results[f"{name}_run_transaction"] = uncompiled / NUMBER
+        results[f"{name}_plan_run"] = compiled / NUMBER
+    return results
+
+
+def main():
+    results = run()
+    for name in step_kinds:
+        uncompiled = results[f"{name}_run_transaction"]
+        compiled = results[f"{name}_plan_run"]
+        saved_per_step = (uncompiled - compiled) / 4
+        print(
+            f"{name:>6}: run_transaction {uncompiled * 1e6:7.2f}us/saga"
+            f"  plan.run {compiled * 1e6:7.2f}us/saga"
+            f"  saved {saved_per_step * 1e6:5.2f}us/step"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import timeit
+from typing import Dict
+
+from talepy import compile_transaction
+from talepy.hooks import add_listener, remove_listener
+from talepy.steps import Step
+
+NUMBER = 50_000
+REPEAT = 5
+
+
+class IncrementStep(Step[int, int]):
+    def execute(self, state):
+        return state + 1
+
+    def compensate(self, state):
+        pass
+
+
+def _ignore(_event):
+    pass
+
+
+def _best(plan) -> float:
+    timings = timeit.repeat(lambda: plan.run(0), number=NUMBER, repeat=REPEAT)
+    return min(timings) / NUMBER
+
+
+def run() -> Dict[str, float]:
+    # Seconds per saga
+    plan = compile_transaction([IncrementStep() for _ in range(4)])
+    quiet = _best(plan)
+    add_listener(_ignore)
+    try:
+        listened = _best(plan)
+    finally:
+        remove_listener(_ignore)
+    quiet_again = _best(plan)
+    return {
+        "no_listeners": quiet,
+        "one_listener": listened,
+        "listener_removed": quiet_again,
+    }
+
+
+def main():
+    results = run()
+    print(f"no listeners:     {results['no_listeners'] * 1e6:6.2f}us/saga")
+    print(f"one listener:     {results['one_listener'] * 1e6:6.2f}us/saga")
+    print(f"listener removed: {results['listener_removed'] * 1e6:6.2f}us/saga")
+
+
+if __name__ == "__main__":
+    main()
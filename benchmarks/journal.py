@@ -0,0 +1,50 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from talepy import compile_transaction
+from talepy.journal import FileJournal, GroupCommitJournal
+
+SAGAS = 2_000
+CONCURRENCY = 32
+
+plan = compile_transaction([lambda x: x + 1 for _ in range(4)], name="benchmark")
+
+
+def _sagas_per_second(journal) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        list(pool.map(lambda i: plan.run(i, journal=journal), range(SAGAS)))
+    return SAGAS / (time.perf_counter() - started)
+
+
+def rates() -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            "journal off": _sagas_per_second(None),
+        }
+
+        with FileJournal(os.path.join(directory, "per_event.log")) as journal:
+            results["fsync per event"] = _sagas_per_second(journal)
+
+        with GroupCommitJournal(
+            FileJournal(os.path.join(directory, "group.log"))
+        ) as journal:
+            results["group commit"] = _sagas_per_second(journal)
+    return results
+
+
+def run() -> Dict[str, float]:
+    # Seconds per saga
+    return {name.replace(" ", "_"): 1 / rate for (name, rate) in rates().items()}
+
+
+def main():
+    for name, rate in rates().items():
+        print(f"{name:>16}: {rate:10.0f} sagas/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import asyncio
+import timeit
+from typing import Callable, Dict
+
+from talepy import run_transaction, run_concurrent_transaction as run_threaded
+from talepy.async_transactions import (
+    run_transaction as run_async_transaction,
+    run_concurrent_transaction,
+)
+from talepy.retries import attempt_retries
+from talepy.steps import Step
+
+NUMBER = 2_000
+REPEAT = 3
+STEPS = 4
+CONCURRENT_SIZES = (10, 100, 1_000, 10_000)
+FAN_OUT = 10
+
+
+class IncrementStep(Step[int, int]):
+    def execute(self, state):
+        return state + 1
+
+    def compensate(self, state):
+        pass
+
+
+class AsyncIncrementStep(Step[int, int]):
+    async def execute(self, state):
+        return state + 1
+
+    async def compensate(self, state):
+        pass
+
+
+class FailingStep(Step[int, int]):
+    def execute(self, state):
+        raise RuntimeError("benchmark failure")
+
+    def compensate(self, state):
+        pass
+
+
+class FlakyStep(Step[int, int]):
+    # Fails every other call so each saga retries exactly once
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, state):
+        self.calls += 1
+        if self.calls % 2:
+            raise RuntimeError("benchmark failure")
+        return state + 1
+
+    def compensate(self, state):
+        pass
+
+
+def _increment(x):
+    return x + 1
+
+
+def _noop(_x):
+    return None
+
+
+def _best(func: Callable[[], object], number: int = NUMBER) -> float:
+    return min(timeit.repeat(func, number=number, repeat=REPEAT)) / number
+
+
+def _best_async(make_coroutine: Callable[[], object], number: int = NUMBER) -> float:
+    async def many():
+        for _ in range(number):
+            await make_coroutine()  # type: ignore
+
+    loop = asyncio.new_event_loop()
+    try:
+        return (
+            min(
+                timeit.repeat(
+                    lambda: loop.run_until_complete(many()), number=1, repeat=REPEAT
+                )
+            )
+            / number
+        )
+    finally:
+        loop.close()
+
+
+def _fails(steps) -> Callable[[], None]:
+    def run_failing():
+        try:
+            run_transaction(steps, 0)
+        except RuntimeError:
+            pass
+
+    return run_failing
+
+
+def sync_steps() -> Dict[str, float]:
+    # Seconds per step
+    kinds = {
+        "class": [IncrementStep() for _ in range(STEPS)],
+        "lambda": [_increment for _ in range(STEPS)],
+        "pair": [(_increment, _noop) for _ in range(STEPS)],
+    }
+    return {
+        f"sync_{name}_per_step": _best(lambda: run_transaction(steps, 0)) / STEPS
+        for (name, steps) in kinds.items()
+    }
+
+
+def async_steps() -> Dict[str, float]:
+    # Seconds per step
+    steps = [AsyncIncrementStep() for _ in range(STEPS)]
+    return {
+        "async_per_step": _best_async(lambda: run_async_transaction(steps, 0)) / STEPS
+    }
+
+
+def concurrent_steps() -> Dict[str, float]:
+    # Seconds per step at each transaction size
+    results = {}
+    for size in CONCURRENT_SIZES:
+        steps = [AsyncIncrementStep() for _ in range(size)]
+        number = max(1, 20_000 // size)
+        elapsed = _best_async(lambda: run_concurrent_transaction(steps, 0), number)
+        results[f"concurrent_{size}_per_step"] = elapsed / size
+    return results
+
+
+def threaded_steps() -> Dict[str, float]:
+    # Seconds per fan out from sync code, on the shared thread pool and with a
+    # new event loop each time
+    steps = [IncrementStep() for _ in range(FAN_OUT)]
+    return {
+        f"threaded_fan_out_{FAN_OUT}": _best(lambda: run_threaded(steps, 0), 500),
+        f"asyncio_run_fan_out_{FAN_OUT}": _best(
+            lambda: asyncio.run(run_concurrent_transaction(steps, 0)), 500
+        ),
+    }
+
+
+def compensation() -> Dict[str, float]:
+    # Seconds per saga that fails after STEPS steps and compensates them
+    steps = [IncrementStep() for _ in range(STEPS)] + [FailingStep()]
+    return {"compensation_per_saga": _best(_fails(steps))}
+
+
+def retries() -> Dict[str, float]:
+    # Seconds per saga where one step fails once and is retried
+    steps = [attempt_retries(FlakyStep(), 1)]
+    return {"retry_per_saga": _best(lambda: run_transaction(steps, 0))}
+
+
+def run() -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    for benchmark in (
+        sync_steps,
+        async_steps,
+        concurrent_steps,
+        threaded_steps,
+        compensation,
+        retries,
+    ):
+        results.update(benchmark())
+    return results
+
+
+def main():
+    for name, seconds in run().items():
+        print(f"{name:>28}: {seconds * 1e6:9.3f}us")
+
+
+if __name__ == "__main__":
+    main()
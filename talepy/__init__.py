@@ -1,43 +1,32 @@
-from typing import Tuple, Any, List, Iterable
+from typing import Iterable, Optional
 
 from .async_transactions import has_async_execute
 from .exceptions import CompensationFailure, AsyncStepUsedInSyncTransaction
+from .plans import (
+    TransactionPlan,
+    compile_transaction,
+    _compensate_completed_steps,
+    _execute_step,
+)
+from .dead_letters import DeadLetterStore
+from .idempotency import ResultStore
+from .journal import Journal
 from .retries import StepWithRetries, execute_step_retry
 from .steps import build_step_list, StepLike, Step
-
-
-def _compensate_completed_steps(completed_steps: List[Tuple[Step, Any]]):
-    failures = []
-    for (step, state) in reversed(completed_steps):
-        try:
-            step.compensate(state)
-        except Exception as failure:
-            failures.append(failure)
-    if failures != []:
-        raise CompensationFailure(failures)
-
-
-def _execute_step(state, step: Step):
-    try:
-        return step.execute(state)
-    except Exception as e:
-        if isinstance(step, StepWithRetries):
-            return execute_step_retry(state, step, [e])
-        raise e
-
-
-def run_transaction(steps: Iterable[StepLike], starting_state=None):
-    steps = build_step_list(steps)
-    completed_steps: List[Tuple[Step, Any]] = []
-    state = starting_state
-    try:
-        for step in steps:
-            if has_async_execute(step):
-                raise AsyncStepUsedInSyncTransaction
-            state = _execute_step(state, step)
-            completed_steps.append((step, state))
-        return state
-
-    except Exception as error:
-        _compensate_completed_steps(completed_steps)
-        raise error
+from .threaded import run_concurrent_transaction
+
+
+def run_transaction(
+    steps: Iterable[StepLike],
+    starting_state=None,
+    journal: Optional[Journal] = None,
+    results: Optional[ResultStore] = None,
+    idempotency_key: Optional[str] = None,
+    dead_letters: Optional[DeadLetterStore] = None,
+):
+    return compile_transaction(steps, dead_letters=dead_letters).run(
+        starting_state,
+        journal=journal,
+        results=results,
+        idempotency_key=idempotency_key,
+    )
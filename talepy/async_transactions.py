@@ -1,83 +1,254 @@
 import asyncio
-import inspect
-from typing import Iterable, Any, Tuple, List
-
-from .retries import StepWithRetries
-from .exceptions import AsyncStepFailures, RetriesCannotBeUsedInConcurrent
+from concurrent.futures import Executor
+from typing import Iterable, Any, List, Optional, Callable, Awaitable, TypeVar
+
+from .compensation import (
+    PARALLEL,
+    check_concurrency_limit,
+    _gather_bounded,
+    _NOT_FINISHED,
+)
+from .dead_letters import DeadLetterRecorder, DeadLetterStore
+from .deadlines import deadline_after, _within_deadline
+from .exceptions import AsyncStepFailures, StepTimedOut
 from .functional import partition
-from .steps import StepLike, build_step_list, Step
+from .hooks import (
+    SagaObserver,
+    observe_saga,
+    _current_saga,
+    SAGA_STARTED,
+    SAGA_ENDED,
+    EXECUTE_STARTED,
+    EXECUTE_ENDED,
+    COMPENSATION_STARTED,
+    COMPENSATION_ENDED,
+)
+from .idempotency import ResultStore
+from .journal import Journal
+from .plans import (
+    CompiledStep,
+    compile_step,
+    compile_transaction,
+    _compensate_async,
+    _execute_step_async,
+    _token_for,
+)
+from .steps import (
+    StepLike,
+    build_step_list,
+    Step,
+    has_async_execute,
+    has_async_compensate,
+)
 
 
 class _WrappedAsyncStep(Step):
-    _wrapped_step: Step
-
-    def __init__(self, wrapped_step: Step):
-        if isinstance(wrapped_step, StepWithRetries):
-            raise RetriesCannotBeUsedInConcurrent
-        self._wrapped_step = wrapped_step
+    _wrapped_step: CompiledStep
+    _executor: Optional[Executor]
+    _deadline: Optional[float]
+    _index: int
+    _observer: Optional[SagaObserver]
+
+    def __init__(
+        self,
+        wrapped_step: Step,
+        executor: Optional[Executor] = None,
+        deadline: Optional[float] = None,
+        index: int = 0,
+        observer: Optional[SagaObserver] = None,
+    ):
+        self._wrapped_step = compile_step(wrapped_step)
+        self._executor = executor
+        self._deadline = deadline
+        self._index = index
+        self._observer = observer
 
     async def compensate(self, state):
-        if has_async_compensate(self._wrapped_step):
-            return await self._wrapped_step.compensate(state)  # type: ignore
-        else:
-            return self._wrapped_step.compensate(state)
+        if self._observer is None:
+            return await self._compensate(state)
+        step = self._wrapped_step.step
+        self._observer.emit(COMPENSATION_STARTED, self._index, step)
+        try:
+            result = await self._compensate(state)
+        except BaseException as failure:
+            self._observer.emit(COMPENSATION_ENDED, self._index, step, failure)
+            raise
+        self._observer.emit(COMPENSATION_ENDED, self._index, step)
+        return result
 
     async def execute(self, state):
-        if has_async_execute(self._wrapped_step):
-            return await self._wrapped_step.execute(state)
-        else:
-            return self._wrapped_step.execute(state)
+        if self._observer is None:
+            return await self._execute(state)
+        step = self._wrapped_step.step
+        self._observer.emit(EXECUTE_STARTED, self._index, step)
+        try:
+            result = await self._execute(state)
+        except BaseException as failure:
+            self._observer.emit(EXECUTE_ENDED, self._index, step, failure)
+            raise
+        self._observer.emit(EXECUTE_ENDED, self._index, step)
+        return result
+
+    async def _compensate(self, state):
+        return await _compensate_async(self._wrapped_step, state, self._executor)
+
+    async def _execute(self, state):
+        execution = _execute_step_async(state, self._wrapped_step, self._executor)
+        if self._wrapped_step.timeout is None and self._deadline is None:
+            return await execution
+        return await _within_deadline(
+            execution, self._wrapped_step.timeout, self._deadline
+        )
+
+
+T = TypeVar("T")
+
+
+async def _gather_fail_fast(
+    run: Callable[[T], Awaitable[Any]], items: List[T], limit: Optional[int]
+) -> List[Any]:
+    # As _gather_bounded but the first failure cancels everything still running
+    # and nothing new is started. Anything that didn't get to finish is left
+    # as _NOT_FINISHED.
+    results: List[Any] = [_NOT_FINISHED] * len(items)
+    remaining = iter(enumerate(items))
+    failed = False
+    workers: List["asyncio.Future[None]"] = []
+
+    async def worker():
+        nonlocal failed
+        for index, item in remaining:
+            if failed:
+                return
+            try:
+                results[index] = await run(item)
+            except Exception as error:
+                results[index] = error
+                if not failed:
+                    failed = True
+                    current = asyncio.current_task()
+                    for other in workers:
+                        if other is not current:
+                            other.cancel()
+
+    worker_count = len(items) if limit is None else min(limit, len(items))
+    workers.extend(asyncio.ensure_future(worker()) for _ in range(worker_count))
+    # Steps that ignore cancellation are still waited for here
+    await asyncio.gather(*workers, return_exceptions=True)
+    return results
 
 
 async def _raise_on_any_failures(
-    steps: List[_WrappedAsyncStep], results: Tuple[Any, ...]
+    steps: List[_WrappedAsyncStep],
+    results: List[Any],
+    max_concurrency: Optional[int] = None,
+    compensation_timeout: Optional[float] = None,
+    dead_letters: Optional[DeadLetterStore] = None,
 ):
-    executed_steps = zip(steps, results)
+    executed_steps = [
+        executed for executed in zip(steps, results) if executed[1] is not _NOT_FINISHED
+    ]
     successful_steps, failing_steps = partition(
         executed_steps, lambda i: not isinstance(i[1], Exception)
     )
     if len(failing_steps) != 0:
-        async_compensations = [
-            step.compensate(state) for (step, state) in successful_steps
+        # Steps with a compensation token are given it instead of their result
+        successful_steps = [
+            (step, _token_for(step._wrapped_step, result))
+            for (step, result) in successful_steps
         ]
-        _compensations = await asyncio.gather(
-            *async_compensations, return_exceptions=True
-        )
+        compensations: List[Any] = [_NOT_FINISHED] * len(successful_steps)
+        try:
+            await _within_deadline(
+                _gather_bounded(
+                    lambda executed: executed[0].compensate(executed[1]),
+                    successful_steps,
+                    max_concurrency,
+                    compensations,
+                ),
+                compensation_timeout,
+                None,
+            )
+        except StepTimedOut as timed_out:
+            # Compensations still running have been cancelled. Only those (and
+            # any that never started) are left to dead letter.
+            compensations = [
+                timed_out if result is _NOT_FINISHED else result
+                for result in compensations
+            ]
+        if dead_letters is not None:
+            await DeadLetterRecorder(dead_letters).record_all_async(
+                [
+                    (step._index, step._wrapped_step.step, token, result)
+                    for ((step, token), result) in zip(successful_steps, compensations)
+                    if isinstance(result, Exception)
+                ]
+            )
         exceptions = [error for (_step, error) in failing_steps]
         raise AsyncStepFailures(exceptions)
 
 
-def has_async_execute(step: Step) -> bool:
-    return inspect.iscoroutinefunction(step.execute)
-
-
-def has_async_compensate(step: Step) -> bool:
-    return inspect.iscoroutinefunction(step.compensate)
-
-
 async def run_concurrent_transaction(
-    step_defs: Iterable[StepLike], starting_state=None
-) -> Tuple[Any, ...]:
-    steps = [_WrappedAsyncStep(step) for step in build_step_list(step_defs)]
-    executions = [step.execute(starting_state) for step in steps]
-    results = await asyncio.gather(*executions, return_exceptions=True)
-    await _raise_on_any_failures(steps, results)
+    step_defs: Iterable[StepLike],
+    starting_state=None,
+    max_concurrency: Optional[int] = None,
+    fail_fast: bool = False,
+    executor: Optional[Executor] = None,
+    timeout: Optional[float] = None,
+    compensation_timeout: Optional[float] = None,
+    dead_letters: Optional[DeadLetterStore] = None,
+) -> List[Any]:
+    check_concurrency_limit(max_concurrency, "max_concurrency")
+    observer = observe_saga()
+    if observer is not None:
+        observer.emit(SAGA_STARTED)
+    token = None if observer is None else _current_saga.set(observer)
+    try:
+        deadline = deadline_after(timeout)
+        steps = [
+            _WrappedAsyncStep(step, executor, deadline, index, observer)
+            for (index, step) in enumerate(build_step_list(step_defs))
+        ]
+        gather = _gather_fail_fast if fail_fast else _gather_bounded
+        results = await gather(
+            lambda step: step.execute(starting_state), steps, max_concurrency
+        )
+        await _raise_on_any_failures(
+            steps, results, max_concurrency, compensation_timeout, dead_letters
+        )
+    except BaseException as error:
+        if observer is not None:
+            observer.emit(SAGA_ENDED, error=error)
+        raise
+    finally:
+        if token is not None:
+            _current_saga.reset(token)
+    if observer is not None:
+        observer.emit(SAGA_ENDED)
     return results
 
 
-async def run_transaction(step_defs: Iterable[StepLike], starting_state=None):
-    completed_steps: List[Tuple[_WrappedAsyncStep, Any]] = []
-    steps = [_WrappedAsyncStep(step) for step in build_step_list(step_defs)]
-    state = starting_state
-    try:
-        for step in steps:
-            state = await step.execute(state)
-            completed_steps.append((step, state))
-        return state
-
-    except Exception as error:
-        async_compensations = [
-            step.compensate(state) for (step, state) in completed_steps
-        ]
-        await asyncio.gather(*async_compensations, return_exceptions=True)
-        raise error
+async def run_transaction(
+    step_defs: Iterable[StepLike],
+    starting_state=None,
+    journal: Optional[Journal] = None,
+    executor: Optional[Executor] = None,
+    timeout: Optional[float] = None,
+    compensation_timeout: Optional[float] = None,
+    results: Optional[ResultStore] = None,
+    idempotency_key: Optional[str] = None,
+    compensation_strategy: str = PARALLEL,
+    max_concurrent_compensations: Optional[int] = None,
+    dead_letters: Optional[DeadLetterStore] = None,
+):
+    return await compile_transaction(step_defs, dead_letters=dead_letters).run_async(
+        starting_state,
+        journal=journal,
+        executor=executor,
+        timeout=timeout,
+        compensation_timeout=compensation_timeout,
+        results=results,
+        idempotency_key=idempotency_key,
+        compensation_strategy=compensation_strategy,
+        max_concurrent_compensations=max_concurrent_compensations,
+    )
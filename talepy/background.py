@@ -0,0 +1,162 @@
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+from .exceptions import BackgroundLoopClosed, CalledFromBackgroundLoop
+from .plans import TransactionPlan, compile_transaction
+from .steps import StepLike
+
+T = TypeVar("T")
+
+CloseCallback = Callable[[], Awaitable[Any]]
+
+# How long sagas still running at interpreter exit get to finish
+EXIT_TIMEOUT = 10.0
+
+_default_loop: Optional["BackgroundLoop"] = None
+_default_loop_lock = threading.Lock()
+
+
+def default_loop() -> "BackgroundLoop":
+    # Started on first use and closed when the interpreter exits
+    global _default_loop
+    with _default_loop_lock:
+        if _default_loop is None or _default_loop.closed:
+            _default_loop = BackgroundLoop()
+            atexit.register(_default_loop.close, EXIT_TIMEOUT)
+        return _default_loop
+
+
+class BackgroundLoop:
+    # One event loop running forever on its own thread. Sync code hands it
+    # coroutines and blocks on the result, so clients and connection pools
+    # created on the loop are kept between calls instead of being thrown away
+    # with a new loop each time.
+    _close_callbacks: List[CloseCallback]
+
+    def __init__(self, name: str = "talepy-loop") -> None:
+        self._loop = asyncio.new_event_loop()
+        self._close_callbacks = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run_forever, name=name, daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _run_forever(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def _check_caller(self) -> None:
+        # Blocking the loop's own thread on the loop would never return
+        if threading.current_thread() is self._thread:
+            raise CalledFromBackgroundLoop
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> "Future[T]":
+        with self._lock:
+            if self._closed:
+                coroutine.close()
+                raise BackgroundLoopClosed
+            return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def run(
+        self, coroutine: Coroutine[Any, Any, T], timeout: Optional[float] = None
+    ) -> T:
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+        self._check_caller()
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timed out or interrupted so the coroutine isn't needed any more
+            future.cancel()
+            raise
+
+    def run_transaction(
+        self,
+        steps: Union[TransactionPlan, Iterable[StepLike]],
+        starting_state=None,
+        **options,
+    ):
+        # Takes the same options as TransactionPlan.run_async
+        plan = (
+            steps if isinstance(steps, TransactionPlan) else compile_transaction(steps)
+        )
+        return self.run(plan.run_async(starting_state, **options))
+
+    def on_close(self, callback: CloseCallback) -> None:
+        # Awaited on the loop while it is closed, latest first. Used to close
+        # anything (sessions, pools...) bound to the loop.
+        self._close_callbacks.append(callback)
+
+    async def _shutdown(self, timeout: Optional[float]) -> List[BaseException]:
+        current = asyncio.current_task()
+        running = [task for task in asyncio.all_tasks() if task is not current]
+        if running:
+            _done, unfinished = await asyncio.wait(running, timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        errors: List[BaseException] = []
+        for callback in reversed(self._close_callbacks):
+            try:
+                await callback()
+            except Exception as error:
+                errors.append(error)
+        await self._loop.shutdown_asyncgens()
+        return errors
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        # Sagas still running are given `timeout` seconds to finish (forever
+        # if None) and then cancelled.
+        self._check_caller()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            shutdown = asyncio.run_coroutine_threadsafe(
+                self._shutdown(timeout), self._loop
+            )
+        errors = shutdown.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        if errors:
+            raise errors[0]
+
+    def __enter__(self) -> "BackgroundLoop":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+
+def run_transaction(
+    steps: Union[TransactionPlan, Iterable[StepLike]], starting_state=None, **options
+):
+    # Runs a transaction with async steps from sync code on the default loop
+    return default_loop().run_transaction(steps, starting_state, **options)
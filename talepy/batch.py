@@ -0,0 +1,350 @@
+import asyncio
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .compensation import check_concurrency_limit
+from .exceptions import (
+    AsyncStepUsedInSyncTransaction,
+    CompensationFailure,
+    InvalidBatchResult,
+)
+from .plans import (
+    CompiledStep,
+    TransactionPlan,
+    compile_transaction,
+    _compensate_async,
+    _execute_step,
+    _execute_step_async,
+    _token_for,
+)
+from .retries import call_step_method
+from .steps import StepLike, has_batch_execute, has_batch_compensate
+
+
+class BatchResult(NamedTuple):
+    # Where the starting state was in the states given
+    position: int
+    starting_state: Any
+    state: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def _as_plan(steps: Union[TransactionPlan, Iterable[StepLike]]) -> TransactionPlan:
+    if isinstance(steps, TransactionPlan):
+        return steps
+    return compile_transaction(steps)
+
+
+def _run_one(plan: TransactionPlan, index: int, starting_state) -> BatchResult:
+    try:
+        return BatchResult(index, starting_state, plan.run(starting_state))
+    except Exception as error:
+        return BatchResult(index, starting_state, error=error)
+
+
+def run_transactions_batch(
+    steps: Union[TransactionPlan, Iterable[StepLike]],
+    states: Iterable[Any],
+    max_concurrency: int = 8,
+) -> Generator[BatchResult, None, None]:
+    # Results are yielded as each transaction finishes, so not in input order.
+    # No more than 2 * max_concurrency states are pulled from `states` ahead
+    # of the results being consumed.
+    check_concurrency_limit(max_concurrency, "max_concurrency")
+    plan = _as_plan(steps)
+    in_flight: Dict[Future, None] = {}
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        for index, starting_state in enumerate(states):
+            if len(in_flight) >= max_concurrency * 2:
+                done = wait(in_flight, return_when=FIRST_COMPLETED)[0]
+                for future in done:
+                    del in_flight[future]
+                    yield future.result()
+            in_flight[pool.submit(_run_one, plan, index, starting_state)] = None
+        while in_flight:
+            done = wait(in_flight, return_when=FIRST_COMPLETED)[0]
+            for future in done:
+                del in_flight[future]
+                yield future.result()
+
+
+async def _run_one_async(
+    plan: TransactionPlan, index: int, starting_state, executor: Optional[Executor]
+) -> BatchResult:
+    try:
+        state = await plan.run_async(starting_state, executor=executor)
+        return BatchResult(index, starting_state, state)
+    except Exception as error:
+        return BatchResult(index, starting_state, error=error)
+
+
+async def run_transactions_batch_async(
+    steps: Union[TransactionPlan, Iterable[StepLike]],
+    states: Iterable[Any],
+    max_concurrency: int = 100,
+    executor: Optional[Executor] = None,
+) -> AsyncIterator[BatchResult]:
+    check_concurrency_limit(max_concurrency, "max_concurrency")
+    plan = _as_plan(steps)
+    running: Set["asyncio.Future[BatchResult]"] = set()
+    try:
+        for index, starting_state in enumerate(states):
+            if len(running) >= max_concurrency:
+                done, running = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+            running.add(
+                asyncio.ensure_future(
+                    _run_one_async(plan, index, starting_state, executor)
+                )
+            )
+        while running:
+            done, running = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
+
+
+class _LockstepSaga:
+    __slots__ = ("index", "starting_state", "state", "tokens")
+
+    index: int
+    starting_state: Any
+    state: Any
+    # The compensation token of each completed step
+    tokens: List[Any]
+
+    def __init__(self, index: int, starting_state) -> None:
+        self.index = index
+        self.starting_state = starting_state
+        self.state = starting_state
+        self.tokens = []
+
+
+def _chunks(states: Iterable[Any], chunk_size: int) -> Iterator[List[_LockstepSaga]]:
+    chunk: List[_LockstepSaga] = []
+    for index, starting_state in enumerate(states):
+        chunk.append(_LockstepSaga(index, starting_state))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _checked_batch_results(results: Any, expected: int) -> List[Any]:
+    results = list(results)
+    if len(results) != expected:
+        return [InvalidBatchResult(expected, len(results))] * expected
+    return results
+
+
+def _execute_batch(compiled: CompiledStep, states: List[Any]) -> List[Any]:
+    if compiled.async_execute:
+        return [AsyncStepUsedInSyncTransaction()] * len(states)
+    if has_batch_execute(compiled.step):
+        try:
+            results = compiled.step.execute_batch(states)  # type: ignore
+        except Exception as error:
+            return [error] * len(states)
+        return _checked_batch_results(results, len(states))
+    results = []
+    for state in states:
+        try:
+            results.append(_execute_step(state, compiled.step))
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+def _compensate_batch(
+    compiled: CompiledStep, states: List[Any]
+) -> List[Optional[Exception]]:
+    if has_batch_compensate(compiled.step):
+        try:
+            errors = compiled.step.compensate_batch(states)  # type: ignore
+        except Exception as error:
+            return [error] * len(states)
+        if errors is None:
+            return [None] * len(states)
+        return _checked_batch_results(errors, len(states))
+    failures: List[Optional[Exception]] = []
+    for state in states:
+        try:
+            compiled.step.compensate(state)
+            failures.append(None)
+        except Exception as error:
+            failures.append(error)
+    return failures
+
+
+def _split_results(
+    compiled: CompiledStep, sagas: List[_LockstepSaga], results: List[Any]
+) -> Tuple[List[_LockstepSaga], List[Tuple[_LockstepSaga, BaseException]]]:
+    succeeded = []
+    failed = []
+    for saga, result in zip(sagas, results):
+        # gather(return_exceptions=True) can hand back a CancelledError, which
+        # isn't an Exception but is still a failed step
+        if isinstance(result, BaseException):
+            failed.append((saga, result))
+        else:
+            saga.state = result
+            saga.tokens.append(_token_for(compiled, result))
+            succeeded.append(saga)
+    return succeeded, failed
+
+
+def _failure_results(
+    failed: List[Tuple[_LockstepSaga, BaseException]],
+    compensation_errors: List[List[Exception]],
+) -> Iterator[BatchResult]:
+    for (saga, error), failures in zip(failed, compensation_errors):
+        if failures != []:
+            error = CompensationFailure(failures)
+        yield BatchResult(saga.index, saga.starting_state, error=error)
+
+
+def _roll_back(
+    plan: TransactionPlan, failed: List[Tuple[_LockstepSaga, BaseException]]
+) -> Iterator[BatchResult]:
+    # Every saga here failed at the same step so they all need the same steps
+    # compensating. Each step is compensated for all of them together.
+    compensation_errors: List[List[Exception]] = [[] for _ in failed]
+    completed = len(failed[0][0].tokens)
+    for step_index in reversed(range(completed)):
+        states = [saga.tokens[step_index] for (saga, _error) in failed]
+        errors = _compensate_batch(plan.steps[step_index], states)
+        for saga_errors, error in zip(compensation_errors, errors):
+            if error is not None:
+                saga_errors.append(error)
+    return _failure_results(failed, compensation_errors)
+
+
+def run_transactions_lockstep(
+    steps: Union[TransactionPlan, Iterable[StepLike]],
+    states: Iterable[Any],
+    chunk_size: int = 1000,
+) -> Iterator[BatchResult]:
+    # Advances a chunk of transactions through each step together so steps
+    # with an execute_batch / compensate_batch method are called once for the
+    # whole chunk.
+    plan = _as_plan(steps)
+    for chunk in _chunks(states, chunk_size):
+        running = chunk
+        for compiled in plan.steps:
+            if not running:
+                break
+            results = _execute_batch(compiled, [saga.state for saga in running])
+            running, failed = _split_results(compiled, running, results)
+            if failed:
+                yield from _roll_back(plan, failed)
+        for saga in running:
+            yield BatchResult(saga.index, saga.starting_state, saga.state)
+
+
+async def _execute_batch_async(
+    compiled: CompiledStep, states: List[Any], executor: Optional[Executor]
+) -> List[Any]:
+    if has_batch_execute(compiled.step):
+        try:
+            results = await call_step_method(
+                compiled.step.execute_batch, states, executor=executor  # type: ignore
+            )
+        except Exception as error:
+            return [error] * len(states)
+        return _checked_batch_results(results, len(states))
+    return await asyncio.gather(
+        *(_execute_step_async(state, compiled, executor) for state in states),
+        return_exceptions=True,
+    )
+
+
+async def _compensate_batch_async(
+    compiled: CompiledStep, states: List[Any], executor: Optional[Executor]
+) -> List[Optional[Exception]]:
+    if has_batch_compensate(compiled.step):
+        try:
+            errors = await call_step_method(
+                compiled.step.compensate_batch,  # type: ignore
+                states,
+                executor=executor,
+            )
+        except Exception as error:
+            return [error] * len(states)
+        if errors is None:
+            return [None] * len(states)
+        return _checked_batch_results(errors, len(states))
+    results = await asyncio.gather(
+        *(_compensate_async(compiled, state, executor) for state in states),
+        return_exceptions=True,
+    )
+    return [error if isinstance(error, Exception) else None for error in results]
+
+
+async def _roll_back_async(
+    plan: TransactionPlan,
+    failed: List[Tuple[_LockstepSaga, BaseException]],
+    executor: Optional[Executor],
+) -> List[BatchResult]:
+    compensation_errors: List[List[Exception]] = [[] for _ in failed]
+    completed = len(failed[0][0].tokens)
+    for step_index in reversed(range(completed)):
+        states = [saga.tokens[step_index] for (saga, _error) in failed]
+        errors = await _compensate_batch_async(plan.steps[step_index], states, executor)
+        for saga_errors, error in zip(compensation_errors, errors):
+            if error is not None:
+                saga_errors.append(error)
+    return list(_failure_results(failed, compensation_errors))
+
+
+async def run_transactions_lockstep_async(
+    steps: Union[TransactionPlan, Iterable[StepLike]],
+    states: Iterable[Any],
+    chunk_size: int = 1000,
+    executor: Optional[Executor] = None,
+) -> AsyncIterator[BatchResult]:
+    plan = _as_plan(steps)
+    for chunk in _chunks(states, chunk_size):
+        running = chunk
+        for compiled in plan.steps:
+            if not running:
+                break
+            results = await _execute_batch_async(
+                compiled, [saga.state for saga in running], executor
+            )
+            running, failed = _split_results(compiled, running, results)
+            if failed:
+                for result in await _roll_back_async(plan, failed, executor):
+                    yield result
+        for saga in running:
+            yield BatchResult(saga.index, saga.starting_state, saga.state)
@@ -0,0 +1,239 @@
+import threading
+import time
+from collections import deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from .exceptions import CircuitOpen
+from .steps import (
+    Step,
+    StepLike,
+    build_step,
+    has_async_compensate,
+    has_async_execute,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    # Opens when at least `failure_rate` of the last `window` calls failed (once
+    # there have been `min_calls`). After `reset_timeout` seconds a limited
+    # number of probe calls are let through: a success closes the breaker
+    # again and a failure re-opens it.
+    name: str
+    _outcomes: Deque[bool]
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_calls: int = 1,
+        failure_types: Tuple[Type[Exception], ...] = (Exception,),
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.failure_types = failure_types
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # _opened_at is also reset whenever a probe is let through so probes
+        # that never report back (cancelled say) are retried eventually
+        if self._state != CLOSED:
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probes = 0
+        return self._state
+
+    def would_allow(self) -> bool:
+        # Doesn't use up a half open probe so is safe for pre-flight checks
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (
+                state == HALF_OPEN and self._probes < self.half_open_calls
+            )
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._close()
+            else:
+                self._record(False)
+
+    def record_failure(self, error: Exception) -> None:
+        if not isinstance(error, self.failure_types):
+            return self.record_success()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._record(True)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures >= self.failure_rate * calls:
+                self._open()
+
+    def _record(self, failed: bool) -> None:
+        if len(self._outcomes) == self._outcomes.maxlen and self._outcomes[0]:
+            self._failures -= 1
+        self._outcomes.append(failed)
+        if failed:
+            self._failures += 1
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def named_breaker(name: str, **options) -> CircuitBreaker:
+    # One breaker per name for the whole process. Options only apply when the
+    # breaker is first created.
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **options)
+        return breaker
+
+
+class CircuitBreakerStep(Step):
+    wrapped_step: Step
+    circuit_breaker: CircuitBreaker
+
+    def __init__(self, wrapped_step: Step, breaker: CircuitBreaker) -> None:
+        self.wrapped_step = wrapped_step
+        self.circuit_breaker = breaker
+
+    def execute(self, state):
+        breaker = self.circuit_breaker
+        if not breaker.allow():
+            raise CircuitOpen(breaker.name)
+        try:
+            result = self.wrapped_step.execute(state)
+        except Exception as error:
+            breaker.record_failure(error)
+            raise
+        breaker.record_success()
+        return result
+
+    def compensate(self, state):
+        # Compensation always has to be attempted so it isn't guarded
+        return self.wrapped_step.compensate(state)
+
+    async def _guard_async(self, execute: Callable[[Any], Awaitable[Any]], state):
+        breaker = self.circuit_breaker
+        if not breaker.allow():
+            raise CircuitOpen(breaker.name)
+        try:
+            result = await execute(state)
+        except Exception as error:
+            breaker.record_failure(error)
+            raise
+        breaker.record_success()
+        return result
+
+    # Only called when a step further down runs in a process pool or
+    # coalesces its compensations (see compile_step)
+    async def execute_async(self, state):
+        return await self._guard_async(
+            self.wrapped_step.execute_async, state  # type: ignore
+        )
+
+    async def compensate_async(self, state):
+        return await self.wrapped_step.compensate_async(state)  # type: ignore
+
+
+class _AsyncCircuitBreakerStep(CircuitBreakerStep):
+    async def execute(self, state):
+        return await self._guard_async(self.wrapped_step.execute, state)  # type: ignore
+
+
+class _AsyncCompensateCircuitBreakerStep(CircuitBreakerStep):
+    async def compensate(self, state):
+        return await self.wrapped_step.compensate(state)  # type: ignore
+
+
+class _AsyncExecuteAndCompensateCircuitBreakerStep(
+    _AsyncCircuitBreakerStep, _AsyncCompensateCircuitBreakerStep
+):
+    pass
+
+
+def with_circuit_breaker(
+    definition: StepLike, breaker: CircuitBreaker
+) -> CircuitBreakerStep:
+    # The wrapper has to be async wherever the wrapped step is so the runners
+    # classify it correctly.
+    step = build_step(definition)
+    if has_async_execute(step) and has_async_compensate(step):
+        return _AsyncExecuteAndCompensateCircuitBreakerStep(step, breaker)
+    if has_async_execute(step):
+        return _AsyncCircuitBreakerStep(step, breaker)
+    if has_async_compensate(step):
+        return _AsyncCompensateCircuitBreakerStep(step, breaker)
+    return CircuitBreakerStep(step, breaker)
+
+
+def breakers_of(steps: Iterable[Step]) -> List[CircuitBreaker]:
+    # Looks through wrappers (retries, timeouts...) for breakers
+    breakers = []
+    for step in steps:
+        current: Optional[Step] = step
+        while current is not None:
+            breaker = getattr(current, "circuit_breaker", None)
+            if breaker is not None:
+                breakers.append(breaker)
+            current = getattr(current, "wrapped_step", None)
+    return breakers
+
+
+def check_breakers(breakers: Iterable[CircuitBreaker]) -> None:
+    for breaker in breakers:
+        if not breaker.would_allow():
+            raise CircuitOpen(breaker.name)
@@ -0,0 +1,264 @@
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exceptions import CoalescerClosed, InvalidBatchResult
+from .steps import (
+    Step,
+    StepLike,
+    build_step,
+    has_async_compensate,
+    has_async_execute,
+    has_batch_compensate,
+)
+
+DEFAULT_MAX_DELAY = 0.01
+DEFAULT_MAX_BATCH_SIZE = 100
+
+# Compensations are grouped by step and by the event loop they came from
+_GroupKey = Tuple[Step, Optional[asyncio.AbstractEventLoop]]
+
+_default_coalescer: Optional["CompensationCoalescer"] = None
+_default_coalescer_lock = threading.Lock()
+
+
+def default_coalescer() -> "CompensationCoalescer":
+    global _default_coalescer
+    with _default_coalescer_lock:
+        if _default_coalescer is None:
+            _default_coalescer = CompensationCoalescer()
+        return _default_coalescer
+
+
+def _batch_errors(result: Any, count: int) -> List[Optional[Exception]]:
+    if result is None:
+        return [None] * count
+    errors = list(result)
+    if len(errors) != count:
+        return [InvalidBatchResult(count, len(errors))] * count
+    return errors
+
+
+def _compensate_group(step: Step, states: List[Any]) -> List[Optional[Exception]]:
+    if not has_batch_compensate(step):
+        errors: List[Optional[Exception]] = []
+        for state in states:
+            try:
+                result = step.compensate(state)
+                if inspect.isawaitable(result):
+                    asyncio.run(result)  # type: ignore
+                errors.append(None)
+            except Exception as error:
+                errors.append(error)
+        return errors
+    try:
+        result = step.compensate_batch(states)  # type: ignore
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)  # type: ignore
+    except Exception as error:
+        return [error] * len(states)
+    return _batch_errors(result, len(states))
+
+
+async def _compensate_group_async(
+    step: Step, states: List[Any]
+) -> List[Optional[Exception]]:
+    if not has_batch_compensate(step):
+        errors: List[Optional[Exception]] = []
+        for state in states:
+            try:
+                await step.compensate(state)  # type: ignore
+                errors.append(None)
+            except Exception as error:
+                errors.append(error)
+        return errors
+    try:
+        result = await step.compensate_batch(states)  # type: ignore
+    except Exception as error:
+        return [error] * len(states)
+    return _batch_errors(result, len(states))
+
+
+def _compensates_async(step: Step) -> bool:
+    if has_batch_compensate(step):
+        return inspect.iscoroutinefunction(step.compensate_batch)  # type: ignore
+    return has_async_compensate(step)
+
+
+def _settle(group: List[Tuple[Any, Future]], errors: List[Optional[Exception]]) -> None:
+    for (_state, future), error in zip(group, errors):
+        if isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            future.set_result(None)
+
+
+def _settle_when_done(group: List[Tuple[Any, Future]], done: Future) -> None:
+    try:
+        errors = done.result()
+    except BaseException as error:
+        errors = [error] * len(group)
+    _settle(group, errors)
+
+
+class CompensationCoalescer:
+    # Compensations submitted for the same step are held for up to max_delay
+    # (or until max_batch_size are waiting) and then sent to the step's
+    # compensate_batch in one call. Each submitter gets back its own result.
+    _pending: Dict[_GroupKey, List[Tuple[Any, Future]]]
+
+    def __init__(
+        self,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ) -> None:
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self._pending = {}
+        self._full = False
+        self._closed = False
+        self._condition = threading.Condition()
+        # Groups are flushed at the same time so a slow one doesn't hold up
+        # the compensations of every other step
+        self._workers = ThreadPoolExecutor(thread_name_prefix="talepy-coalescer")
+        self._flusher = threading.Thread(
+            target=self._flush_forever, name="talepy-coalescer", daemon=True
+        )
+        self._flusher.start()
+
+    def submit(
+        self,
+        step: Step,
+        state: Any,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> Future:
+        # Async compensations submitted with a loop are run on it as the
+        # clients they use (HTTP sessions, connection pools...) are usually
+        # bound to the loop they were created on. Compensations from
+        # different loops are never put in the same batch.
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise CoalescerClosed
+            was_idle = not self._pending
+            group = self._pending.setdefault((step, loop), [])
+            group.append((state, future))
+            if len(group) >= self.max_batch_size:
+                self._full = True
+            if was_idle or self._full:
+                self._condition.notify()
+        return future
+
+    def _next_groups(self) -> Dict[_GroupKey, List[Tuple[Any, Future]]]:
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            flush_at = time.monotonic() + self.max_delay
+            while not self._full and not self._closed:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            groups = self._pending
+            self._pending = {}
+            self._full = False
+            return groups
+
+    def _flush_forever(self) -> None:
+        while True:
+            groups = self._next_groups()
+            if not groups:
+                return
+            for (step, loop), group in groups.items():
+                for start in range(0, len(group), self.max_batch_size):
+                    self._dispatch(
+                        step, loop, group[start : start + self.max_batch_size]
+                    )
+
+    def _dispatch(
+        self,
+        step: Step,
+        loop: Optional[asyncio.AbstractEventLoop],
+        group: List[Tuple[Any, Future]],
+    ) -> None:
+        if loop is not None and _compensates_async(step):
+            states = [state for (state, _future) in group]
+            try:
+                done = asyncio.run_coroutine_threadsafe(
+                    _compensate_group_async(step, states), loop
+                )
+            except RuntimeError:
+                # The loop has been closed so there's nowhere to run them
+                pass
+            else:
+                done.add_done_callback(partial(_settle_when_done, group))
+                return
+        self._workers.submit(self._flush, step, group)
+
+    def _flush(self, step: Step, group: List[Tuple[Any, Future]]) -> None:
+        _settle(group, _compensate_group(step, [state for (state, _future) in group]))
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._flusher.join()
+        self._workers.shutdown()
+
+    def __enter__(self) -> "CompensationCoalescer":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+
+class CoalescingStep(Step):
+    # The same CoalescingStep has to be shared by every saga whose
+    # compensations should be coalesced, e.g. by compiling the steps once.
+    coalesces_compensation = True
+
+    wrapped_step: Step
+    _coalescer: Optional[CompensationCoalescer]
+
+    def __init__(
+        self, wrapped_step: Step, coalescer: Optional[CompensationCoalescer] = None
+    ) -> None:
+        self.wrapped_step = wrapped_step
+        self._coalescer = coalescer
+
+    @property
+    def coalescer(self) -> CompensationCoalescer:
+        return self._coalescer or default_coalescer()
+
+    def execute(self, state):
+        return self.wrapped_step.execute(state)
+
+    def compensate(self, state):
+        return self.coalescer.submit(self.wrapped_step, state).result()
+
+    async def compensate_async(self, state):
+        return await asyncio.wrap_future(
+            self.coalescer.submit(self.wrapped_step, state, asyncio.get_running_loop())
+        )
+
+    # Only called when the wrapped step runs in a process pool
+    async def execute_async(self, state):
+        return await self.wrapped_step.execute_async(state)  # type: ignore
+
+
+class _AsyncExecuteCoalescingStep(CoalescingStep):
+    async def execute(self, state):
+        return await self.wrapped_step.execute(state)  # type: ignore
+
+
+def coalesce_compensations(
+    definition: StepLike, coalescer: Optional[CompensationCoalescer] = None
+) -> CoalescingStep:
+    step = build_step(definition)
+    if has_async_execute(step):
+        return _AsyncExecuteCoalescingStep(step, coalescer)
+    return CoalescingStep(step, coalescer)
@@ -0,0 +1,126 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from .exceptions import InvalidConcurrencyLimit, UnknownCompensationStrategy
+from .steps import Step, StepLike, mark_step, marker_of
+
+# How the async runner schedules the compensations of a failed transaction
+REVERSE = "reverse"
+PARALLEL = "parallel"
+BY_LEVEL = "by_level"
+STRATEGIES = (REVERSE, PARALLEL, BY_LEVEL)
+
+T = TypeVar("T")
+
+CompensationToken = Callable[[Any], Any]
+
+
+class _NotFinished:
+    pass
+
+
+# Stands in for the result of anything that was cancelled or never started
+_NOT_FINISHED = _NotFinished()
+
+
+def with_compensation_level(definition: StepLike, level: int) -> Step:
+    # With the by_level strategy the highest level is compensated first and
+    # steps on the same level are compensated together. A step's level is
+    # its position in the transaction unless it is given one here.
+    return mark_step(definition, "compensation_level", level)
+
+
+def with_compensation_token(definition: StepLike, token: CompensationToken) -> Step:
+    # The runners keep `token(state)` for each completed step instead of the
+    # state itself and compensate is given the token.
+    return mark_step(definition, "compensation_token", token)
+
+
+def compensation_token_of(step: Step) -> Optional[CompensationToken]:
+    # Wrappers (retries, breakers...) hand whatever compensate is given on to
+    # the step they wrap
+    return marker_of(step, "compensation_token")
+
+
+def check_strategy(strategy: str) -> None:
+    if strategy not in STRATEGIES:
+        raise UnknownCompensationStrategy(strategy)
+
+
+def check_concurrency_limit(limit: Optional[int], argument: str) -> None:
+    # A limit below 1 would start no workers and quietly run nothing
+    if limit is not None and limit < 1:
+        raise InvalidConcurrencyLimit(argument, limit)
+
+
+async def _gather_bounded(
+    run: Callable[[T], Awaitable[Any]],
+    items: List[T],
+    limit: Optional[int],
+    results: Optional[List[Any]] = None,
+) -> List[Any]:
+    # Behaves like gather(..., return_exceptions=True) over run(item) but with
+    # at most `limit` running at once. A fixed set of workers pull from a
+    # shared iterator so nothing is created for items that haven't started.
+    # Given `results`, each outcome is written to it as soon as it's known so
+    # a caller that stops waiting can still tell what finished.
+    if limit is None and results is None:
+        return await asyncio.gather(
+            *(run(item) for item in items), return_exceptions=True
+        )
+    if results is None:
+        results = [_NOT_FINISHED] * len(items)
+    remaining = iter(enumerate(items))
+
+    async def worker():
+        for index, item in remaining:
+            try:
+                results[index] = await run(item)
+            except Exception as error:
+                results[index] = error
+
+    worker_count = len(items) if limit is None else min(limit, len(items))
+    await asyncio.gather(*(worker() for _ in range(worker_count)))
+    return results
+
+
+def _by_level(levels: Sequence[int]) -> List[List[int]]:
+    # Indexes grouped by level, highest level first and the latest step first
+    # within a level
+    groups: Dict[int, List[int]] = {}
+    for index in reversed(range(len(levels))):
+        groups.setdefault(levels[index], []).append(index)
+    return [groups[level] for level in sorted(groups, reverse=True)]
+
+
+async def schedule_compensations(
+    compensations: Sequence[Callable[[], Awaitable[Any]]],
+    levels: Sequence[int],
+    strategy: str = PARALLEL,
+    limit: Optional[int] = None,
+    results: Optional[List[Any]] = None,
+) -> List[Any]:
+    # The result (or exception) of each compensation in the order given.
+    # Compensations are only created once they are due to start so nothing
+    # is left unawaited if the schedule is cancelled part way through. As with
+    # _gather_bounded, `results` is filled in as each compensation finishes.
+    latest_first = list(reversed(range(len(compensations))))
+    if strategy == REVERSE:
+        groups, limit = [latest_first], 1
+    elif strategy == BY_LEVEL:
+        groups = _by_level(levels)
+    else:
+        groups = [latest_first]
+    if results is None:
+        results = [_NOT_FINISHED] * len(compensations)
+    finished = results
+
+    async def compensate(index: int) -> None:
+        try:
+            finished[index] = await compensations[index]()
+        except Exception as error:
+            finished[index] = error
+
+    for group in groups:
+        await _gather_bounded(compensate, group, limit)
+    return results
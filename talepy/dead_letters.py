@@ -0,0 +1,317 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
+
+from .journal import StateSerializer, StateDeserializer, _open_for_append
+from .metrics import step_name
+from .steps import Step
+
+logger = logging.getLogger(__name__)
+
+ADDED = "added"
+FAILED = "failed"
+RESOLVED = "resolved"
+
+
+class DeadLetter(NamedTuple):
+    # A compensation that failed and still needs to be applied
+    letter_id: str
+    saga_id: str
+    saga_name: Optional[str]
+    step_index: int
+    step_name: str
+    state: Any
+    # Every failure so far, oldest first
+    errors: Tuple[str, ...]
+    # time.time() when the compensation first failed
+    created_at: float
+
+    @property
+    def attempts(self) -> int:
+        return len(self.errors)
+
+
+def describe_error(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+class DeadLetterStore(ABC):
+    @abstractmethod
+    def add(self, letter: DeadLetter) -> None:
+        # Must only return once the letter is durable
+        pass
+
+    @abstractmethod
+    def record_failure(self, letter_id: str, error: str) -> None:
+        pass
+
+    @abstractmethod
+    def resolve(self, letter_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def pending(self) -> Iterator[DeadLetter]:
+        pass
+
+    async def add_async(self, letter: DeadLetter) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.add, letter)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+
+class FileDeadLetterStore(DeadLetterStore):
+    # Append only. Replays add a line per attempt and the current letters are
+    # worked out by reading the whole file.
+    def __init__(
+        self,
+        path: str,
+        fsync: bool = True,
+        serialize: StateSerializer = json.dumps,
+        deserialize: StateDeserializer = json.loads,
+    ) -> None:
+        self.path = path
+        self.fsync = fsync
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self._lock = threading.Lock()
+        self._file = _open_for_append(path)
+
+    def _append(self, kind: str, letter_id: str, payload: Any) -> None:
+        line = json.dumps([kind, letter_id, payload]) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def add(self, letter: DeadLetter) -> None:
+        payload = [
+            letter.saga_id,
+            letter.saga_name,
+            letter.step_index,
+            letter.step_name,
+            self._serialize(letter.state),
+            list(letter.errors),
+            letter.created_at,
+        ]
+        self._append(ADDED, letter.letter_id, payload)
+
+    def record_failure(self, letter_id: str, error: str) -> None:
+        self._append(FAILED, letter_id, error)
+
+    def resolve(self, letter_id: str) -> None:
+        self._append(RESOLVED, letter_id, None)
+
+    def pending(self) -> Iterator[DeadLetter]:
+        letters: Dict[str, DeadLetter] = {}
+        with open(self.path, "r", encoding="utf-8") as store_file:
+            for line in store_file:
+                if not line.endswith("\n"):
+                    # A torn final write from a crash. It was never acknowledged.
+                    continue
+                try:
+                    kind, letter_id, payload = json.loads(line)
+                except ValueError:
+                    # A torn write that something else appended straight
+                    # after. It was never acknowledged either.
+                    continue
+                if kind == ADDED:
+                    saga_id, saga_name, index, name, state, errors, created = payload
+                    letters[letter_id] = DeadLetter(
+                        letter_id,
+                        saga_id,
+                        saga_name,
+                        index,
+                        name,
+                        self._deserialize(state),
+                        tuple(errors),
+                        created,
+                    )
+                elif kind == FAILED and letter_id in letters:
+                    letter = letters[letter_id]
+                    letters[letter_id] = letter._replace(
+                        errors=letter.errors + (payload,)
+                    )
+                elif kind == RESOLVED:
+                    letters.pop(letter_id, None)
+        return iter(letters.values())
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class SqliteDeadLetterStore(DeadLetterStore):
+    def __init__(
+        self,
+        path: str,
+        serialize: StateSerializer = json.dumps,
+        deserialize: StateDeserializer = json.loads,
+    ) -> None:
+        self.path = path
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS talepy_dead_letters ("
+            " letter_id TEXT PRIMARY KEY,"
+            " saga_id TEXT NOT NULL,"
+            " saga_name TEXT,"
+            " step_index INTEGER NOT NULL,"
+            " step_name TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " errors TEXT NOT NULL,"
+            " created_at REAL NOT NULL"
+            ")"
+        )
+        self._connection.commit()
+
+    def add(self, letter: DeadLetter) -> None:
+        row = (
+            letter.letter_id,
+            letter.saga_id,
+            letter.saga_name,
+            letter.step_index,
+            letter.step_name,
+            self._serialize(letter.state),
+            json.dumps(list(letter.errors)),
+            letter.created_at,
+        )
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT INTO talepy_dead_letters VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+
+    def record_failure(self, letter_id: str, error: str) -> None:
+        with self._lock:
+            with self._connection:
+                row = self._connection.execute(
+                    "SELECT errors FROM talepy_dead_letters WHERE letter_id = ?",
+                    (letter_id,),
+                ).fetchone()
+                if row is None:
+                    return
+                self._connection.execute(
+                    "UPDATE talepy_dead_letters SET errors = ? WHERE letter_id = ?",
+                    (json.dumps(json.loads(row[0]) + [error]), letter_id),
+                )
+
+    def resolve(self, letter_id: str) -> None:
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM talepy_dead_letters WHERE letter_id = ?", (letter_id,)
+                )
+
+    def pending(self) -> Iterator[DeadLetter]:
+        # Read up front so replaying the letters never waits on this read
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT letter_id, saga_id, saga_name, step_index, step_name,"
+                " state, errors, created_at"
+                " FROM talepy_dead_letters ORDER BY created_at"
+            ).fetchall()
+        return (
+            DeadLetter(
+                letter_id,
+                saga_id,
+                saga_name,
+                step_index,
+                name,
+                self._deserialize(state),
+                tuple(json.loads(errors)),
+                created_at,
+            )
+            for (
+                letter_id,
+                saga_id,
+                saga_name,
+                step_index,
+                name,
+                state,
+                errors,
+                created_at,
+            ) in rows
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _log_lost_letter(step_index: int, step: Step) -> None:
+    # Failing to store a letter (a state the serializer can't handle say) is
+    # logged rather than raised. Otherwise it would stop the remaining
+    # compensations and hide the CompensationFailure the caller expects.
+    logger.exception(
+        "Could not dead letter the failed compensation of step %s (%s)",
+        step_index,
+        step_name(step),
+    )
+
+
+class DeadLetterRecorder:
+    __slots__ = ("store", "saga_id", "saga_name")
+
+    def __init__(
+        self,
+        store: DeadLetterStore,
+        saga_name: Optional[str] = None,
+        saga_id: Optional[str] = None,
+    ) -> None:
+        self.store = store
+        self.saga_id = saga_id or uuid4().hex
+        self.saga_name = saga_name
+
+    def _letter(
+        self, step_index: int, step: Step, state: Any, error: BaseException
+    ) -> DeadLetter:
+        return DeadLetter(
+            uuid4().hex,
+            self.saga_id,
+            self.saga_name,
+            step_index,
+            step_name(step),
+            state,
+            (describe_error(error),),
+            time.time(),
+        )
+
+    def record(self, step_index: int, step: Step, state: Any, error: BaseException):
+        try:
+            self.store.add(self._letter(step_index, step, state, error))
+        except Exception:
+            _log_lost_letter(step_index, step)
+
+    async def record_async(
+        self, step_index: int, step: Step, state: Any, error: BaseException
+    ):
+        try:
+            await self.store.add_async(self._letter(step_index, step, state, error))
+        except Exception:
+            _log_lost_letter(step_index, step)
+
+    async def record_all_async(
+        self, failed: List[Tuple[int, Step, Any, BaseException]]
+    ) -> None:
+        for step_index, step, state, error in failed:
+            await self.record_async(step_index, step, state, error)
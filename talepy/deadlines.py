@@ -0,0 +1,55 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from .exceptions import DeadlineExceeded, StepTimedOut
+from .steps import Step, StepLike, mark_step
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("talepy_deadline", default=None)
+
+
+def remaining_time() -> Optional[float]:
+    # Seconds left before the running step (or compensation) will be
+    # cancelled. None if there's no time limit.
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def deadline_after(timeout: Optional[float]) -> Optional[float]:
+    return None if timeout is None else time.monotonic() + timeout
+
+
+def with_timeout(definition: StepLike, timeout: float) -> Step:
+    # Async runners cancel the step's execution if it takes longer than this
+    return mark_step(definition, "step_timeout", timeout)
+
+
+async def _within_deadline(
+    awaitable: Awaitable[T], timeout: Optional[float], deadline: Optional[float]
+) -> T:
+    error: TimeoutError
+    if timeout is not None and (
+        deadline is None or time.monotonic() + timeout < deadline
+    ):
+        deadline = time.monotonic() + timeout
+        error = StepTimedOut(timeout)
+    elif deadline is not None:
+        error = DeadlineExceeded()
+    else:
+        return await awaitable
+    # Set before wait_for creates the task so the step sees the time it has
+    token = _deadline.set(deadline)
+    try:
+        return await asyncio.wait_for(awaitable, deadline - time.monotonic())
+    except asyncio.TimeoutError:
+        if time.monotonic() < deadline:
+            # The step raised a timeout of its own
+            raise
+        raise error from None
+    finally:
+        _deadline.reset(token)
@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
 
 class TalepyException(Exception):
@@ -24,10 +24,15 @@ class AbortRetries(RuntimeError, TalepyException):
 
 class FailuresAfterRetrying(RuntimeError, TalepyException):
     inner_exceptions: List[Exception]
+    attempts: int
 
-    def __init__(self, failures: List[Exception]) -> None:
+    def __init__(
+        self, failures: List[Exception], attempts: Optional[int] = None
+    ) -> None:
+        # Only the most recent failures may have been kept
         self.inner_exceptions = failures
-        super().__init__(f"Failed to apply step after {len(failures)} attempts")
+        self.attempts = len(failures) if attempts is None else attempts
+        super().__init__(f"Failed to apply step after {self.attempts} attempts")
 
 
 class AsyncStepFailures(RuntimeError, TalepyException):
@@ -45,8 +50,87 @@ class AsyncStepUsedInSyncTransaction(ValueError, TalepyException):
         )
 
 
+# No longer raised as retries now work in run_concurrent_transaction. Kept so
+# code that imports or catches it keeps working.
 class RetriesCannotBeUsedInConcurrent(ValueError, TalepyException):
     def __init__(self) -> None:
         super().__init__(
             f"Retries cannot currently be used in `run_concurrent_transaction`"
         )
+
+
+class JournalClosed(RuntimeError, TalepyException):
+    def __init__(self) -> None:
+        super().__init__("The journal has been closed")
+
+
+class UnknownSaga(LookupError, TalepyException):
+    def __init__(self, saga_name) -> None:
+        super().__init__(f"No transaction plan was given for saga `{saga_name}`")
+
+
+class InvalidConcurrencyLimit(ValueError, TalepyException):
+    def __init__(self, argument: str, limit: int) -> None:
+        super().__init__(f"`{argument}` has to be at least 1 (or None), not {limit}")
+
+
+class InvalidStepGraph(ValueError, TalepyException):
+    pass
+
+
+class InvalidBatchResult(RuntimeError, TalepyException):
+    def __init__(self, expected: int, received: int) -> None:
+        super().__init__(
+            f"Batch step returned {received} results for a batch of {expected}"
+        )
+
+
+class CoalescerClosed(RuntimeError, TalepyException):
+    def __init__(self) -> None:
+        super().__init__("Compensations can't be submitted to a closed coalescer")
+
+
+class StepTimedOut(TimeoutError, TalepyException):
+    def __init__(self, timeout: float) -> None:
+        super().__init__(f"The step didn't finish within {timeout}s")
+
+
+class DeadlineExceeded(TimeoutError, TalepyException):
+    def __init__(self) -> None:
+        super().__init__("The transaction didn't finish before its deadline")
+
+
+class CircuitOpen(RuntimeError, TalepyException):
+    def __init__(self, breaker_name: str) -> None:
+        super().__init__(f"The {breaker_name} circuit breaker is open")
+        self.breaker_name = breaker_name
+
+
+class MissingIdempotencyKey(ValueError, TalepyException):
+    def __init__(self) -> None:
+        super().__init__("Stored step results can only be used with an idempotency key")
+
+
+class UnknownCompensationStrategy(ValueError, TalepyException):
+    def __init__(self, strategy: str) -> None:
+        super().__init__(f"Unknown compensation strategy `{strategy}`")
+
+
+class BackgroundLoopClosed(RuntimeError, TalepyException):
+    def __init__(self) -> None:
+        super().__init__("Transactions can't be submitted to a closed background loop")
+
+
+class CalledFromBackgroundLoop(RuntimeError, TalepyException):
+    def __init__(self) -> None:
+        super().__init__(
+            "The background loop can't be waited on from its own thread"
+            " - await the transaction instead"
+        )
+
+
+class UnknownDeadLetterStep(LookupError, TalepyException):
+    def __init__(self, saga_name, step_index: int, step_name: str) -> None:
+        super().__init__(
+            f"Step {step_index} of saga `{saga_name}` is no longer `{step_name}`"
+        )
@@ -1,13 +1,37 @@
 import inspect
-from typing import Any, Callable, Tuple, TypeVar, Iterable, List
+from types import CodeType, FunctionType
+from typing import Any, Callable, Tuple, TypeVar, Iterable, List, Optional
+from weakref import WeakKeyDictionary
 
 X = TypeVar("X")
 FunctionPair = Tuple[Callable[[Any], X], Callable[[X], Any]]
 PlainStateChangingFunction = Callable[[Any], Any]
 
 
+# Keyed by code object so every lambda created from the same source line shares
+# an entry. Weak keys mean the cache never keeps dead functions alive.
+_arity_by_code: "WeakKeyDictionary[CodeType, int]" = WeakKeyDictionary()
+
+
+def _cacheable_code(func: Callable) -> Optional[CodeType]:
+    # Anything that could make inspect.signature disagree with the code object
+    # itself (wrappers, explicit signatures) skips the cache.
+    if type(func) is not FunctionType:
+        return None
+    if hasattr(func, "__wrapped__") or hasattr(func, "__signature__"):
+        return None
+    return func.__code__  # type: ignore
+
+
 def arity(func: Callable) -> int:
-    return len(inspect.signature(func).parameters)
+    code = _cacheable_code(func)
+    if code is None:
+        return len(inspect.signature(func).parameters)
+    cached = _arity_by_code.get(code)
+    if cached is None:
+        cached = len(inspect.signature(func).parameters)
+        _arity_by_code[code] = cached
+    return cached
 
 
 def is_arity_one_pair(thing: Any) -> bool:
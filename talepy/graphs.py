@@ -0,0 +1,206 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    NamedTuple,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .exceptions import AsyncStepFailures, CompensationFailure, InvalidStepGraph
+from .plans import (
+    CompiledStep,
+    compile_step,
+    _compensate_async,
+    _execute_step_async,
+    _token_for,
+)
+from .steps import StepLike, build_step
+
+StateMerger = Callable[[List[Any]], Any]
+
+
+class GraphStep(NamedTuple):
+    step: StepLike
+    depends_on: Sequence[str] = ()
+
+
+def merge_states(states: List[Any]) -> Any:
+    if len(states) == 1:
+        return states[0]
+    if all(isinstance(state, Mapping) for state in states):
+        merged: Dict[Any, Any] = {}
+        for state in states:
+            merged.update(state)
+        return merged
+    return tuple(states)
+
+
+class _Node:
+    __slots__ = ("name", "compiled", "dependencies", "dependents")
+
+    name: str
+    compiled: CompiledStep
+    dependencies: Tuple[str, ...]
+    dependents: List[str]
+
+    def __init__(self, name: str, definition: Union[StepLike, GraphStep]) -> None:
+        if not isinstance(definition, GraphStep):
+            definition = GraphStep(definition)
+        self.name = name
+        self.compiled = compile_step(build_step(definition.step))
+        self.dependencies = tuple(definition.depends_on)
+        self.dependents = []
+
+
+def _topological_order(nodes: Mapping[str, _Node]) -> Tuple[str, ...]:
+    waiting = {name: len(node.dependencies) for (name, node) in nodes.items()}
+    ready = [name for (name, count) in waiting.items() if count == 0]
+    order: List[str] = []
+    while ready:
+        name = ready.pop()
+        order.append(name)
+        for dependent in nodes[name].dependents:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                ready.append(dependent)
+    if len(order) != len(nodes):
+        cycle = sorted(name for (name, count) in waiting.items() if count > 0)
+        raise InvalidStepGraph(f"Steps have circular dependencies: {cycle}")
+    return tuple(order)
+
+
+class StepGraph:
+    __slots__ = ("_nodes", "_order", "_sinks", "_merge")
+
+    _nodes: Dict[str, _Node]
+    _order: Tuple[str, ...]
+    _sinks: Tuple[str, ...]
+    _merge: StateMerger
+
+    def __init__(
+        self,
+        steps: Mapping[str, Union[StepLike, GraphStep]],
+        merge: StateMerger = merge_states,
+    ) -> None:
+        self._nodes = {name: _Node(name, step) for (name, step) in steps.items()}
+        for node in self._nodes.values():
+            for dependency in node.dependencies:
+                if dependency not in self._nodes:
+                    raise InvalidStepGraph(
+                        f"`{node.name}` depends on unknown step `{dependency}`"
+                    )
+                self._nodes[dependency].dependents.append(node.name)
+        self._order = _topological_order(self._nodes)
+        self._sinks = tuple(
+            name for name in self._nodes if not self._nodes[name].dependents
+        )
+        self._merge = merge
+
+    @property
+    def order(self) -> Tuple[str, ...]:
+        return self._order
+
+    def _input_for(self, node: _Node, outputs: Dict[str, Any], starting_state):
+        if not node.dependencies:
+            return starting_state
+        return self._merge([outputs[name] for name in node.dependencies])
+
+    async def run_async(self, starting_state=None, executor: Optional[Executor] = None):
+        outputs: Dict[str, Any] = {}
+        failures: List[BaseException] = []
+        waiting = {name: len(node.dependencies) for (name, node) in self._nodes.items()}
+        running: Dict["asyncio.Future[Any]", str] = {}
+
+        def start(node: _Node):
+            state = self._input_for(node, outputs, starting_state)
+            execution = _execute_step_async(state, node.compiled, executor)
+            running[asyncio.ensure_future(execution)] = node.name
+
+        try:
+            for name in self._order:
+                if waiting[name] == 0:
+                    start(self._nodes[name])
+            while running:
+                done, _pending = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        failures.append(error)
+                        continue
+                    outputs[name] = task.result()
+                    if failures:
+                        # Something already failed so nothing new is started
+                        continue
+                    for dependent in self._nodes[name].dependents:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            start(self._nodes[dependent])
+        except BaseException:
+            for task in running:
+                task.cancel()
+            raise
+
+        if failures:
+            await self._compensate(outputs, executor)
+            raise AsyncStepFailures(failures)  # type: ignore
+        return self._merge([outputs[name] for name in self._sinks])
+
+    async def _compensate(self, outputs: Dict[str, Any], executor: Optional[Executor]):
+        # A step is compensated once every completed step depending on it has
+        # been. Branches that don't depend on each other roll back in parallel.
+        waiting = {
+            name: sum(1 for d in self._nodes[name].dependents if d in outputs)
+            for name in outputs
+        }
+        failures: List[Exception] = []
+        running: Dict["asyncio.Future[Any]", str] = {}
+
+        def start(name: str):
+            compiled = self._nodes[name].compiled
+            token = _token_for(compiled, outputs[name])
+            compensation = _compensate_async(compiled, token, executor)
+            running[asyncio.ensure_future(compensation)] = name
+
+        for name in reversed(self._order):
+            if name in outputs and waiting[name] == 0:
+                start(name)
+        while running:
+            done, _pending = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                name = running.pop(task)
+                error = task.exception()
+                if error is not None:
+                    failures.append(error)  # type: ignore
+                for dependency in self._nodes[name].dependencies:
+                    waiting[dependency] -= 1
+                    if waiting[dependency] == 0:
+                        start(dependency)
+        if failures != []:
+            raise CompensationFailure(failures)
+
+
+def compile_graph(
+    steps: Mapping[str, Union[StepLike, GraphStep]], merge: StateMerger = merge_states
+) -> StepGraph:
+    return StepGraph(steps, merge)
+
+
+async def run_graph_transaction(
+    steps: Mapping[str, Union[StepLike, GraphStep]],
+    starting_state=None,
+    merge: StateMerger = merge_states,
+    executor: Optional[Executor] = None,
+):
+    return await compile_graph(steps, merge).run_async(starting_state, executor)
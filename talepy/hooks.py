@@ -0,0 +1,113 @@
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from .steps import Step
+
+SAGA_STARTED = "saga_started"
+SAGA_ENDED = "saga_ended"
+EXECUTE_STARTED = "execute_started"
+EXECUTE_ENDED = "execute_ended"
+RETRY_ATTEMPTED = "retry_attempted"
+COMPENSATION_STARTED = "compensation_started"
+COMPENSATION_ENDED = "compensation_ended"
+
+
+class LifecycleEvent(NamedTuple):
+    kind: str
+    # time.monotonic() when the event happened
+    at: float
+    saga_id: Optional[int]
+    saga_name: Optional[str] = None
+    step_index: Optional[int] = None
+    step: Optional[Step] = None
+    error: Optional[BaseException] = None
+    attempt: Optional[int] = None
+
+
+Listener = Callable[[LifecycleEvent], None]
+
+logger = logging.getLogger(__name__)
+
+# Replaced rather than mutated so runners can read it without a lock
+_listeners: Tuple[Listener, ...] = ()
+_listeners_lock = threading.Lock()
+_saga_ids = itertools.count(1)
+
+
+def add_listener(listener: Listener) -> None:
+    global _listeners
+    with _listeners_lock:
+        _listeners = _listeners + (listener,)
+
+
+def remove_listener(listener: Listener) -> None:
+    global _listeners
+    with _listeners_lock:
+        _listeners = tuple(known for known in _listeners if known != listener)
+
+
+class SagaObserver:
+    __slots__ = ("listeners", "saga_id", "saga_name")
+
+    def __init__(
+        self,
+        listeners: Tuple[Listener, ...],
+        saga_id: int,
+        saga_name: Optional[str] = None,
+    ) -> None:
+        self.listeners = listeners
+        self.saga_id = saga_id
+        self.saga_name = saga_name
+
+    def emit(
+        self,
+        kind: str,
+        step_index: Optional[int] = None,
+        step: Optional[Step] = None,
+        error: Optional[BaseException] = None,
+        attempt: Optional[int] = None,
+    ) -> None:
+        event = LifecycleEvent(
+            kind,
+            time.monotonic(),
+            self.saga_id,
+            self.saga_name,
+            step_index,
+            step,
+            error,
+            attempt,
+        )
+        for listener in self.listeners:
+            # A broken listener mustn't stop the saga, e.g. between a step
+            # finishing and being recorded as needing compensation
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Lifecycle listener %r failed on %s", listener, kind)
+
+
+# Lets the retry engine tell listeners which saga a retry belongs to
+_current_saga: ContextVar[Optional[SagaObserver]] = ContextVar(
+    "talepy_current_saga", default=None
+)
+
+
+def observe_saga(saga_name: Optional[str] = None) -> Optional[SagaObserver]:
+    # None when nobody is listening so the runners can skip all of this with
+    # an `is not None` check.
+    listeners = _listeners
+    if not listeners:
+        return None
+    return SagaObserver(listeners, next(_saga_ids), saga_name)
+
+
+def notify_retry(step: Step, attempt: int, error: Exception) -> None:
+    listeners = _listeners
+    if not listeners:
+        return
+    observer = _current_saga.get() or SagaObserver(listeners, next(_saga_ids))
+    observer.emit(RETRY_ATTEMPTED, step=step, error=error, attempt=attempt)
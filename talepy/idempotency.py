@@ -0,0 +1,201 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .exceptions import MissingIdempotencyKey
+from .journal import StateSerializer, StateDeserializer
+
+# Stored step results for an idempotency key, by step index
+StoredResults = Dict[int, Any]
+
+
+class ResultStore(ABC):
+    @abstractmethod
+    def load(self, key: str) -> StoredResults:
+        pass
+
+    @abstractmethod
+    def save(self, key: str, step_index: int, state: Any) -> None:
+        pass
+
+    @abstractmethod
+    def discard(self, key: str) -> None:
+        # Called once a saga has been compensated so a rerun starts afresh
+        pass
+
+    async def load_async(self, key: str) -> StoredResults:
+        return self.load(key)
+
+    async def save_async(self, key: str, step_index: int, state: Any) -> None:
+        self.save(key, step_index, state)
+
+    async def discard_async(self, key: str) -> None:
+        self.discard(key)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+
+class MemoryResultStore(ResultStore):
+    # Keeps the results of the `max_keys` most recently used keys, each for
+    # at most `ttl` seconds after it was last written.
+    _entries: "OrderedDict[str, Tuple[float, StoredResults]]"
+
+    def __init__(self, max_keys: int = 10_000, ttl: Optional[float] = 3600.0) -> None:
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expires_at(self) -> float:
+        return float("inf") if self.ttl is None else time.monotonic() + self.ttl
+
+    def load(self, key: str) -> StoredResults:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return {}
+            expires_at, results = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return {}
+            self._entries.move_to_end(key)
+            return dict(results)
+
+    def save(self, key: str, step_index: int, state: Any) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            results = {} if entry is None else entry[1]
+            results[step_index] = state
+            self._entries[key] = (self._expires_at(), results)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteResultStore(ResultStore):
+    def __init__(
+        self,
+        path: str,
+        serialize: StateSerializer = json.dumps,
+        deserialize: StateDeserializer = json.loads,
+    ) -> None:
+        self.path = path
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS talepy_step_results ("
+            " idempotency_key TEXT NOT NULL,"
+            " step_index INTEGER NOT NULL,"
+            " state TEXT NOT NULL,"
+            " PRIMARY KEY (idempotency_key, step_index)"
+            ")"
+        )
+        self._connection.commit()
+
+    def load(self, key: str) -> StoredResults:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT step_index, state FROM talepy_step_results"
+                " WHERE idempotency_key = ?",
+                (key,),
+            ).fetchall()
+        return {step_index: self._deserialize(state) for (step_index, state) in rows}
+
+    def save(self, key: str, step_index: int, state: Any) -> None:
+        serialized = self._serialize(state)
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO talepy_step_results"
+                    " (idempotency_key, step_index, state) VALUES (?, ?, ?)",
+                    (key, step_index, serialized),
+                )
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM talepy_step_results WHERE idempotency_key = ?",
+                    (key,),
+                )
+
+    async def load_async(self, key: str) -> StoredResults:
+        return await asyncio.get_running_loop().run_in_executor(None, self.load, key)
+
+    async def save_async(self, key: str, step_index: int, state: Any) -> None:
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.save, key, step_index, state
+        )
+
+    async def discard_async(self, key: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.discard, key)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def resume_point(results: StoredResults) -> int:
+    # Steps run in order so only the unbroken run of results from the first
+    # step can be trusted
+    index = 0
+    while index in results:
+        index += 1
+    return index
+
+
+class SagaResults:
+    # A result store bound to the idempotency key of one saga run
+    __slots__ = ("store", "key")
+
+    def __init__(self, store: ResultStore, key: str) -> None:
+        self.store = store
+        self.key = key
+
+    def load(self) -> StoredResults:
+        return self.store.load(self.key)
+
+    def save(self, step_index: int, state: Any) -> None:
+        self.store.save(self.key, step_index, state)
+
+    def discard(self) -> None:
+        self.store.discard(self.key)
+
+    async def load_async(self) -> StoredResults:
+        return await self.store.load_async(self.key)
+
+    async def save_async(self, step_index: int, state: Any) -> None:
+        await self.store.save_async(self.key, step_index, state)
+
+    async def discard_async(self) -> None:
+        await self.store.discard_async(self.key)
+
+
+def saga_results(
+    store: Optional[ResultStore], key: Optional[str]
+) -> Optional[SagaResults]:
+    if store is None:
+        return None
+    if key is None:
+        raise MissingIdempotencyKey
+    return SagaResults(store, key)
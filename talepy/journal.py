@@ -0,0 +1,331 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from uuid import uuid4
+
+from .exceptions import JournalClosed
+
+STEP_STARTED = "step_started"
+STEP_COMPLETED = "step_completed"
+COMPENSATED = "compensated"
+SAGA_FINISHED = "saga_finished"
+
+StateSerializer = Callable[[Any], str]
+StateDeserializer = Callable[[str], Any]
+
+
+class JournalEvent(NamedTuple):
+    saga_id: str
+    kind: str
+    step_index: Optional[int] = None
+    saga_name: Optional[str] = None
+    state: Any = None
+
+
+class Journal(ABC):
+    @abstractmethod
+    def write(self, events: Sequence[JournalEvent]) -> None:
+        # Must only return once the events are durable
+        pass
+
+    @abstractmethod
+    def read(self) -> Iterator[JournalEvent]:
+        pass
+
+    def record(self, event: JournalEvent) -> None:
+        self.write([event])
+
+    async def record_async(self, event: JournalEvent) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.record, event)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+
+def _cut_torn_line(path: str) -> None:
+    # A crash can leave a partial last line. Appending straight after it would
+    # glue the next event onto it, so it's cut back to the last full line.
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as raw:
+        end = raw.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        raw.seek(end - 1)
+        if raw.read(1) == b"\n":
+            return
+        while end > 0:
+            start = max(0, end - 4096)
+            raw.seek(start)
+            newline = raw.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        raw.truncate(end)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _open_for_append(path: str):
+    _cut_torn_line(path)
+    return open(path, "a", encoding="utf-8")
+
+
+class FileJournal(Journal):
+    def __init__(
+        self,
+        path: str,
+        fsync: bool = True,
+        serialize: StateSerializer = json.dumps,
+        deserialize: StateDeserializer = json.loads,
+    ) -> None:
+        self.path = path
+        self.fsync = fsync
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self._lock = threading.Lock()
+        self._file = _open_for_append(path)
+
+    def _encode(self, event: JournalEvent) -> str:
+        state = None if event.state is None else self._serialize(event.state)
+        return json.dumps(
+            [event.saga_id, event.kind, event.step_index, event.saga_name, state]
+        )
+
+    def write(self, events: Sequence[JournalEvent]) -> None:
+        lines = "".join(self._encode(event) + "\n" for event in events)
+        with self._lock:
+            if self._file.closed:
+                raise JournalClosed
+            self._file.write(lines)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def read(self) -> Iterator[JournalEvent]:
+        with open(self.path, "r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                if not line.endswith("\n"):
+                    # A torn final write from a crash. It was never acknowledged.
+                    continue
+                try:
+                    saga_id, kind, step_index, saga_name, state = json.loads(line)
+                except ValueError:
+                    # A torn write that something else appended straight
+                    # after. It was never acknowledged either.
+                    continue
+                if state is not None:
+                    state = self._deserialize(state)
+                yield JournalEvent(saga_id, kind, step_index, saga_name, state)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+# Databases that only the connection which opened them can see
+_PRIVATE_SQLITE_PATHS = (":memory:", "")
+
+_SELECT_EVENTS = (
+    "SELECT saga_id, kind, step_index, saga_name, state"
+    " FROM talepy_journal ORDER BY id"
+)
+
+
+class SqliteJournal(Journal):
+    def __init__(
+        self,
+        path: str,
+        serialize: StateSerializer = json.dumps,
+        deserialize: StateDeserializer = json.loads,
+    ) -> None:
+        self.path = path
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS talepy_journal ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " saga_id TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " step_index INTEGER,"
+            " saga_name TEXT,"
+            " state TEXT"
+            ")"
+        )
+        self._connection.commit()
+
+    def write(self, events: Sequence[JournalEvent]) -> None:
+        rows = [
+            (
+                event.saga_id,
+                event.kind,
+                event.step_index,
+                event.saga_name,
+                None if event.state is None else self._serialize(event.state),
+            )
+            for event in events
+        ]
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT INTO talepy_journal"
+                    " (saga_id, kind, step_index, saga_name, state)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def _decode(self, rows: Iterable[Tuple]) -> Iterator[JournalEvent]:
+        for saga_id, kind, step_index, saga_name, state in rows:
+            if state is not None:
+                state = self._deserialize(state)
+            yield JournalEvent(saga_id, kind, step_index, saga_name, state)
+
+    def read(self) -> Iterator[JournalEvent]:
+        if self.path in _PRIVATE_SQLITE_PATHS:
+            # Another connection would open a different, empty database
+            with self._lock:
+                rows = self._connection.execute(_SELECT_EVENTS).fetchall()
+            yield from self._decode(rows)
+            return
+        # A separate connection so reading never holds the writer's lock
+        connection = sqlite3.connect(self.path)
+        try:
+            yield from self._decode(connection.execute(_SELECT_EVENTS))
+        finally:
+            connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class GroupCommitJournal(Journal):
+    _pending: List[Tuple[JournalEvent, Future]]
+
+    def __init__(
+        self, journal: Journal, max_delay: float = 0.0, max_batch_size: int = 1024
+    ) -> None:
+        self.journal = journal
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._closed = False
+        self._condition = threading.Condition()
+        self._flusher = threading.Thread(
+            target=self._flush_forever, name="talepy-group-commit", daemon=True
+        )
+        self._flusher.start()
+
+    def _submit(self, events: Sequence[JournalEvent]) -> List[Future]:
+        futures: List[Future] = [Future() for _ in events]
+        with self._condition:
+            if self._closed:
+                raise JournalClosed
+            was_idle = not self._pending
+            self._pending.extend(zip(events, futures))
+            if was_idle or len(self._pending) >= self.max_batch_size:
+                self._condition.notify()
+        return futures
+
+    def _next_batch(self) -> List[Tuple[JournalEvent, Future]]:
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            # Events arriving while the previous batch was being written are
+            # already waiting here. max_delay optionally holds the batch open
+            # a little longer so more sagas can join it.
+            flush_at = time.monotonic() + self.max_delay
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            return batch
+
+    def _flush_forever(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                self.journal.write([event for (event, _future) in batch])
+            except Exception as error:
+                for _event, future in batch:
+                    future.set_exception(error)
+            else:
+                for _event, future in batch:
+                    future.set_result(None)
+
+    def write(self, events: Sequence[JournalEvent]) -> None:
+        for future in self._submit(events):
+            future.result()
+
+    def record(self, event: JournalEvent) -> None:
+        self._submit([event])[0].result()
+
+    async def record_async(self, event: JournalEvent) -> None:
+        await asyncio.wrap_future(self._submit([event])[0])
+
+    def read(self) -> Iterator[JournalEvent]:
+        return self.journal.read()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._flusher.join()
+        self.journal.close()
+
+
+class SagaRecorder:
+    __slots__ = ("journal", "saga_id", "saga_name")
+
+    def __init__(
+        self,
+        journal: Journal,
+        saga_name: Optional[str] = None,
+        saga_id: Optional[str] = None,
+    ) -> None:
+        self.journal = journal
+        self.saga_id = saga_id or uuid4().hex
+        self.saga_name = saga_name
+
+    def _event(self, kind: str, step_index: Optional[int], state: Any):
+        return JournalEvent(self.saga_id, kind, step_index, self.saga_name, state)
+
+    def record(self, kind: str, step_index: Optional[int] = None, state: Any = None):
+        self.journal.record(self._event(kind, step_index, state))
+
+    async def record_async(
+        self, kind: str, step_index: Optional[int] = None, state: Any = None
+    ):
+        await self.journal.record_async(self._event(kind, step_index, state))
@@ -0,0 +1,255 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .hooks import (
+    LifecycleEvent,
+    SAGA_STARTED,
+    SAGA_ENDED,
+    EXECUTE_STARTED,
+    EXECUTE_ENDED,
+    RETRY_ATTEMPTED,
+    COMPENSATION_STARTED,
+    COMPENSATION_ENDED,
+)
+from .steps import LambdaStep, Step
+
+# 100us doubling up to a little under two minutes
+DEFAULT_BUCKETS: Tuple[float, ...] = tuple(
+    round(0.0001 * 2**power, 4) for power in range(21)
+)
+
+
+class Histogram:
+    # A fixed array of bucket counts. Recording a value never allocates.
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        # The extra bucket at the end is +Inf
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class StepMetrics:
+    __slots__ = (
+        "execute_seconds",
+        "compensate_seconds",
+        "successes",
+        "failures",
+        "retries",
+        "compensation_failures",
+    )
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.execute_seconds = Histogram(bounds)
+        self.compensate_seconds = Histogram(bounds)
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.compensation_failures = 0
+
+
+class SagaMetrics:
+    __slots__ = ("seconds", "successes", "failures")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.seconds = Histogram(bounds)
+        self.successes = 0
+        self.failures = 0
+
+
+def step_name(step: Optional[Step]) -> str:
+    # Wrappers (retries, timeouts, process pools...) are reported as the step
+    # they wrap and lambda steps by the function they run.
+    while hasattr(step, "wrapped_step"):
+        step = step.wrapped_step  # type: ignore
+    if isinstance(step, LambdaStep):
+        function = step.execute_lambda
+        return getattr(function, "__qualname__", type(function).__qualname__)
+    return type(step).__qualname__
+
+
+def _label(value: Optional[str]) -> str:
+    if value is None:
+        return ""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    # A lifecycle listener: add_listener(registry) to start collecting.
+    # Everything is updated under one lock which is only held for a few
+    # integer increments so it is cheap to share between threads and the
+    # event loop.
+    _steps: Dict[Tuple[Optional[str], str], StepMetrics]
+    _sagas: Dict[Optional[str], SagaMetrics]
+    _started: Dict[Tuple[Optional[int], str, Optional[int]], float]
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self._steps = {}
+        self._sagas = {}
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _step(self, event: LifecycleEvent) -> StepMetrics:
+        key = (event.saga_name, step_name(event.step))
+        metrics = self._steps.get(key)
+        if metrics is None:
+            metrics = self._steps[key] = StepMetrics(self.bounds)
+        return metrics
+
+    def _saga(self, event: LifecycleEvent) -> SagaMetrics:
+        metrics = self._sagas.get(event.saga_name)
+        if metrics is None:
+            metrics = self._sagas[event.saga_name] = SagaMetrics(self.bounds)
+        return metrics
+
+    def __call__(self, event: LifecycleEvent) -> None:
+        kind = event.kind
+        with self._lock:
+            if kind in (SAGA_STARTED, EXECUTE_STARTED, COMPENSATION_STARTED):
+                self._started[(event.saga_id, kind, event.step_index)] = event.at
+            elif kind == EXECUTE_ENDED:
+                step = self._step(event)
+                started = self._started.pop(
+                    (event.saga_id, EXECUTE_STARTED, event.step_index), None
+                )
+                if started is not None:
+                    step.execute_seconds.record(event.at - started)
+                if event.error is None:
+                    step.successes += 1
+                else:
+                    step.failures += 1
+            elif kind == COMPENSATION_ENDED:
+                step = self._step(event)
+                started = self._started.pop(
+                    (event.saga_id, COMPENSATION_STARTED, event.step_index), None
+                )
+                if started is not None:
+                    step.compensate_seconds.record(event.at - started)
+                if event.error is not None:
+                    step.compensation_failures += 1
+            elif kind == RETRY_ATTEMPTED:
+                self._step(event).retries += 1
+            elif kind == SAGA_ENDED:
+                saga = self._saga(event)
+                started = self._started.pop((event.saga_id, SAGA_STARTED, None), None)
+                if started is not None:
+                    saga.seconds.record(event.at - started)
+                if event.error is None:
+                    saga.successes += 1
+                else:
+                    saga.failures += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        # Plain dicts holding a copy of every value
+        with self._lock:
+            return {
+                "steps": {
+                    key: {
+                        "execute_seconds": _histogram_snapshot(step.execute_seconds),
+                        "compensate_seconds": _histogram_snapshot(
+                            step.compensate_seconds
+                        ),
+                        "successes": step.successes,
+                        "failures": step.failures,
+                        "retries": step.retries,
+                        "compensation_failures": step.compensation_failures,
+                    }
+                    for (key, step) in self._steps.items()
+                },
+                "sagas": {
+                    name: {
+                        "seconds": _histogram_snapshot(saga.seconds),
+                        "successes": saga.successes,
+                        "failures": saga.failures,
+                    }
+                    for (name, saga) in self._sagas.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        steps = sorted(snapshot["steps"].items(), key=lambda item: str(item[0]))
+        sagas = sorted(snapshot["sagas"].items(), key=lambda item: str(item[0]))
+
+        def step_labels(key: Tuple[Optional[str], str]) -> str:
+            return f'saga="{_label(key[0])}",step="{_label(key[1])}"'
+
+        for name, field, help_text in (
+            ("talepy_step_execute_seconds", "execute_seconds", "Step execute time"),
+            (
+                "talepy_step_compensate_seconds",
+                "compensate_seconds",
+                "Step compensate time",
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, step in steps:
+                _histogram_lines(lines, name, step_labels(key), step[field])
+
+        lines.append("# HELP talepy_step_executions_total Step executions by outcome")
+        lines.append("# TYPE talepy_step_executions_total counter")
+        for key, step in steps:
+            for outcome, field in (("success", "successes"), ("failure", "failures")):
+                lines.append(
+                    f"talepy_step_executions_total{{{step_labels(key)},"
+                    f'outcome="{outcome}"}} {step[field]}'
+                )
+        for name, field, help_text in (
+            ("talepy_step_retries_total", "retries", "Step retry attempts"),
+            (
+                "talepy_step_compensation_failures_total",
+                "compensation_failures",
+                "Failed step compensations",
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, step in steps:
+                lines.append(f"{name}{{{step_labels(key)}}} {step[field]}")
+
+        lines.append("# HELP talepy_saga_seconds Saga run time")
+        lines.append("# TYPE talepy_saga_seconds histogram")
+        for saga_name, saga in sagas:
+            labels = f'saga="{_label(saga_name)}"'
+            _histogram_lines(lines, "talepy_saga_seconds", labels, saga["seconds"])
+        lines.append("# HELP talepy_sagas_total Sagas run by outcome")
+        lines.append("# TYPE talepy_sagas_total counter")
+        for saga_name, saga in sagas:
+            labels = f'saga="{_label(saga_name)}"'
+            lines.append(
+                f'talepy_sagas_total{{{labels},outcome="success"}} {saga["successes"]}'
+            )
+            lines.append(
+                f'talepy_sagas_total{{{labels},outcome="failure"}} {saga["failures"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_snapshot(histogram: Histogram) -> Dict:
+    return {
+        "bounds": histogram.bounds,
+        "counts": list(histogram.counts),
+        "sum": histogram.sum,
+        "count": histogram.count,
+    }
+
+
+def _histogram_lines(lines: List[str], name: str, labels: str, histogram: Dict):
+    total = 0
+    for bound, count in zip(histogram["bounds"], histogram["counts"]):
+        total += count
+        lines.append(f'{name}_bucket{{{labels},le="{float(bound)}"}} {total}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram['sum']}")
+    lines.append(f"{name}_count{{{labels}}} {histogram['count']}")
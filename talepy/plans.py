@@ -0,0 +1,601 @@
+import logging
+from concurrent.futures import Executor
+from functools import partial
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .breakers import CircuitBreaker, breakers_of, check_breakers
+from .compensation import (
+    PARALLEL,
+    CompensationToken,
+    check_concurrency_limit,
+    check_strategy,
+    compensation_token_of,
+    schedule_compensations,
+    _NOT_FINISHED,
+)
+from .dead_letters import DeadLetterRecorder, DeadLetterStore
+from .deadlines import deadline_after, _within_deadline
+from .exceptions import (
+    AsyncStepUsedInSyncTransaction,
+    CompensationFailure,
+    StepTimedOut,
+)
+from .idempotency import ResultStore, SagaResults, resume_point, saga_results
+from .hooks import (
+    SagaObserver,
+    observe_saga,
+    _current_saga,
+    SAGA_STARTED,
+    SAGA_ENDED,
+    EXECUTE_STARTED,
+    EXECUTE_ENDED,
+    COMPENSATION_STARTED,
+    COMPENSATION_ENDED,
+)
+from .journal import (
+    Journal,
+    SagaRecorder,
+    STEP_STARTED,
+    STEP_COMPLETED,
+    COMPENSATED,
+    SAGA_FINISHED,
+)
+from .metrics import step_name
+from .retries import (
+    StepWithRetries,
+    execute_step_retry,
+    execute_step_retry_async,
+    call_step_method,
+)
+from .steps import (
+    MarkedStep,
+    Step,
+    StepLike,
+    build_step_list,
+    has_async_execute,
+    has_async_compensate,
+    marker_of,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledStep(NamedTuple):
+    step: Step
+    async_execute: bool
+    async_compensate: bool
+    has_retries: bool
+    runs_inline: bool
+    in_process: bool
+    coalesced: bool
+    timeout: Optional[float]
+    compensation_level: Optional[int]
+    compensation_token: Optional[CompensationToken]
+
+
+def compile_step(step: Step) -> CompiledStep:
+    # Markers only change how the step is run so the runners call the step
+    # underneath them directly
+    marked = step
+    while isinstance(step, MarkedStep):
+        step = step.wrapped_step
+    return CompiledStep(
+        step=step,
+        async_execute=has_async_execute(step),
+        async_compensate=has_async_compensate(step),
+        has_retries=isinstance(step, StepWithRetries),
+        runs_inline=marker_of(marked, "runs_inline", False),
+        in_process=marker_of(step, "runs_in_process", False),
+        coalesced=marker_of(step, "coalesces_compensation", False),
+        timeout=marker_of(marked, "step_timeout"),
+        compensation_level=marker_of(marked, "compensation_level"),
+        compensation_token=compensation_token_of(marked),
+    )
+
+
+def _token_for(compiled: CompiledStep, state):
+    # What compensate is given for a step that returned `state`
+    if compiled.compensation_token is None:
+        return state
+    return compiled.compensation_token(state)
+
+
+class _CompletedSteps:
+    # All a running saga keeps so it can be compensated: a token for each
+    # completed step, in order. Tokens are matched to their steps by position
+    # so nothing else is held per step and earlier states can be freed as the
+    # saga moves on.
+    __slots__ = ("steps", "tokens")
+
+    steps: Tuple[CompiledStep, ...]
+    tokens: List[Any]
+
+    def __init__(self, steps: Tuple[CompiledStep, ...]) -> None:
+        self.steps = steps
+        self.tokens = []
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __iter__(self) -> Iterator[Tuple[int, CompiledStep, Any]]:
+        return zip(range(len(self.tokens)), self.steps, self.tokens)
+
+
+def _compensate_completed_steps(
+    completed_steps: _CompletedSteps,
+    recorder: Optional[SagaRecorder] = None,
+    observer: Optional[SagaObserver] = None,
+    dead_letters: Optional[DeadLetterRecorder] = None,
+):
+    failures = []
+    for index, compiled, state in reversed(list(completed_steps)):
+        step = compiled.step
+        if observer is not None:
+            observer.emit(COMPENSATION_STARTED, index, step)
+        try:
+            step.compensate(state)
+        except Exception as failure:
+            failures.append(failure)
+            if observer is not None:
+                observer.emit(COMPENSATION_ENDED, index, step, failure)
+            if dead_letters is not None:
+                dead_letters.record(index, step, state, failure)
+        else:
+            if observer is not None:
+                observer.emit(COMPENSATION_ENDED, index, step)
+            if recorder is not None:
+                recorder.record(COMPENSATED, index)
+    if failures != []:
+        raise CompensationFailure(failures)
+    if recorder is not None:
+        recorder.record(SAGA_FINISHED)
+
+
+def _execute_step(state, step: Step):
+    try:
+        return step.execute(state)
+    except Exception as e:
+        if isinstance(step, StepWithRetries):
+            return execute_step_retry(state, step, [e])
+        raise e
+
+
+async def _undo_abandoned_step(
+    compiled: CompiledStep, executor: Optional[Executor], state
+) -> None:
+    # The step was cancelled (by a timeout or a failing concurrent step) but
+    # carried on in its thread and succeeded. It was never recorded as
+    # completed so nothing else will compensate it.
+    try:
+        await _compensate_async(compiled, _token_for(compiled, state), executor)
+    except Exception:
+        logger.exception(
+            "Could not compensate %s after it was cancelled", step_name(compiled.step)
+        )
+
+
+async def _execute_step_async(
+    state, compiled: CompiledStep, executor: Optional[Executor] = None
+):
+    if compiled.runs_inline:
+        executor = None
+    try:
+        if compiled.async_execute:
+            return await compiled.step.execute(state)  # type: ignore
+        if compiled.in_process:
+            return await compiled.step.execute_async(state)  # type: ignore
+        if executor is not None:
+            return await call_step_method(
+                compiled.step.execute,
+                state,
+                executor=executor,
+                undo=partial(_undo_abandoned_step, compiled, executor),
+            )
+        return compiled.step.execute(state)
+    except Exception as e:
+        if compiled.has_retries:
+            undo = (
+                None
+                if executor is None
+                else partial(_undo_abandoned_step, compiled, executor)
+            )
+            return await execute_step_retry_async(
+                state, compiled.step, [e], executor, undo  # type: ignore
+            )
+        raise e
+
+
+async def _compensate_async(
+    compiled: CompiledStep, state, executor: Optional[Executor] = None
+):
+    if compiled.async_compensate:
+        return await compiled.step.compensate(state)  # type: ignore
+    if compiled.in_process or compiled.coalesced:
+        return await compiled.step.compensate_async(state)  # type: ignore
+    if executor is not None and not compiled.runs_inline:
+        return await call_step_method(
+            compiled.step.compensate, state, executor=executor
+        )
+    return compiled.step.compensate(state)
+
+
+def _failed_compensations(
+    completed_steps: _CompletedSteps, results: List[Any]
+) -> List[Tuple[int, Step, Any, BaseException]]:
+    return [
+        (index, compiled.step, token, result)
+        for (index, compiled, token), result in zip(completed_steps, results)
+        if isinstance(result, Exception)
+    ]
+
+
+async def _compensate_tracked_async(
+    compiled: CompiledStep,
+    state,
+    index: int,
+    recorder: Optional[SagaRecorder],
+    observer: Optional[SagaObserver],
+    executor: Optional[Executor] = None,
+):
+    if observer is not None:
+        observer.emit(COMPENSATION_STARTED, index, compiled.step)
+    try:
+        await _compensate_async(compiled, state, executor)
+    except BaseException as failure:
+        if observer is not None:
+            observer.emit(COMPENSATION_ENDED, index, compiled.step, failure)
+        raise
+    if observer is not None:
+        observer.emit(COMPENSATION_ENDED, index, compiled.step)
+    if recorder is not None:
+        await recorder.record_async(COMPENSATED, index)
+
+
+class TransactionPlan:
+    __slots__ = ("_steps", "_name", "_breakers", "_dead_letters")
+
+    _steps: Tuple[CompiledStep, ...]
+    _name: Optional[str]
+    _breakers: Tuple[CircuitBreaker, ...]
+    _dead_letters: Optional[DeadLetterStore]
+
+    def __init__(
+        self,
+        steps: Iterable[CompiledStep],
+        name: Optional[str] = None,
+        preflight: bool = False,
+        dead_letters: Optional[DeadLetterStore] = None,
+    ) -> None:
+        self._steps = tuple(steps)
+        self._name = name
+        # Compensations that fail are kept here to be replayed later
+        self._dead_letters = dead_letters
+        # With preflight every circuit breaker is checked before the first
+        # step runs so a saga that would fail part way through fails before
+        # it has done anything that needs compensating.
+        self._breakers = ()
+        if preflight:
+            self._breakers = tuple(
+                breakers_of(compiled.step for compiled in self._steps)
+            )
+
+    @property
+    def steps(self) -> Tuple[CompiledStep, ...]:
+        return self._steps
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def _dead_letter_recorder(
+        self, recorder: Optional[SagaRecorder]
+    ) -> Optional[DeadLetterRecorder]:
+        if self._dead_letters is None:
+            return None
+        saga_id = None if recorder is None else recorder.saga_id
+        return DeadLetterRecorder(self._dead_letters, self._name, saga_id)
+
+    def run(
+        self,
+        starting_state=None,
+        journal: Optional[Journal] = None,
+        results: Optional[ResultStore] = None,
+        idempotency_key: Optional[str] = None,
+    ):
+        saved = saga_results(results, idempotency_key)
+        if self._breakers:
+            check_breakers(self._breakers)
+        observer = observe_saga(self._name)
+        if observer is not None:
+            return self._run_observed(starting_state, journal, observer, saved)
+        return self._run(starting_state, journal, None, saved)
+
+    def _run_observed(
+        self,
+        starting_state,
+        journal: Optional[Journal],
+        observer: SagaObserver,
+        saved: Optional[SagaResults],
+    ):
+        observer.emit(SAGA_STARTED)
+        token = _current_saga.set(observer)
+        try:
+            state = self._run(starting_state, journal, observer, saved)
+        except Exception as error:
+            observer.emit(SAGA_ENDED, error=error)
+            raise
+        finally:
+            _current_saga.reset(token)
+        observer.emit(SAGA_ENDED)
+        return state
+
+    def _run(
+        self,
+        starting_state,
+        journal: Optional[Journal],
+        observer: Optional[SagaObserver] = None,
+        saved: Optional[SagaResults] = None,
+    ):
+        recorder = None if journal is None else SagaRecorder(journal, self._name)
+        completed_steps = _CompletedSteps(self._steps)
+        tokens = completed_steps.tokens
+        state = starting_state
+        resume_at = 0
+        if saved is not None:
+            # Steps that already ran under this idempotency key are skipped
+            # but still compensated if a later step fails.
+            stored = saved.load()
+            resume_at = min(resume_point(stored), len(self._steps))
+            for index in range(resume_at):
+                state = stored[index]
+                tokens.append(_token_for(self._steps[index], state))
+        try:
+            for index, compiled in enumerate(self._steps[resume_at:], resume_at):
+                if compiled.async_execute:
+                    raise AsyncStepUsedInSyncTransaction
+                if recorder is not None:
+                    recorder.record(STEP_STARTED, index)
+                if observer is not None:
+                    observer.emit(EXECUTE_STARTED, index, compiled.step)
+                try:
+                    if compiled.has_retries:
+                        state = _execute_step(state, compiled.step)
+                    else:
+                        state = compiled.step.execute(state)
+                except Exception as failure:
+                    if observer is not None:
+                        observer.emit(EXECUTE_ENDED, index, compiled.step, failure)
+                    raise
+                if observer is not None:
+                    observer.emit(EXECUTE_ENDED, index, compiled.step)
+                if compiled.compensation_token is None:
+                    tokens.append(state)
+                else:
+                    tokens.append(compiled.compensation_token(state))
+                if recorder is not None:
+                    recorder.record(STEP_COMPLETED, index, tokens[-1])
+                if saved is not None:
+                    saved.save(index, state)
+            if recorder is not None:
+                recorder.record(SAGA_FINISHED)
+            return state
+
+        except Exception as error:
+            try:
+                _compensate_completed_steps(
+                    completed_steps,
+                    recorder,
+                    observer,
+                    self._dead_letter_recorder(recorder),
+                )
+            finally:
+                if saved is not None:
+                    saved.discard()
+            raise error
+
+    async def run_async(
+        self,
+        starting_state=None,
+        journal: Optional[Journal] = None,
+        executor: Optional[Executor] = None,
+        timeout: Optional[float] = None,
+        compensation_timeout: Optional[float] = None,
+        results: Optional[ResultStore] = None,
+        idempotency_key: Optional[str] = None,
+        compensation_strategy: str = PARALLEL,
+        max_concurrent_compensations: Optional[int] = None,
+    ):
+        saved = saga_results(results, idempotency_key)
+        check_strategy(compensation_strategy)
+        check_concurrency_limit(
+            max_concurrent_compensations, "max_concurrent_compensations"
+        )
+        if self._breakers:
+            check_breakers(self._breakers)
+        observer = observe_saga(self._name)
+        if observer is None:
+            return await self._run_async(
+                starting_state,
+                journal,
+                executor,
+                timeout,
+                compensation_timeout,
+                compensation_strategy,
+                max_concurrent_compensations,
+                None,
+                saved,
+            )
+        observer.emit(SAGA_STARTED)
+        token = _current_saga.set(observer)
+        try:
+            state = await self._run_async(
+                starting_state,
+                journal,
+                executor,
+                timeout,
+                compensation_timeout,
+                compensation_strategy,
+                max_concurrent_compensations,
+                observer,
+                saved,
+            )
+        except BaseException as error:
+            observer.emit(SAGA_ENDED, error=error)
+            raise
+        finally:
+            _current_saga.reset(token)
+        observer.emit(SAGA_ENDED)
+        return state
+
+    async def _run_async(
+        self,
+        starting_state,
+        journal: Optional[Journal],
+        executor: Optional[Executor],
+        timeout: Optional[float],
+        compensation_timeout: Optional[float],
+        compensation_strategy: str = PARALLEL,
+        max_concurrent_compensations: Optional[int] = None,
+        observer: Optional[SagaObserver] = None,
+        saved: Optional[SagaResults] = None,
+    ):
+        recorder = None if journal is None else SagaRecorder(journal, self._name)
+        deadline = deadline_after(timeout)
+        completed_steps = _CompletedSteps(self._steps)
+        tokens = completed_steps.tokens
+        state = starting_state
+        resume_at = 0
+        if saved is not None:
+            stored = await saved.load_async()
+            resume_at = min(resume_point(stored), len(self._steps))
+            for index in range(resume_at):
+                state = stored[index]
+                tokens.append(_token_for(self._steps[index], state))
+        try:
+            for index, compiled in enumerate(self._steps[resume_at:], resume_at):
+                if recorder is not None:
+                    await recorder.record_async(STEP_STARTED, index)
+                if observer is not None:
+                    observer.emit(EXECUTE_STARTED, index, compiled.step)
+                try:
+                    if compiled.timeout is not None or deadline is not None:
+                        state = await _within_deadline(
+                            _execute_step_async(state, compiled, executor),
+                            compiled.timeout,
+                            deadline,
+                        )
+                    elif (
+                        compiled.has_retries
+                        or compiled.in_process
+                        or executor is not None
+                    ):
+                        state = await _execute_step_async(state, compiled, executor)
+                    elif compiled.async_execute:
+                        state = await compiled.step.execute(state)  # type: ignore
+                    else:
+                        state = compiled.step.execute(state)
+                except BaseException as failure:
+                    if observer is not None:
+                        observer.emit(EXECUTE_ENDED, index, compiled.step, failure)
+                    raise
+                if observer is not None:
+                    observer.emit(EXECUTE_ENDED, index, compiled.step)
+                if compiled.compensation_token is None:
+                    tokens.append(state)
+                else:
+                    tokens.append(compiled.compensation_token(state))
+                if recorder is not None:
+                    await recorder.record_async(STEP_COMPLETED, index, tokens[-1])
+                if saved is not None:
+                    await saved.save_async(index, state)
+            if recorder is not None:
+                await recorder.record_async(SAGA_FINISHED)
+            return state
+
+        except Exception as error:
+            if recorder is None and observer is None:
+                compensations = [
+                    partial(_compensate_async, compiled, token, executor)
+                    for (_index, compiled, token) in completed_steps
+                ]
+            else:
+                compensations = [
+                    partial(
+                        _compensate_tracked_async,
+                        compiled,
+                        token,
+                        index,
+                        recorder,
+                        observer,
+                        executor,
+                    )
+                    for (index, compiled, token) in completed_steps
+                ]
+            levels = [
+                (
+                    index
+                    if compiled.compensation_level is None
+                    else compiled.compensation_level
+                )
+                for (index, compiled, _token) in completed_steps
+            ]
+            # Compensation gets its own time budget rather than whatever is
+            # left of the deadline the steps just ran out of.
+            results: List[Any] = [_NOT_FINISHED] * len(compensations)
+            try:
+                await _within_deadline(
+                    schedule_compensations(
+                        compensations,
+                        levels,
+                        compensation_strategy,
+                        max_concurrent_compensations,
+                        results,
+                    ),
+                    compensation_timeout,
+                    None,
+                )
+            except StepTimedOut as timed_out:
+                # Compensations still running have been cancelled. Only those
+                # (and any that never started) are left to dead letter.
+                results = [
+                    timed_out if result is _NOT_FINISHED else result
+                    for result in results
+                ]
+            failures = [result for result in results if isinstance(result, Exception)]
+            if recorder is not None and failures == []:
+                await recorder.record_async(SAGA_FINISHED)
+            dead_letters = self._dead_letter_recorder(recorder)
+            if dead_letters is not None and failures != []:
+                await dead_letters.record_all_async(
+                    _failed_compensations(completed_steps, results)
+                )
+            if saved is not None:
+                await saved.discard_async()
+            if failures != []:
+                raise CompensationFailure(failures)
+            raise error
+
+
+def compile_transaction(
+    steps: Iterable[StepLike],
+    name: Optional[str] = None,
+    preflight: bool = False,
+    dead_letters: Optional[DeadLetterStore] = None,
+) -> TransactionPlan:
+    return TransactionPlan(
+        (compile_step(step) for step in build_step_list(steps)),
+        name=name,
+        preflight=preflight,
+        dead_letters=dead_letters,
+    )
@@ -0,0 +1,200 @@
+import array
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, List, Optional
+
+from .exceptions import InvalidStepDefinition
+from .steps import Step, StepLike, build_step, has_async_execute, has_async_compensate
+
+DEFAULT_MIN_SHARED_SIZE = 64 * 1024
+
+_default_pool: Optional[ProcessPoolExecutor] = None
+_default_pool_lock = threading.Lock()
+
+
+def default_process_pool() -> ProcessPoolExecutor:
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ProcessPoolExecutor()
+        return _default_pool
+
+
+def _untrack(block: SharedMemory) -> None:
+    # Only the process that unlinks a block should track it. Otherwise a worker
+    # exiting would try to clean up memory the parent process still owns.
+    if os.name == "posix":
+        resource_tracker.unregister(block._name, "shared_memory")  # type: ignore
+
+
+class SharedBuffer:
+    # Stands in for a large bytes, bytearray or array value while it crosses
+    # a process boundary. Only the name of the shared memory block is pickled.
+    __slots__ = ("name", "size", "kind", "typecode")
+
+    def __init__(self, name: str, size: int, kind: type, typecode: str = "") -> None:
+        self.name = name
+        self.size = size
+        self.kind = kind
+        self.typecode = typecode
+
+    def __getstate__(self):
+        return (self.name, self.size, self.kind, self.typecode)
+
+    def __setstate__(self, pickled):
+        self.name, self.size, self.kind, self.typecode = pickled
+
+    def materialize(self, unlink: bool = False) -> Any:
+        block = SharedMemory(name=self.name)
+        try:
+            data = bytes(block.buf[: self.size])  # type: ignore
+        finally:
+            block.close()
+            if unlink:
+                block.unlink()
+            else:
+                _untrack(block)
+        if self.kind is array.array:
+            values = array.array(self.typecode)
+            values.frombytes(data)
+            return values
+        return data if self.kind is bytes else self.kind(data)
+
+
+def share_large_buffers(value: Any, min_size: int, created: List[SharedMemory]) -> Any:
+    if isinstance(value, (bytes, bytearray, array.array)):
+        data = memoryview(value).cast("B")
+        if data.nbytes < min_size:
+            return value
+        block = SharedMemory(create=True, size=data.nbytes)
+        block.buf[: data.nbytes] = data  # type: ignore
+        created.append(block)
+        typecode = value.typecode if isinstance(value, array.array) else ""
+        return SharedBuffer(block.name, data.nbytes, type(value), typecode)
+    if isinstance(value, dict):
+        return {
+            key: share_large_buffers(item, min_size, created)
+            for (key, item) in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        shared = [share_large_buffers(item, min_size, created) for item in value]
+        return shared if isinstance(value, list) else tuple(shared)
+    return value
+
+
+def materialize_buffers(value: Any, unlink: bool = False) -> Any:
+    if isinstance(value, SharedBuffer):
+        return value.materialize(unlink)
+    if isinstance(value, dict):
+        return {key: materialize_buffers(item, unlink) for (key, item) in value.items()}
+    if isinstance(value, (list, tuple)):
+        materialized = [materialize_buffers(item, unlink) for item in value]
+        return materialized if isinstance(value, list) else tuple(materialized)
+    return value
+
+
+def _run_in_worker(step: Step, method: str, state: Any, min_size: int) -> Any:
+    result = getattr(step, method)(materialize_buffers(state))
+    created: List[SharedMemory] = []
+    shared_result = share_large_buffers(result, min_size, created)
+    # The parent process copies the result out and unlinks the blocks
+    for block in created:
+        block.close()
+        _untrack(block)
+    return shared_result
+
+
+class ProcessBoundStep(Step):
+    runs_in_process = True
+
+    wrapped_step: Step
+    min_shared_size: int
+    _pool: Optional[ProcessPoolExecutor]
+
+    def __init__(
+        self,
+        wrapped_step: Step,
+        pool: Optional[ProcessPoolExecutor] = None,
+        min_shared_size: int = DEFAULT_MIN_SHARED_SIZE,
+    ) -> None:
+        if has_async_execute(wrapped_step) or has_async_compensate(wrapped_step):
+            raise InvalidStepDefinition(wrapped_step)
+        self.wrapped_step = wrapped_step
+        self.min_shared_size = min_shared_size
+        self._pool = pool
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        return self._pool or default_process_pool()
+
+    def _submit(self, method: str, state: Any, created: List[SharedMemory]) -> Future:
+        shared_state = share_large_buffers(state, self.min_shared_size, created)
+        return self.pool.submit(
+            _run_in_worker,
+            self.wrapped_step,
+            method,
+            shared_state,
+            self.min_shared_size,
+        )
+
+    def _call(self, method: str, state: Any) -> Any:
+        created: List[SharedMemory] = []
+        try:
+            result = self._submit(method, state, created).result()
+        finally:
+            _release(created)
+        return materialize_buffers(result, unlink=True)
+
+    async def _call_async(self, method: str, state: Any) -> Any:
+        created: List[SharedMemory] = []
+        future = self._submit(method, state, created)
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The worker may still be running. Its blocks are released once
+            # it's done, including the ones holding its result as nothing
+            # else is left to unlink them.
+            future.add_done_callback(partial(_discard_call, created))
+            raise
+        except Exception:
+            _release(created)
+            raise
+        _release(created)
+        return materialize_buffers(result, unlink=True)
+
+    def execute(self, state):
+        return self._call("execute", state)
+
+    def compensate(self, state):
+        return self._call("compensate", state)
+
+    async def execute_async(self, state):
+        return await self._call_async("execute", state)
+
+    async def compensate_async(self, state):
+        return await self._call_async("compensate", state)
+
+
+def _release(created: List[SharedMemory]) -> None:
+    for block in created:
+        block.close()
+        block.unlink()
+
+
+def _discard_call(created: List[SharedMemory], future: Future) -> None:
+    _release(created)
+    if not future.cancelled() and future.exception() is None:
+        materialize_buffers(future.result(), unlink=True)
+
+
+def process_bound(
+    definition: StepLike,
+    pool: Optional[ProcessPoolExecutor] = None,
+    min_shared_size: int = DEFAULT_MIN_SHARED_SIZE,
+) -> ProcessBoundStep:
+    return ProcessBoundStep(build_step(definition), pool, min_shared_size)
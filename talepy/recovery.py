@@ -0,0 +1,123 @@
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Union
+
+from .exceptions import UnknownSaga
+from .journal import (
+    Journal,
+    SagaRecorder,
+    STEP_COMPLETED,
+    COMPENSATED,
+    SAGA_FINISHED,
+)
+from .plans import TransactionPlan
+
+
+class IncompleteSaga:
+    __slots__ = ("saga_id", "saga_name", "completed_steps")
+
+    saga_id: str
+    saga_name: Optional[str]
+    completed_steps: Dict[int, Any]
+
+    def __init__(self, saga_id: str, saga_name: Optional[str]) -> None:
+        self.saga_id = saga_id
+        self.saga_name = saga_name
+        self.completed_steps = {}
+
+
+class RecoveryReport:
+    recovered: List[str]
+    failed: Dict[str, List[Exception]]
+
+    def __init__(self) -> None:
+        self.recovered = []
+        self.failed = {}
+
+
+def find_incomplete_sagas(journal: Journal) -> Iterator[IncompleteSaga]:
+    # Only sagas that are still open are held in memory while the journal is
+    # streamed through. Anything finished is dropped as soon as it is seen.
+    open_sagas: Dict[str, IncompleteSaga] = {}
+    for event in journal.read():
+        if event.kind == SAGA_FINISHED:
+            open_sagas.pop(event.saga_id, None)
+            continue
+        saga = open_sagas.get(event.saga_id)
+        if saga is None:
+            saga = open_sagas[event.saga_id] = IncompleteSaga(
+                event.saga_id, event.saga_name
+            )
+        if event.kind == STEP_COMPLETED:
+            saga.completed_steps[event.step_index] = event.state  # type: ignore
+        elif event.kind == COMPENSATED:
+            saga.completed_steps.pop(event.step_index, None)  # type: ignore
+    return iter(open_sagas.values())
+
+
+def _compensate_saga(
+    saga: IncompleteSaga, plan: TransactionPlan, journal: Journal
+) -> List[Exception]:
+    recorder = SagaRecorder(journal, saga.saga_name, saga.saga_id)
+    failures: List[Exception] = []
+    for index in sorted(saga.completed_steps, reverse=True):
+        compiled = plan.steps[index]
+        try:
+            if compiled.async_compensate:
+                asyncio.run(
+                    compiled.step.compensate(saga.completed_steps[index])  # type: ignore
+                )
+            else:
+                compiled.step.compensate(saga.completed_steps[index])
+        except Exception as failure:
+            failures.append(failure)
+        else:
+            # Each compensation is checkpointed so an interrupted recovery
+            # picks up where it left off rather than starting again.
+            recorder.record(COMPENSATED, index)
+    if failures == []:
+        recorder.record(SAGA_FINISHED)
+    return failures
+
+
+def recover(
+    journal: Journal,
+    plans: Union[TransactionPlan, Mapping[str, TransactionPlan]],
+    max_workers: int = 8,
+) -> RecoveryReport:
+    report = RecoveryReport()
+
+    def plan_for(saga: IncompleteSaga) -> TransactionPlan:
+        if isinstance(plans, TransactionPlan):
+            return plans
+        if saga.saga_name is None or saga.saga_name not in plans:
+            raise UnknownSaga(saga.saga_name)
+        return plans[saga.saga_name]
+
+    def collect(future: "Future[List[Exception]]", saga: IncompleteSaga):
+        try:
+            failures = future.result()
+        except Exception as error:
+            failures = [error]
+        if failures == []:
+            report.recovered.append(saga.saga_id)
+        else:
+            report.failed[saga.saga_id] = failures
+
+    in_flight: Dict[Future, IncompleteSaga] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for saga in find_incomplete_sagas(journal):
+            try:
+                plan = plan_for(saga)
+            except UnknownSaga as error:
+                report.failed[saga.saga_id] = [error]
+                continue
+            # Keep the queue of submitted work bounded as well as the workers
+            if len(in_flight) >= max_workers * 2:
+                done: Set[Future] = wait(in_flight, return_when=FIRST_COMPLETED)[0]
+                for future in done:
+                    collect(future, in_flight.pop(future))
+            in_flight[pool.submit(_compensate_saga, saga, plan, journal)] = saga
+        for future in list(in_flight):
+            collect(future, in_flight.pop(future))
+    return report
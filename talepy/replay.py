@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import importlib
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Mapping, Optional, Set, Union
+
+from .dead_letters import (
+    DeadLetter,
+    DeadLetterStore,
+    FileDeadLetterStore,
+    SqliteDeadLetterStore,
+    describe_error,
+)
+from .exceptions import UnknownDeadLetterStep, UnknownSaga
+from .metrics import step_name
+from .plans import CompiledStep, TransactionPlan
+from .retries import RetryPolicy
+
+
+class ReplayReport:
+    resolved: List[str]
+    failed: Dict[str, List[Exception]]
+
+    def __init__(self) -> None:
+        self.resolved = []
+        self.failed = {}
+
+
+def _replay_letter(
+    letter: DeadLetter,
+    compiled: CompiledStep,
+    store: DeadLetterStore,
+    policy: RetryPolicy,
+) -> List[Exception]:
+    failures: List[Exception] = []
+    started = time.monotonic()
+    while True:
+        try:
+            if compiled.async_compensate:
+                asyncio.run(compiled.step.compensate(letter.state))  # type: ignore
+            else:
+                compiled.step.compensate(letter.state)
+        except Exception as failure:
+            failures.append(failure)
+            store.record_failure(letter.letter_id, describe_error(failure))
+            delay = policy.delay(len(failures))
+            if not policy.should_retry(len(failures), started, delay):
+                return failures
+            time.sleep(delay)
+        else:
+            store.resolve(letter.letter_id)
+            return []
+
+
+def replay_dead_letters(
+    store: DeadLetterStore,
+    plans: Union[TransactionPlan, Mapping[str, TransactionPlan]],
+    max_workers: int = 8,
+    policy: Optional[RetryPolicy] = None,
+    limit: Optional[int] = None,
+) -> ReplayReport:
+    # Each letter's compensation is retried with the policy's backoff until it
+    # succeeds (and the letter is resolved) or the policy gives up. Every
+    # failure is added to the letter's history.
+    policy = policy or RetryPolicy()
+    report = ReplayReport()
+
+    def step_for(letter: DeadLetter) -> CompiledStep:
+        if isinstance(plans, TransactionPlan):
+            plan = plans
+        elif letter.saga_name is None or letter.saga_name not in plans:
+            raise UnknownSaga(letter.saga_name)
+        else:
+            plan = plans[letter.saga_name]
+        # The plan may have changed since the letter was written
+        if letter.step_index >= len(plan) or (
+            step_name(plan.steps[letter.step_index].step) != letter.step_name
+        ):
+            raise UnknownDeadLetterStep(
+                letter.saga_name, letter.step_index, letter.step_name
+            )
+        return plan.steps[letter.step_index]
+
+    def collect(future: "Future[List[Exception]]", letter: DeadLetter):
+        try:
+            failures = future.result()
+        except Exception as error:
+            failures = [error]
+        if failures == []:
+            report.resolved.append(letter.letter_id)
+        else:
+            report.failed[letter.letter_id] = failures
+
+    in_flight: Dict[Future, DeadLetter] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for count, letter in enumerate(store.pending()):
+            if limit is not None and count >= limit:
+                break
+            try:
+                compiled = step_for(letter)
+            except (UnknownSaga, UnknownDeadLetterStep) as error:
+                report.failed[letter.letter_id] = [error]
+                continue
+            if len(in_flight) >= max_workers * 2:
+                done: Set[Future] = wait(in_flight, return_when=FIRST_COMPLETED)[0]
+                for future in done:
+                    collect(future, in_flight.pop(future))
+            submitted = pool.submit(_replay_letter, letter, compiled, store, policy)
+            in_flight[submitted] = letter
+        for future in list(in_flight):
+            collect(future, in_flight.pop(future))
+    return report
+
+
+def _load_plans(location: str) -> Union[TransactionPlan, Mapping[str, TransactionPlan]]:
+    module_name, _, attribute = location.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m talepy.replay",
+        description="Retry the compensations held in a dead letter store",
+    )
+    parser.add_argument("store", help="path to the dead letter store")
+    parser.add_argument(
+        "--file", action="store_true", help="the store is a file, not SQLite"
+    )
+    parser.add_argument(
+        "--plans",
+        help="module:attribute of the plan, or a dict of plans by saga name",
+    )
+    parser.add_argument("--list", action="store_true", help="only list the letters")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=3, help="attempts per letter")
+    parser.add_argument("--limit", type=int, help="replay at most this many letters")
+    args = parser.parse_args(argv)
+    if not args.list and not args.plans:
+        parser.error("--plans is needed to replay letters")
+
+    store_type = FileDeadLetterStore if args.file else SqliteDeadLetterStore
+    with store_type(args.store) as store:
+        if args.list:
+            for letter in store.pending():
+                print(
+                    f"{letter.letter_id} {letter.saga_name} step {letter.step_index}"
+                    f" ({letter.step_name}): {letter.attempts} failures,"
+                    f" last {letter.errors[-1]}"
+                )
+            return 0
+        report = replay_dead_letters(
+            store,
+            _load_plans(args.plans),
+            max_workers=args.max_workers,
+            policy=RetryPolicy(max_attempts=args.attempts),
+            limit=args.limit,
+        )
+    print(f"{len(report.resolved)} resolved, {len(report.failed)} still failing")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
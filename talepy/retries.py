@@ -1,12 +1,38 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import random
+import time
 from abc import ABC, abstractmethod
-from typing import List, TypeVar
+from collections import deque
+from concurrent.futures import Executor
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TypeVar,
+)
 
 from .exceptions import AbortRetries, FailuresAfterRetrying
-from .steps import Step
+from .hooks import notify_retry
+from .steps import Step, has_async_execute, has_async_compensate, marker_of
+
+logger = logging.getLogger(__name__)
 
 InputState = TypeVar("InputState")
 OutputState = TypeVar("OutputState")
 
+# Undoes whatever a call went on to do after its caller stopped waiting for it
+Undo = Callable[[Any], Awaitable[Any]]
+
 
 class StepWithRetries(Step[InputState, OutputState], ABC):
     @abstractmethod
@@ -14,32 +40,277 @@ class StepWithRetries(Step[InputState, OutputState], ABC):
         pass
 
 
-def attempt_retries(step: Step, times: int) -> StepWithRetries:
-    class AutoRetryStep(StepWithRetries):
-        def __init__(self, wrapped_step: Step, max_tries: int) -> None:
-            self.wrapped_step = wrapped_step
-            self.attempts_made = 0
-            self.max_tries = max_tries
+DEFAULT_MAX_HISTORY = 32
+
+
+class FailureHistory(Sequence[Exception]):
+    # Only the most recent failures are kept so a long run of retries doesn't
+    # hold on to every exception (and traceback) it has seen. `total` still
+    # counts every failure.
+    _kept: Deque[Exception]
+    total: int
+
+    def __init__(
+        self, failures: Iterable[Exception] = (), max_kept: int = DEFAULT_MAX_HISTORY
+    ) -> None:
+        self._kept = deque(maxlen=max_kept)
+        self.total = 0
+        for failure in failures:
+            self.append(failure)
+
+    def append(self, failure: Exception) -> None:
+        self._kept.append(failure)
+        self.total += 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._kept)[index]
+        return self._kept[index]
+
+    def __len__(self) -> int:
+        return len(self._kept)
+
+
+class RetryPolicy:
+    max_attempts: int
+    initial_delay: float
+    max_delay: float
+    backoff: float
+    jitter: bool
+    max_elapsed: Optional[float]
+    max_history: int
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        initial_delay: float = 0.1,
+        max_delay: float = 10.0,
+        backoff: float = 2.0,
+        jitter: bool = True,
+        max_elapsed: Optional[float] = None,
+        max_history: int = DEFAULT_MAX_HISTORY,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.max_history = max_history
+
+    def delay(self, failures: int) -> float:
+        # Exponential backoff with "full jitter" so many sagas failing at the
+        # same moment don't all retry at the same moment too.
+        delay = min(self.max_delay, self.initial_delay * self.backoff ** (failures - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def should_retry(self, failures: int, started: float, delay: float) -> bool:
+        if failures >= self.max_attempts:
+            return False
+        if self.max_elapsed is not None:
+            return time.monotonic() - started + delay <= self.max_elapsed
+        return True
+
+
+class RetryingStep(StepWithRetries):
+    wrapped_step: Step
+    policy: RetryPolicy
+
+    def __init__(self, wrapped_step: Step, policy: RetryPolicy) -> None:
+        self.wrapped_step = wrapped_step
+        self.policy = policy
+
+    def compensate(self, state):
+        return self.wrapped_step.compensate(state)
+
+    def execute(self, state):
+        return self.wrapped_step.execute(state)
+
+    # Only called when a step further down runs in a process pool or
+    # coalesces its compensations (see compile_step)
+    async def execute_async(self, state):
+        return await self.wrapped_step.execute_async(state)  # type: ignore
+
+    async def compensate_async(self, state):
+        return await self.wrapped_step.compensate_async(state)  # type: ignore
+
+    def retry(self, state, failures: List[Exception]):
+        attempts = getattr(failures, "total", len(failures))
+        if attempts >= self.policy.max_attempts:
+            raise AbortRetries("Maximum number of attempts hit")
+        time.sleep(self.policy.delay(attempts))
+        return self.execute(state)
 
-        def compensate(self, state) -> None:
-            self.wrapped_step.compensate(state)
 
-        def execute(self, state):
-            self.attempts_made += 1
-            return self.wrapped_step.execute(state)
+class _AsyncExecuteRetryingStep(RetryingStep):
+    async def execute(self, state):
+        return await self.wrapped_step.execute(state)  # type: ignore
 
-        def retry(self, state, _failures):
-            if self.attempts_made > self.max_tries:
-                raise AbortRetries("Maximum number of retries hit")
-            return self.execute(state)
 
-    return AutoRetryStep(step, times)
+class _AsyncCompensateRetryingStep(RetryingStep):
+    async def compensate(self, state):
+        return await self.wrapped_step.compensate(state)  # type: ignore
+
+
+class _AsyncRetryingStep(_AsyncExecuteRetryingStep, _AsyncCompensateRetryingStep):
+    pass
+
+
+def retry_with_policy(step: Step, policy: RetryPolicy) -> RetryingStep:
+    # The wrapper has to be async wherever the wrapped step is so the runners
+    # classify it correctly.
+    if has_async_execute(step) and has_async_compensate(step):
+        return _AsyncRetryingStep(step, policy)
+    if has_async_execute(step):
+        return _AsyncExecuteRetryingStep(step, policy)
+    if has_async_compensate(step):
+        return _AsyncCompensateRetryingStep(step, policy)
+    return RetryingStep(step, policy)
+
+
+def attempt_retries(step: Step, times: int) -> StepWithRetries:
+    # Attempts are counted per invocation by the retry engine so the returned
+    # step can safely be shared between concurrently running transactions.
+    return retry_with_policy(
+        step, RetryPolicy(max_attempts=times + 1, initial_delay=0, jitter=False)
+    )
+
+
+def _retry_with_policy(state, step: RetryingStep, failures: FailureHistory):
+    policy = step.policy
+    started = time.monotonic()
+    while True:
+        delay = policy.delay(failures.total)
+        if not policy.should_retry(failures.total, started, delay):
+            raise FailuresAfterRetrying(list(failures), failures.total)
+        time.sleep(delay)
+        notify_retry(step, failures.total + 1, failures[-1])
+        try:
+            return step.execute(state)
+        except AbortRetries:
+            raise FailuresAfterRetrying(list(failures), failures.total)
+        except Exception as e:
+            failures.append(e)
 
 
 def execute_step_retry(state, step: StepWithRetries, previous_errors: List[Exception]):
+    if isinstance(step, RetryingStep):
+        history = FailureHistory(previous_errors, step.policy.max_history)
+        return _retry_with_policy(state, step, history)
+    # Steps with their own retry have always been given a list of every
+    # failure so the bounded history is only used with a RetryPolicy
+    failures = list(previous_errors)
+    while True:
+        notify_retry(step, len(failures) + 1, failures[-1])
+        try:
+            return step.retry(state, failures)  # type: ignore
+        except AbortRetries as _give_up:
+            raise FailuresAfterRetrying(failures)
+        except Exception as e:
+            failures.append(e)
+
+
+# Undos still waiting for their thread. The event loop only keeps weak
+# references to tasks so they're held here until they finish.
+_pending_undos: Set["asyncio.Task[None]"] = set()
+
+
+async def _undo_once_finished(future: "asyncio.Future[Any]", undo: Undo) -> None:
     try:
-        return step.retry(state, previous_errors)
-    except AbortRetries as _give_up:
-        raise FailuresAfterRetrying(previous_errors)
-    except Exception as e:
-        return execute_step_retry(state, step, previous_errors + [e])
+        result = await future
+    except Exception:
+        return
+    await undo(result)
+
+
+def _undo_finished(task: "asyncio.Task[None]") -> None:
+    _pending_undos.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Undoing a cancelled call failed", exc_info=task.exception())
+
+
+async def call_step_method(
+    method: Callable[..., Any],
+    *args,
+    executor: Optional[Executor] = None,
+    undo: Optional[Undo] = None,
+):
+    # Sync methods are run in the executor (if there is one) so they can't
+    # block the event loop. Anything returning an awaitable is awaited.
+    if executor is not None and not inspect.iscoroutinefunction(method):
+        # run_in_executor doesn't carry context variables (like the time
+        # remaining before a deadline) over to the thread by itself
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(context.run, method, *args)
+        )
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The thread can't be stopped. If the caller is given an `undo` the
+            # thread is waited for in the background and, if the method went
+            # on to succeed, undone as nothing else knows it ran. The caller
+            # isn't held up so timeouts still end the saga on time.
+            if undo is not None:
+                task = asyncio.ensure_future(_undo_once_finished(future, undo))
+                _pending_undos.add(task)
+                task.add_done_callback(_undo_finished)
+            raise
+    else:
+        result = method(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def _retry_with_policy_async(
+    state,
+    step: RetryingStep,
+    failures: FailureHistory,
+    executor: Optional[Executor],
+    undo: Optional[Undo],
+):
+    policy = step.policy
+    started = time.monotonic()
+    # A step run in a process pool is awaited rather than blocking on the pool
+    execute = (
+        step.execute_async
+        if marker_of(step, "runs_in_process", False)
+        else step.execute
+    )
+    while True:
+        delay = policy.delay(failures.total)
+        if not policy.should_retry(failures.total, started, delay):
+            raise FailuresAfterRetrying(list(failures), failures.total)
+        # Backing off never blocks the event loop or holds a thread
+        await asyncio.sleep(delay)
+        notify_retry(step, failures.total + 1, failures[-1])
+        try:
+            return await call_step_method(execute, state, executor=executor, undo=undo)
+        except AbortRetries:
+            raise FailuresAfterRetrying(list(failures), failures.total)
+        except Exception as e:
+            failures.append(e)
+
+
+async def execute_step_retry_async(
+    state,
+    step: StepWithRetries,
+    previous_errors: List[Exception],
+    executor: Optional[Executor] = None,
+    undo: Optional[Undo] = None,
+):
+    if isinstance(step, RetryingStep):
+        history = FailureHistory(previous_errors, step.policy.max_history)
+        return await _retry_with_policy_async(state, step, history, executor, undo)
+    failures = list(previous_errors)
+    while True:
+        notify_retry(step, len(failures) + 1, failures[-1])
+        try:
+            return await call_step_method(
+                step.retry, state, failures, executor=executor, undo=undo
+            )
+        except AbortRetries as _give_up:
+            raise FailuresAfterRetrying(failures)
+        except Exception as e:
+            failures.append(e)
@@ -1,5 +1,10 @@
+import inspect
+from weakref import WeakKeyDictionary
 from typing import (
     Any,
+    List,
+    Optional,
+    Sequence,
     Callable,
     Iterable,
     TypeVar,
@@ -30,18 +35,49 @@ class Step(Protocol[InputState, OutputState]):
         ...
 
 
+class BatchStep(Step[InputState, OutputState], Protocol):
+    # Optional extension of Step. Each item in the returned list is either the
+    # new state for the matching input state or the Exception it failed with.
+    def execute_batch(
+        self, states: Sequence[InputState]
+    ) -> Union[
+        List[Union[OutputState, Exception]],
+        Awaitable[List[Union[OutputState, Exception]]],
+    ]:
+        ...
+
+    # May return None if every compensation worked or a list of an optional
+    # Exception per state.
+    def compensate_batch(
+        self, states: Sequence[OutputState]
+    ) -> Union[
+        Optional[List[Optional[Exception]]],
+        Awaitable[Optional[List[Optional[Exception]]]],
+    ]:
+        ...
+
+
 X = TypeVar("X")
 Y = TypeVar("Y")
 
 
+def _no_compensation(_state: Any) -> None:
+    # Module level (unlike a lambda) so a LambdaStep can be pickled, e.g. to
+    # run it in a process pool
+    pass
+
+
 class LambdaStep(Step[X, Y]):
+    # Lambdas are expected to be cheap so are never handed off to an executor
+    runs_inline = True
+
     def __init__(
         self,
         execute_lambda: Callable[[X], Y],
         compensate_lambda: Callable[[Y], Any] = None,
     ) -> None:
         self.execute_lambda = execute_lambda
-        self.compensate_lambda = compensate_lambda or (lambda _x: None)
+        self.compensate_lambda = compensate_lambda or _no_compensation
 
     def execute(self, state):
         return self.execute_lambda(state)
@@ -53,9 +89,33 @@ class LambdaStep(Step[X, Y]):
 StepLike = Union[Step, FunctionPair, PlainStateChangingFunction]
 
 
+# Step is a runtime checkable protocol so isinstance checks are slow. Whether a
+# type provides the step methods itself is cached here, keyed weakly by type.
+_step_types: "WeakKeyDictionary[type, bool]" = WeakKeyDictionary()
+
+
+def _has_step_methods(thing: Any) -> bool:
+    return (
+        getattr(thing, "execute", None) is not None
+        and getattr(thing, "compensate", None) is not None
+    )
+
+
+def is_step(definition: Any) -> bool:
+    definition_type = type(definition)
+    type_is_step = _step_types.get(definition_type)
+    if type_is_step is None:
+        type_is_step = Step in definition_type.__mro__ or _has_step_methods(
+            definition_type
+        )
+        _step_types[definition_type] = type_is_step
+    # Instances can still satisfy the protocol with attributes of their own
+    return type_is_step or _has_step_methods(definition)
+
+
 def build_step(definition: StepLike) -> Step:
-    if isinstance(definition, Step):
-        return definition
+    if is_step(definition):
+        return definition  # type: ignore
     if isinstance(definition, tuple) and is_arity_one_pair(definition):
         return LambdaStep(definition[0], definition[1])
     if callable(definition) and arity(definition) == 1:
@@ -66,3 +126,89 @@ def build_step(definition: StepLike) -> Step:
 
 def build_step_list(step_definitions: Iterable[StepLike]) -> Iterable[Step]:
     return map(build_step, step_definitions)
+
+
+class MarkedStep(Step):
+    # Changes how the runners treat the step it wraps (a timeout, running it
+    # inline...) without setting anything on the step itself, which may be
+    # shared with other plans or have __slots__.
+    wrapped_step: Step
+
+    def __init__(self, wrapped_step: Step, marker: str, value: Any) -> None:
+        self.wrapped_step = wrapped_step
+        setattr(self, marker, value)
+
+    def execute(self, state):
+        return self.wrapped_step.execute(state)
+
+    def compensate(self, state):
+        return self.wrapped_step.compensate(state)
+
+    # Only called when a step further down runs in a process pool or
+    # coalesces its compensations (see compile_step)
+    async def execute_async(self, state):
+        return await self.wrapped_step.execute_async(state)  # type: ignore
+
+    async def compensate_async(self, state):
+        return await self.wrapped_step.compensate_async(state)  # type: ignore
+
+
+class _AsyncExecuteMarkedStep(MarkedStep):
+    async def execute(self, state):
+        return await self.wrapped_step.execute(state)  # type: ignore
+
+
+class _AsyncCompensateMarkedStep(MarkedStep):
+    async def compensate(self, state):
+        return await self.wrapped_step.compensate(state)  # type: ignore
+
+
+class _AsyncMarkedStep(_AsyncExecuteMarkedStep, _AsyncCompensateMarkedStep):
+    pass
+
+
+def mark_step(definition: StepLike, marker: str, value: Any) -> MarkedStep:
+    # The wrapper has to be async wherever the wrapped step is so the runners
+    # classify it correctly when it's wrapped again (by retries say).
+    step = build_step(definition)
+    if has_async_execute(step) and has_async_compensate(step):
+        return _AsyncMarkedStep(step, marker, value)
+    if has_async_execute(step):
+        return _AsyncExecuteMarkedStep(step, marker, value)
+    if has_async_compensate(step):
+        return _AsyncCompensateMarkedStep(step, marker, value)
+    return MarkedStep(step, marker, value)
+
+
+def marker_of(step: Step, marker: str, default: Any = None) -> Any:
+    # Looks through wrappers (retries, breakers, other markers...) as a step
+    # can be marked before or after it's wrapped
+    current: Optional[Step] = step
+    while current is not None:
+        value = getattr(current, marker, None)
+        if value is not None:
+            return value
+        current = getattr(current, "wrapped_step", None)
+    return default
+
+
+def run_inline(definition: StepLike) -> Step:
+    # Marks a step as cheap enough to call directly on the event loop even
+    # when the async runners are given an executor for sync steps.
+    return mark_step(definition, "runs_inline", True)
+
+
+def has_batch_execute(step: Step) -> bool:
+    return getattr(step, "execute_batch", None) is not None
+
+
+def has_batch_compensate(step: Step) -> bool:
+    return getattr(step, "compensate_batch", None) is not None
+
+
+def has_async_execute(step: Step) -> bool:
+    return inspect.iscoroutinefunction(step.execute)
+
+
+def has_async_compensate(step: Step) -> bool:
+    return inspect.iscoroutinefunction(step.compensate)
@@ -0,0 +1,193 @@
+import contextvars
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+
+from .async_transactions import _NOT_FINISHED
+from .compensation import check_concurrency_limit
+from .dead_letters import DeadLetterRecorder, DeadLetterStore
+from .exceptions import AsyncStepFailures, AsyncStepUsedInSyncTransaction
+from .hooks import (
+    SagaObserver,
+    observe_saga,
+    _current_saga,
+    SAGA_STARTED,
+    SAGA_ENDED,
+    EXECUTE_STARTED,
+    EXECUTE_ENDED,
+    COMPENSATION_STARTED,
+    COMPENSATION_ENDED,
+)
+from .plans import CompiledStep, compile_step, _execute_step, _token_for
+from .steps import StepLike, build_step_list
+
+DEFAULT_MAX_WORKERS = 32
+
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def shared_executor() -> ThreadPoolExecutor:
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(
+                DEFAULT_MAX_WORKERS, thread_name_prefix="talepy"
+            )
+        return _shared_executor
+
+
+def configure_shared_executor(max_workers: int) -> None:
+    # Work already submitted to the old pool is allowed to finish
+    global _shared_executor
+    with _shared_executor_lock:
+        previous = _shared_executor
+        _shared_executor = ThreadPoolExecutor(max_workers, thread_name_prefix="talepy")
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def _run_all(
+    run: Callable[[int], Any],
+    count: int,
+    workers: int,
+    executor: Executor,
+    fail_fast: bool = False,
+) -> List[Any]:
+    # The thread version of the async runner's gather helpers. The calling
+    # thread works through the items too so it is never left waiting on a
+    # pool that is busy with other transactions. With fail_fast nothing new
+    # is started after the first failure and anything that didn't start is
+    # left as _NOT_FINISHED.
+    results: List[Any] = [_NOT_FINISHED] * count
+    remaining = iter(range(count))
+    remaining_lock = threading.Lock()
+    failed = threading.Event()
+
+    def worker():
+        while not (fail_fast and failed.is_set()):
+            with remaining_lock:
+                index = next(remaining, None)
+            if index is None:
+                return
+            try:
+                results[index] = run(index)
+            except Exception as error:
+                results[index] = error
+                failed.set()
+
+    helpers = [
+        executor.submit(contextvars.copy_context().run, worker)
+        for _ in range(workers - 1)
+    ]
+    worker()
+    for helper in helpers:
+        helper.result()
+    return results
+
+
+def _execute(
+    compiled: CompiledStep, state, index: int, observer: Optional[SagaObserver]
+):
+    if observer is None:
+        return _execute_step(state, compiled.step)
+    observer.emit(EXECUTE_STARTED, index, compiled.step)
+    try:
+        result = _execute_step(state, compiled.step)
+    except Exception as failure:
+        observer.emit(EXECUTE_ENDED, index, compiled.step, failure)
+        raise
+    observer.emit(EXECUTE_ENDED, index, compiled.step)
+    return result
+
+
+def _compensate(
+    compiled: CompiledStep, state, index: int, observer: Optional[SagaObserver]
+):
+    if observer is None:
+        return compiled.step.compensate(state)
+    observer.emit(COMPENSATION_STARTED, index, compiled.step)
+    try:
+        compiled.step.compensate(state)
+    except Exception as failure:
+        observer.emit(COMPENSATION_ENDED, index, compiled.step, failure)
+        raise
+    observer.emit(COMPENSATION_ENDED, index, compiled.step)
+
+
+def _run_concurrent(
+    steps: List[CompiledStep],
+    starting_state,
+    workers: int,
+    fail_fast: bool,
+    executor: Executor,
+    observer: Optional[SagaObserver],
+    dead_letters: Optional[DeadLetterStore] = None,
+) -> List[Any]:
+    results = _run_all(
+        lambda index: _execute(steps[index], starting_state, index, observer),
+        len(steps),
+        workers,
+        executor,
+        fail_fast,
+    )
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures != []:
+        completed = [
+            index
+            for (index, result) in enumerate(results)
+            if result is not _NOT_FINISHED and not isinstance(result, Exception)
+        ]
+        tokens = [_token_for(steps[index], results[index]) for index in completed]
+
+        def compensate(item: int):
+            index = completed[item]
+            return _compensate(steps[index], tokens[item], index, observer)
+
+        compensations = _run_all(
+            compensate, len(completed), min(workers, len(completed)), executor
+        )
+        if dead_letters is not None:
+            letters = DeadLetterRecorder(dead_letters)
+            for index, token, result in zip(completed, tokens, compensations):
+                if isinstance(result, Exception):
+                    letters.record(index, steps[index].step, token, result)
+        raise AsyncStepFailures(failures)
+    return results
+
+
+def run_concurrent_transaction(
+    step_defs: Iterable[StepLike],
+    starting_state=None,
+    max_workers: Optional[int] = None,
+    fail_fast: bool = False,
+    executor: Optional[Executor] = None,
+    dead_letters: Optional[DeadLetterStore] = None,
+) -> List[Any]:
+    # Every step is given the starting state and run on a thread. If any fail
+    # the rest are compensated. At most `max_workers` steps of this transaction
+    # run at once.
+    check_concurrency_limit(max_workers, "max_workers")
+    steps = [compile_step(step) for step in build_step_list(step_defs)]
+    if any(compiled.async_execute for compiled in steps):
+        raise AsyncStepUsedInSyncTransaction
+    workers = len(steps) if max_workers is None else min(max_workers, len(steps))
+    pool = shared_executor() if executor is None else executor
+    observer = observe_saga()
+    if observer is None:
+        return _run_concurrent(
+            steps, starting_state, workers, fail_fast, pool, None, dead_letters
+        )
+    observer.emit(SAGA_STARTED)
+    token = _current_saga.set(observer)
+    try:
+        results = _run_concurrent(
+            steps, starting_state, workers, fail_fast, pool, observer, dead_letters
+        )
+    except Exception as error:
+        observer.emit(SAGA_ENDED, error=error)
+        raise
+    finally:
+        _current_saga.reset(token)
+    observer.emit(SAGA_ENDED)
+    return results
@@ -1,12 +1,18 @@
+import asyncio
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from talepy.async_transactions import run_transaction
 from talepy.exceptions import (
     AsyncStepFailures,
     AsyncStepUsedInSyncTransaction,
-    RetriesCannotBeUsedInConcurrent,
 )
 from talepy.retries import attempt_retries
+from talepy.steps import Step, run_inline
 from tests.mocks import (
     MockCountingStep,
     MockAsyncExecuteStep,
@@ -57,3 +63,78 @@ async def test_if_a_transaction_fails_all_compensations_are_applied():
 
     assert step_one.actions_taken == ["run execute: 0", "run compensate: 1"]
     assert step_two.actions_taken == ["run execute: 1", "run compensate: 2"]
+
+
+class BlockingStep(Step):
+    def __init__(self):
+        self.threads: typing.List[int] = []
+
+    def execute(self, state):
+        self.threads.append(threading.get_ident())
+        time.sleep(0.2)
+        return state + 1
+
+    def compensate(self, state):
+        self.threads.append(threading.get_ident())
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        yield executor
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(5)
+async def test_blocking_sync_steps_can_be_run_in_an_executor(executor):
+    steps = [BlockingStep() for _ in range(10)]
+    started = time.monotonic()
+
+    results = await asyncio.gather(
+        *(run_transaction([step], 0, executor=executor) for step in steps)
+    )
+
+    assert results == [1] * 10
+    # Run one after another on the event loop these would take 2 seconds
+    assert time.monotonic() - started < 1
+    assert threading.get_ident() not in steps[0].threads
+
+
+@pytest.mark.asyncio
+async def test_compensations_are_run_in_the_executor_too(executor):
+    step = BlockingStep()
+
+    with pytest.raises(AlwaysFailException):
+        await run_transaction([step, AlwaysFailsStep()], 0, executor=executor)
+
+    assert len(step.threads) == 2
+    assert threading.get_ident() not in step.threads
+
+
+@pytest.mark.asyncio
+async def test_steps_can_opt_out_of_the_executor(executor):
+    step = BlockingStep()
+    threads: typing.List[int] = []
+
+    def record_thread(state):
+        threads.append(threading.get_ident())
+        return state
+
+    await run_transaction(
+        [run_inline(step), record_thread],
+        0,
+        executor=executor,
+    )
+
+    assert step.threads == [threading.get_ident()]
+    assert threads == [threading.get_ident()]
+
+
+@pytest.mark.asyncio
+async def test_running_inline_only_applies_where_the_step_was_marked(executor):
+    step = BlockingStep()
+    run_inline(step)
+
+    await run_transaction([step], 0, executor=executor)
+
+    assert threading.get_ident() not in step.threads
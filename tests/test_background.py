@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from talepy import compile_transaction
+from talepy.background import BackgroundLoop, default_loop, run_transaction
+from talepy.exceptions import BackgroundLoopClosed, CalledFromBackgroundLoop
+from tests.mocks import (
+    MockCountingStep,
+    MockAsyncExecuteAndCompensateStep,
+    AlwaysFailsStep,
+    AlwaysFailException,
+)
+
+
+@pytest.fixture
+def background():
+    loop = BackgroundLoop()
+    yield loop
+    loop.close()
+
+
+def test_async_steps_can_be_run_from_sync_code(background):
+    step = MockAsyncExecuteAndCompensateStep()
+
+    assert background.run_transaction([step, MockCountingStep()], 0) == 2
+    assert step.actions_taken == ["run execute: 0"]
+
+
+def test_failures_are_compensated_and_raised_in_the_caller(background):
+    step = MockAsyncExecuteAndCompensateStep()
+
+    with pytest.raises(AlwaysFailException):
+        background.run_transaction([step, AlwaysFailsStep()], 0)
+
+    assert step.actions_taken == ["run execute: 0", "run compensate: 1"]
+
+
+def test_compiled_plans_and_run_async_options_are_accepted(background):
+    plan = compile_transaction([MockAsyncExecuteAndCompensateStep()])
+
+    assert background.run_transaction(plan, 1, timeout=1.0) == 2
+
+
+def test_every_call_uses_the_same_loop(background):
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert background.run(current_loop()) is background.run(current_loop())
+    assert background.run(current_loop()) is background.loop
+
+
+def test_calls_from_many_threads_share_the_loop(background):
+    results = []
+
+    def call():
+        results.append(background.run_transaction([MockCountingStep()], 0))
+
+    threads = [threading.Thread(target=call) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [1] * 10
+
+
+def test_a_call_that_times_out_is_cancelled(background):
+    cancelled = threading.Event()
+
+    async def forever():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TimeoutError):
+        background.run(forever(), timeout=0.01)
+    assert cancelled.wait(1)
+
+
+def test_the_loop_thread_cannot_wait_on_itself(background):
+    async def nested():
+        return background.run(asyncio.sleep(0))
+
+    with pytest.raises(CalledFromBackgroundLoop):
+        background.run(nested())
+
+
+def test_closing_waits_for_running_sagas_then_runs_close_callbacks():
+    background = BackgroundLoop()
+    events = []
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        events.append("saga finished")
+
+    async def close_pool():
+        events.append("pool closed")
+
+    background.on_close(close_pool)
+    future = background.submit(slow())
+    background.close()
+
+    assert future.result() is None
+    assert events == ["saga finished", "pool closed"]
+    assert background.loop.is_closed()
+
+
+def test_closing_cancels_sagas_that_outlive_the_timeout():
+    background = BackgroundLoop()
+    future = background.submit(asyncio.sleep(10))
+
+    background.close(timeout=0.01)
+
+    assert future.cancelled()
+
+
+def test_a_closed_loop_rejects_new_work():
+    background = BackgroundLoop()
+    background.close()
+
+    with pytest.raises(BackgroundLoopClosed):
+        background.run_transaction([MockCountingStep()], 0)
+
+
+def test_the_default_loop_is_shared():
+    assert run_transaction([MockAsyncExecuteAndCompensateStep()], 0) == 1
+    assert default_loop() is default_loop()
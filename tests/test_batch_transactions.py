@@ -0,0 +1,247 @@
+import asyncio
+import time
+
+import pytest
+
+from talepy import compile_transaction
+from talepy.batch import (
+    run_transactions_batch,
+    run_transactions_batch_async,
+    run_transactions_lockstep,
+    run_transactions_lockstep_async,
+)
+from talepy.exceptions import (
+    CompensationFailure,
+    InvalidBatchResult,
+    InvalidConcurrencyLimit,
+)
+from tests.mocks import MockCountingStep, AlwaysFailException
+
+
+def fail_on_three(state):
+    if state == 3:
+        raise AlwaysFailException("three")
+    return state
+
+
+def test_every_state_gets_a_result():
+    results = run_transactions_batch([lambda x: x * 2], range(10))
+
+    assert sorted((r.position, r.state) for r in results) == [
+        (i, i * 2) for i in range(10)
+    ]
+
+
+def test_a_failure_only_compensates_its_own_transaction():
+    counter = MockCountingStep()
+    results = list(
+        run_transactions_batch([counter, fail_on_three], [0, 2], max_concurrency=1)
+    )
+
+    by_index = {result.position: result for result in results}
+    assert by_index[0].succeeded and by_index[0].state == 1
+    assert not by_index[1].succeeded
+    assert isinstance(by_index[1].error, AlwaysFailException)
+    assert counter.actions_taken == [
+        "run execute: 0",
+        "run execute: 2",
+        "run compensate: 3",
+    ]
+
+
+def test_a_compiled_plan_can_be_batched():
+    plan = compile_transaction([lambda x: x + 1])
+
+    assert {r.state for r in run_transactions_batch(plan, [1, 2])} == {2, 3}
+
+
+def test_transactions_run_concurrently():
+    def slow(state):
+        time.sleep(0.1)
+        return state
+
+    started = time.monotonic()
+    list(run_transactions_batch([slow], range(20), max_concurrency=20))
+
+    assert time.monotonic() - started < 1
+
+
+def test_states_are_consumed_lazily():
+    consumed = []
+
+    def states():
+        for i in range(1000):
+            consumed.append(i)
+            yield i
+
+    results = run_transactions_batch([lambda x: x], states(), max_concurrency=2)
+    next(results)
+
+    assert len(consumed) < 10
+    results.close()
+
+
+@pytest.mark.asyncio
+async def test_async_batches_stream_back_results():
+    async def slow(state):
+        await asyncio.sleep(0.01)
+        return fail_on_three(state)
+
+    class Slow:
+        execute = staticmethod(slow)
+
+        async def compensate(self, state):
+            pass
+
+    results = [
+        result
+        async for result in run_transactions_batch_async(
+            [Slow()], range(100), max_concurrency=10
+        )
+    ]
+
+    assert len(results) == 100
+    failures = [result for result in results if not result.succeeded]
+    assert [failure.starting_state for failure in failures] == [3]
+
+
+class BulkBooking:
+    def __init__(self):
+        self.batches = []
+        self.compensated = []
+
+    def execute(self, state):
+        raise AssertionError("should have been batched")
+
+    def compensate(self, state):
+        raise AssertionError("should have been batched")
+
+    def execute_batch(self, states):
+        self.batches.append(list(states))
+        return [
+            AlwaysFailException(state) if state == 3 else state + 10 for state in states
+        ]
+
+    def compensate_batch(self, states):
+        self.compensated.append(list(states))
+
+
+def test_batch_steps_are_called_once_per_chunk():
+    booking = BulkBooking()
+    results = list(run_transactions_lockstep([booking], range(5), chunk_size=3))
+
+    assert booking.batches == [[0, 1, 2], [3, 4]]
+    assert sorted(r.state for r in results if r.succeeded) == [10, 11, 12, 14]
+
+
+def test_failed_items_are_compensated_as_a_batch():
+    booking = BulkBooking()
+    results = list(run_transactions_lockstep([booking, fail_on_three], [1, 2, -7, 4]))
+
+    assert booking.compensated == [[3]]
+    failure = [r for r in results if not r.succeeded][0]
+    assert failure.starting_state == -7
+    assert isinstance(failure.error, AlwaysFailException)
+
+
+def test_batch_and_single_steps_can_be_mixed():
+    counter = MockCountingStep()
+    booking = BulkBooking()
+    results = list(run_transactions_lockstep([counter, booking], [0, 2, 5]))
+
+    assert booking.batches == [[1, 3, 6]]
+    assert counter.actions_taken == [
+        "run execute: 0",
+        "run execute: 2",
+        "run execute: 5",
+        "run compensate: 3",
+    ]
+    assert [r.position for r in results if not r.succeeded] == [1]
+
+
+def test_failed_batch_compensations_are_reported():
+    class FailingRefund(BulkBooking):
+        def compensate_batch(self, states):
+            return [AlwaysFailException(state) for state in states]
+
+    results = list(run_transactions_lockstep([FailingRefund(), fail_on_three], [-7]))
+
+    assert isinstance(results[0].error, CompensationFailure)
+
+
+def test_a_batch_returning_the_wrong_number_of_results_fails_every_item():
+    class Broken(BulkBooking):
+        def execute_batch(self, states):
+            return []
+
+    results = list(run_transactions_lockstep([Broken()], [1, 2]))
+
+    assert all(isinstance(r.error, InvalidBatchResult) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_async_batch_steps_are_awaited():
+    class AsyncBooking(BulkBooking):
+        async def execute_batch(self, states):
+            return super().execute_batch(states)
+
+        async def compensate_batch(self, states):
+            return super().compensate_batch(states)
+
+    booking = AsyncBooking()
+    results = [
+        result async for result in run_transactions_lockstep_async([booking], [1, 2, 3])
+    ]
+
+    assert booking.batches == [[1, 2, 3]]
+    assert [r.starting_state for r in results if not r.succeeded] == [3]
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_step_fails_only_its_own_transaction():
+    counter = MockCountingStep()
+
+    class CancelledOnTwo:
+        async def execute(self, state):
+            if state == 2:
+                raise asyncio.CancelledError()
+            return state
+
+        def compensate(self, state):
+            pass
+
+    results = [
+        result
+        async for result in run_transactions_lockstep_async(
+            [counter, CancelledOnTwo()], [0, 1]
+        )
+    ]
+
+    by_position = {result.position: result for result in results}
+    assert by_position[0].succeeded and by_position[0].state == 1
+    assert isinstance(by_position[1].error, asyncio.CancelledError)
+    assert "run compensate: 2" in counter.actions_taken
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_batch_max_concurrency_has_to_allow_at_least_one_transaction(limit):
+    step = MockCountingStep()
+
+    with pytest.raises(InvalidConcurrencyLimit):
+        list(run_transactions_batch([step], [0, 1], max_concurrency=limit))
+
+    assert step.actions_taken == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [0, -1])
+async def test_async_batch_max_concurrency_has_to_allow_at_least_one_transaction(limit):
+    step = MockCountingStep()
+
+    with pytest.raises(InvalidConcurrencyLimit):
+        async for _ in run_transactions_batch_async(
+            [step], [0, 1], max_concurrency=limit
+        ):
+            pass
+
+    assert step.actions_taken == []
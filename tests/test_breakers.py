@@ -0,0 +1,165 @@
+import time
+
+import pytest
+
+from talepy import compile_transaction, run_transaction
+from talepy.async_transactions import run_transaction as run_async_transaction
+from talepy.breakers import (
+    CircuitBreaker,
+    named_breaker,
+    with_circuit_breaker,
+    CLOSED,
+    OPEN,
+    HALF_OPEN,
+)
+from talepy.exceptions import CircuitOpen
+from talepy.retries import attempt_retries
+from tests.mocks import (
+    MockCountingStep,
+    MockAsyncExecuteStep,
+    MockAsyncCompensateStep,
+    MockAsyncExecuteAndCompensateStep,
+    AlwaysFailsStep,
+    AlwaysFailException,
+)
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.min_calls):
+        breaker.allow()
+        breaker.record_failure(AlwaysFailException())
+
+
+def test_the_breaker_opens_once_enough_calls_fail():
+    breaker = CircuitBreaker("hotel", failure_rate=0.5, min_calls=4)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure(AlwaysFailException())
+    assert breaker.state == CLOSED
+
+    breaker.record_failure(AlwaysFailException())
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_old_outcomes_fall_out_of_the_window():
+    breaker = CircuitBreaker("hotel", failure_rate=0.5, window=4, min_calls=4)
+    breaker.record_failure(AlwaysFailException())
+    for _ in range(4):
+        breaker.record_success()
+    breaker.record_failure(AlwaysFailException())
+
+    assert breaker.state == CLOSED
+
+
+def test_ignored_failure_types_dont_trip_the_breaker():
+    breaker = CircuitBreaker("hotel", min_calls=1, failure_types=(ConnectionError,))
+    breaker.record_failure(ValueError("bad input"))
+
+    assert breaker.state == CLOSED
+
+
+def test_a_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker("hotel", reset_timeout=0.01)
+    trip(breaker)
+    time.sleep(0.02)
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_a_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("hotel", reset_timeout=0.01)
+    trip(breaker)
+    time.sleep(0.02)
+    breaker.allow()
+
+    breaker.record_failure(AlwaysFailException())
+
+    assert breaker.state == OPEN
+
+
+def test_an_open_breaker_fails_the_step_without_running_it():
+    breaker = CircuitBreaker("hotel")
+    trip(breaker)
+    hotel = MockCountingStep()
+    counter = MockCountingStep()
+
+    with pytest.raises(CircuitOpen):
+        run_transaction([counter, with_circuit_breaker(hotel, breaker)], 0)
+
+    assert hotel.actions_taken == []
+    assert counter.actions_taken == ["run execute: 0", "run compensate: 1"]
+
+
+def test_step_failures_are_recorded_against_the_breaker():
+    breaker = CircuitBreaker("hotel", min_calls=2)
+    step = with_circuit_breaker(AlwaysFailsStep(), breaker)
+    for _ in range(2):
+        with pytest.raises(AlwaysFailException):
+            run_transaction([step], 0)
+
+    assert breaker.state == OPEN
+
+
+def test_preflight_checks_every_breaker_before_anything_runs():
+    breaker = CircuitBreaker("hotel")
+    trip(breaker)
+    counter = MockCountingStep()
+    hotel = attempt_retries(with_circuit_breaker(MockCountingStep(), breaker), 2)
+    plan = compile_transaction([counter, hotel], preflight=True)
+
+    with pytest.raises(CircuitOpen):
+        plan.run(0)
+
+    assert counter.actions_taken == []
+
+
+def test_preflight_doesnt_use_up_the_half_open_probe():
+    breaker = CircuitBreaker("hotel", reset_timeout=0.01)
+    trip(breaker)
+    time.sleep(0.02)
+    hotel = MockCountingStep()
+    plan = compile_transaction(
+        [MockCountingStep(), with_circuit_breaker(hotel, breaker)], preflight=True
+    )
+
+    assert plan.run(0) == 2
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_async_steps_can_have_breakers():
+    breaker = CircuitBreaker("hotel")
+    trip(breaker)
+    step = with_circuit_breaker(MockAsyncExecuteStep(), breaker)
+
+    with pytest.raises(CircuitOpen):
+        await run_async_transaction([step], 0)
+
+    with pytest.raises(CircuitOpen):
+        await compile_transaction([step], preflight=True).run_async(0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "step_type", [MockAsyncCompensateStep, MockAsyncExecuteAndCompensateStep]
+)
+async def test_async_compensations_behind_a_breaker_are_awaited(step_type):
+    step = step_type()
+
+    with pytest.raises(AlwaysFailException):
+        await run_async_transaction(
+            [with_circuit_breaker(step, CircuitBreaker("hotel")), AlwaysFailsStep()],
+            0,
+        )
+
+    assert step.actions_taken == ["run execute: 0", "run compensate: 1"]
+
+
+def test_named_breakers_are_shared():
+    assert named_breaker("payments") is named_breaker("payments")
@@ -1,7 +1,14 @@
 import pytest
 
 from talepy.exceptions import InvalidStepDefinition
-from talepy.steps import InputState, OutputState, build_step, Step
+from talepy.steps import (
+    InputState,
+    OutputState,
+    build_step,
+    Step,
+    is_step,
+    _step_types,
+)
 
 
 class StubStep(Step):
@@ -48,3 +55,35 @@ non_step_like_objects = [
 def test_things_that_should_not_turn_into_steps(non_step_like_object):
     with pytest.raises(InvalidStepDefinition):
         build_step(non_step_like_object)
+
+
+class DuckTypedStep:
+    def execute(self, state):
+        pass
+
+    def compensate(self, state):
+        pass
+
+
+def test_classes_that_do_not_subclass_step_are_still_steps():
+    duck = DuckTypedStep()
+    assert build_step(duck) is duck
+    assert build_step(DuckTypedStep()) is not duck
+
+
+def test_instances_with_step_attributes_are_steps():
+    class Anything:
+        pass
+
+    plain = Anything()
+    assert not is_step(plain)
+
+    step_like = Anything()
+    step_like.execute = lambda state: state  # type: ignore
+    step_like.compensate = lambda state: None  # type: ignore
+    assert build_step(step_like) is step_like  # type: ignore
+
+
+def test_step_classification_is_cached_by_type():
+    build_step(StubStep())
+    assert _step_types[StubStep] is True
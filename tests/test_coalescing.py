@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from talepy import run_transaction
+from talepy.async_transactions import run_transaction as run_transaction_async
+from talepy.batch import run_transactions_batch
+from talepy.coalescing import CompensationCoalescer, coalesce_compensations
+from talepy.exceptions import CoalescerClosed, CompensationFailure
+from tests.mocks import MockCountingStep, AlwaysFailException
+
+
+def always_fail(state):
+    raise AlwaysFailException("nope")
+
+
+class BulkRefund:
+    def __init__(self):
+        self.batches = []
+
+    def execute(self, state):
+        return state
+
+    def compensate(self, state):
+        raise AssertionError("should have been batched")
+
+    def compensate_batch(self, states):
+        self.batches.append(sorted(states))
+        return [AlwaysFailException(state) if state == 3 else None for state in states]
+
+
+def test_compensations_from_many_threads_are_sent_as_one_batch():
+    refund = BulkRefund()
+    with CompensationCoalescer(max_delay=0.2) as coalescer:
+        step = coalesce_compensations(refund, coalescer)
+        results = list(
+            run_transactions_batch([step, always_fail], range(5), max_concurrency=5)
+        )
+
+    assert refund.batches == [[0, 1, 2, 3, 4]]
+    by_state = {result.starting_state: result.error for result in results}
+    assert isinstance(by_state[3], CompensationFailure)
+    assert isinstance(by_state[0], AlwaysFailException)
+
+
+def test_a_full_batch_is_sent_without_waiting_for_the_delay():
+    refund = BulkRefund()
+    with CompensationCoalescer(max_delay=60, max_batch_size=2) as coalescer:
+        step = coalesce_compensations(refund, coalescer)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(step.compensate, [1, 2]))
+
+    assert refund.batches == [[1, 2]]
+
+
+def test_steps_without_compensate_batch_are_compensated_one_by_one():
+    counter = MockCountingStep()
+    with CompensationCoalescer(max_delay=0) as coalescer:
+        step = coalesce_compensations(counter, coalescer)
+        with pytest.raises(AlwaysFailException):
+            run_transaction([step, always_fail], 1)
+
+    assert counter.actions_taken == ["run execute: 1", "run compensate: 2"]
+
+
+@pytest.mark.asyncio
+async def test_async_sagas_share_a_batch():
+    refund = BulkRefund()
+    with CompensationCoalescer(max_delay=0.2) as coalescer:
+        step = coalesce_compensations(refund, coalescer)
+        results = await asyncio.gather(
+            *(run_transaction_async([step, always_fail], i) for i in range(4)),
+            return_exceptions=True,
+        )
+
+    assert refund.batches == [[0, 1, 2, 3]]
+    assert all(isinstance(result, AlwaysFailException) for result in results[:3])
+    assert isinstance(results[3], CompensationFailure)
+
+
+def test_a_closed_coalescer_rejects_compensations():
+    coalescer = CompensationCoalescer()
+    coalescer.close()
+
+    with pytest.raises(CoalescerClosed):
+        coalescer.submit(BulkRefund(), 1)
+
+
+@pytest.mark.asyncio
+async def test_async_compensations_run_on_the_loop_that_submitted_them():
+    class LoopBoundRefund(BulkRefund):
+        def __init__(self):
+            super().__init__()
+            self.loops: list = []
+
+        async def compensate_batch(self, states):  # type: ignore
+            self.loops.append(asyncio.get_running_loop())
+
+    refund = LoopBoundRefund()
+    with CompensationCoalescer(max_delay=0) as coalescer:
+        step = coalesce_compensations(refund, coalescer)
+        with pytest.raises(AlwaysFailException):
+            await run_transaction_async([step, always_fail], 1)
+
+    assert refund.loops == [asyncio.get_running_loop()]
+
+
+def test_groups_for_different_steps_are_compensated_at_the_same_time():
+    both_running = threading.Barrier(2, timeout=5)
+
+    class WaitsForTheOtherGroup(BulkRefund):
+        def compensate_batch(self, states):
+            both_running.wait()
+
+    with CompensationCoalescer(max_delay=0.05) as coalescer:
+        steps = [
+            coalesce_compensations(WaitsForTheOtherGroup(), coalescer) for _ in range(2)
+        ]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda step: step.compensate(1), steps))
@@ -0,0 +1,165 @@
+import asyncio
+from typing import List, Tuple
+
+import pytest
+
+from talepy.async_transactions import run_transaction
+from talepy.compensation import (
+    REVERSE,
+    PARALLEL,
+    BY_LEVEL,
+    with_compensation_level,
+)
+from talepy.exceptions import (
+    CompensationFailure,
+    InvalidConcurrencyLimit,
+    UnknownCompensationStrategy,
+)
+from tests.mocks import AlwaysFailsStep, AlwaysFailException
+
+
+class Timeline:
+    def __init__(self):
+        self.events: List[Tuple[str, int]] = []
+        self.running = 0
+        self.most_running = 0
+
+
+class SlowUndo:
+    def __init__(self, timeline: Timeline, name: int, fails: bool = False):
+        self.timeline = timeline
+        self.name = name
+        self.fails = fails
+
+    async def execute(self, state):
+        return state
+
+    async def compensate(self, state):
+        timeline = self.timeline
+        timeline.events.append(("start", self.name))
+        timeline.running += 1
+        timeline.most_running = max(timeline.most_running, timeline.running)
+        await asyncio.sleep(0.01)
+        timeline.running -= 1
+        timeline.events.append(("end", self.name))
+        if self.fails:
+            raise AlwaysFailException(self.name)
+
+
+def _steps(timeline: Timeline, count: int) -> list:
+    return [SlowUndo(timeline, name) for name in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_reverse_compensates_one_step_at_a_time_latest_first():
+    timeline = Timeline()
+
+    with pytest.raises(AlwaysFailException):
+        await run_transaction(
+            _steps(timeline, 3) + [AlwaysFailsStep()],
+            compensation_strategy=REVERSE,
+        )
+
+    assert timeline.events == [
+        ("start", 2),
+        ("end", 2),
+        ("start", 1),
+        ("end", 1),
+        ("start", 0),
+        ("end", 0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_parallel_compensates_everything_at_once_by_default():
+    timeline = Timeline()
+
+    with pytest.raises(AlwaysFailException):
+        await run_transaction(_steps(timeline, 5) + [AlwaysFailsStep()])
+
+    assert timeline.most_running == 5
+
+
+@pytest.mark.asyncio
+async def test_parallel_compensations_can_be_capped():
+    timeline = Timeline()
+
+    with pytest.raises(AlwaysFailException):
+        await run_transaction(
+            _steps(timeline, 5) + [AlwaysFailsStep()],
+            compensation_strategy=PARALLEL,
+            max_concurrent_compensations=2,
+        )
+
+    assert timeline.most_running == 2
+    assert len(timeline.events) == 10
+
+
+@pytest.mark.asyncio
+async def test_by_level_compensates_each_level_together_highest_first():
+    timeline = Timeline()
+    first, second, third = _steps(timeline, 3)
+    steps = [
+        with_compensation_level(first, 0),
+        with_compensation_level(second, 1),
+        with_compensation_level(third, 1),
+        AlwaysFailsStep(),
+    ]
+
+    with pytest.raises(AlwaysFailException):
+        await run_transaction(steps, compensation_strategy=BY_LEVEL)
+
+    assert {event for event in timeline.events[:2]} == {("start", 1), ("start", 2)}
+    assert timeline.events[-2:] == [("start", 0), ("end", 0)]
+
+
+@pytest.mark.asyncio
+async def test_steps_without_a_level_are_on_their_own_level():
+    timeline = Timeline()
+
+    with pytest.raises(AlwaysFailException):
+        await run_transaction(
+            _steps(timeline, 3) + [AlwaysFailsStep()], compensation_strategy=BY_LEVEL
+        )
+
+    assert timeline.most_running == 1
+    assert [name for (kind, name) in timeline.events if kind == "start"] == [2, 1, 0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy", [REVERSE, PARALLEL, BY_LEVEL])
+async def test_failed_compensations_raise_a_compensation_failure(strategy):
+    timeline = Timeline()
+    steps = [
+        SlowUndo(timeline, 0),
+        SlowUndo(timeline, 1, fails=True),
+        SlowUndo(timeline, 2),
+        AlwaysFailsStep(),
+    ]
+
+    with pytest.raises(CompensationFailure) as failure:
+        await run_transaction(steps, compensation_strategy=strategy)
+
+    assert [str(error) for error in failure.value.inner_exceptions] == ["1"]
+    assert isinstance(failure.value.__context__, AlwaysFailException)
+    # The other steps are still compensated
+    assert {name for (kind, name) in timeline.events if kind == "end"} == {0, 1, 2}
+
+
+@pytest.mark.asyncio
+async def test_an_unknown_strategy_is_rejected_before_anything_runs():
+    timeline = Timeline()
+
+    with pytest.raises(UnknownCompensationStrategy):
+        await run_transaction(_steps(timeline, 1), compensation_strategy="sideways")
+
+
+@pytest.mark.asyncio
+async def test_compensations_cannot_be_capped_below_one():
+    timeline = Timeline()
+
+    with pytest.raises(InvalidConcurrencyLimit):
+        await run_transaction(
+            [*_steps(timeline, 2), AlwaysFailsStep()], max_concurrent_compensations=0
+        )
+    assert timeline.events == []
@@ -0,0 +1,202 @@
+import asyncio
+import gc
+import weakref
+
+import pytest
+
+from talepy import compile_transaction, run_transaction
+from talepy.async_transactions import (
+    run_transaction as run_async_transaction,
+    run_concurrent_transaction,
+)
+from talepy.batch import run_transactions_lockstep
+from talepy.compensation import with_compensation_token
+from talepy.dead_letters import SqliteDeadLetterStore
+from talepy.exceptions import AsyncStepFailures, CompensationFailure
+from talepy.graphs import run_graph_transaction
+from talepy.journal import FileJournal, STEP_COMPLETED
+from talepy.recovery import recover
+from talepy.retries import RetryPolicy, retry_with_policy
+from talepy.threaded import run_concurrent_transaction as run_threaded_transaction
+from tests.mocks import AlwaysFailsStep, AlwaysFailException
+
+
+class Booking:
+    # Stands in for a large state. Only the id is needed to cancel it.
+    def __init__(self, booking_id: int) -> None:
+        self.booking_id = booking_id
+        self.payload = bytearray(1024)
+
+
+class Book:
+    def __init__(self):
+        self.returned: list = []
+        self.cancelled: list = []
+
+    def execute(self, booking):
+        booking = Booking(booking.booking_id + 1)
+        self.returned.append(weakref.ref(booking))
+        return booking
+
+    def compensation_token(self, booking):
+        return booking.booking_id
+
+    def compensate(self, booking_id):
+        self.cancelled.append(booking_id)
+
+
+class AsyncBook(Book):
+    async def compensate(self, booking_id):  # type: ignore
+        super().compensate(booking_id)
+
+
+class CancelOutage(Book):
+    def compensate(self, booking_id):
+        raise AlwaysFailException(f"could not cancel {booking_id}")
+
+
+def test_compensate_is_given_the_token():
+    first, second = Book(), Book()
+
+    with pytest.raises(AlwaysFailException):
+        run_transaction([first, second, AlwaysFailsStep()], Booking(0))
+
+    assert first.cancelled == [1]
+    assert second.cancelled == [2]
+
+
+def _freed(book: Book) -> bool:
+    gc.collect()
+    return book.returned[0]() is None
+
+
+def test_earlier_states_are_freed_while_the_saga_runs():
+    book = Book()
+    freed = []
+
+    def check(booking):
+        freed.append(_freed(book))
+        raise AlwaysFailException()
+
+    with pytest.raises(AlwaysFailException):
+        run_transaction([book, book, check], Booking(0))
+
+    assert freed == [True]
+    assert book.cancelled == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_earlier_states_are_freed_while_an_async_saga_runs():
+    book = AsyncBook()
+    freed = []
+
+    def check(booking):
+        freed.append(_freed(book))
+        raise AlwaysFailException()
+
+    with pytest.raises(AlwaysFailException):
+        await run_async_transaction([book, book, check], Booking(0))
+
+    assert freed == [True]
+    assert sorted(book.cancelled) == [1, 2]
+
+
+def test_tokens_are_taken_before_later_steps_change_the_state():
+    cancelled: list = []
+
+    def create_order(state):
+        return {**state, "order_id": 7}
+
+    def change_in_place(state):
+        state["order_id"] = None
+        return state
+
+    order = retry_with_policy(
+        with_compensation_token(
+            (create_order, cancelled.append), lambda state: state["order_id"]
+        ),
+        RetryPolicy(max_attempts=2, initial_delay=0),
+    )
+
+    with pytest.raises(AlwaysFailException):
+        run_transaction([order, change_in_place, AlwaysFailsStep()], {})
+
+    assert cancelled == [7]
+
+
+def test_the_journal_holds_tokens_and_recovery_compensates_with_them(tmp_path):
+    class ProcessCrash(BaseException):
+        pass
+
+    def crash(_state):
+        raise ProcessCrash()
+
+    book = Book()
+    plan = compile_transaction([book, crash], name="booking")
+    with FileJournal(str(tmp_path / "journal.log")) as journal:
+        with pytest.raises(ProcessCrash):
+            plan.run(Booking(0), journal=journal)
+        completed = [e.state for e in journal.read() if e.kind == STEP_COMPLETED]
+        report = recover(journal, {"booking": plan})
+
+    assert completed == [1]
+    assert len(report.recovered) == 1
+    assert book.cancelled == [1]
+
+
+def test_dead_letters_hold_the_token(tmp_path):
+    with SqliteDeadLetterStore(str(tmp_path / "dead_letters.db")) as store:
+        plan = compile_transaction(
+            [CancelOutage(), AlwaysFailsStep()], dead_letters=store
+        )
+        with pytest.raises(CompensationFailure):
+            plan.run(Booking(0))
+
+        [letter] = list(store.pending())
+    assert letter.state == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_steps_are_compensated_with_their_token():
+    book = Book()
+
+    with pytest.raises(AsyncStepFailures):
+        await run_concurrent_transaction([book, AlwaysFailsStep()], Booking(0))
+
+    assert book.cancelled == [1]
+
+
+def test_threaded_steps_are_compensated_with_their_token():
+    book = Book()
+
+    with pytest.raises(AsyncStepFailures):
+        run_threaded_transaction([book, AlwaysFailsStep()], Booking(0))
+
+    assert book.cancelled == [1]
+
+
+def test_graph_steps_are_compensated_with_their_token():
+    book = Book()
+
+    with pytest.raises(AsyncStepFailures):
+        asyncio.run(
+            run_graph_transaction({"book": book, "fail": AlwaysFailsStep()}, Booking(0))
+        )
+
+    assert book.cancelled == [1]
+
+
+def test_batch_compensation_is_given_tokens():
+    class BookMany(Book):
+        def compensate_batch(self, booking_ids):
+            self.cancelled.extend(booking_ids)
+
+    book = BookMany()
+
+    def fail(_booking):
+        raise AlwaysFailException()
+
+    results = list(run_transactions_lockstep([book, fail], map(Booking, [0, 10])))
+
+    assert [result.succeeded for result in results] == [False, False]
+    assert book.cancelled == [1, 11]
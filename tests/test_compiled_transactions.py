@@ -0,0 +1,83 @@
+import pytest
+
+from talepy import compile_transaction
+from talepy.exceptions import AsyncStepUsedInSyncTransaction, FailuresAfterRetrying
+from talepy.retries import attempt_retries
+from tests.mocks import (
+    MockCountingStep,
+    MockAsyncExecuteStep,
+    MockAsyncExecuteAndCompensateStep,
+    AlwaysFailsStep,
+    AlwaysFailException,
+    RegularMockStep,
+)
+
+
+def test_a_compiled_plan_can_be_run_many_times():
+    step = MockCountingStep()
+    plan = compile_transaction([step, lambda x: x + 10])
+
+    assert plan.run(0) == 11
+    assert plan.run(5) == 16
+    assert step.actions_taken == ["run execute: 0", "run execute: 5"]
+
+
+def test_steps_are_classified_once_at_compile_time():
+    plan = compile_transaction(
+        [
+            MockCountingStep(),
+            MockAsyncExecuteAndCompensateStep(),
+            attempt_retries(RegularMockStep(), times=1),
+        ]
+    )
+
+    assert [
+        (c.async_execute, c.async_compensate, c.has_retries) for c in plan.steps
+    ] == [
+        (False, False, False),
+        (True, True, False),
+        (False, False, True),
+    ]
+
+
+def test_a_failing_compiled_plan_compensates_the_completed_steps():
+    step_one = MockCountingStep()
+    step_two = MockCountingStep()
+    plan = compile_transaction([step_one, step_two, AlwaysFailsStep()])
+
+    with pytest.raises(AlwaysFailException):
+        plan.run(0)
+
+    assert step_one.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert step_two.actions_taken == ["run execute: 1", "run compensate: 2"]
+
+
+def test_async_steps_cannot_be_run_synchronously():
+    plan = compile_transaction([MockAsyncExecuteStep()])
+
+    with pytest.raises(AsyncStepUsedInSyncTransaction):
+        plan.run(0)
+
+
+@pytest.mark.asyncio
+async def test_a_compiled_plan_can_be_run_asynchronously():
+    sync_step = MockCountingStep()
+    async_step = MockAsyncExecuteAndCompensateStep()
+    plan = compile_transaction([sync_step, async_step, AlwaysFailsStep()])
+
+    with pytest.raises(AlwaysFailException):
+        await plan.run_async(0)
+
+    assert sync_step.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert async_step.actions_taken == ["run execute: 1", "run compensate: 2"]
+
+
+@pytest.mark.asyncio
+async def test_retries_can_be_run_asynchronously():
+    step = RegularMockStep()
+    plan = compile_transaction([attempt_retries(step, times=2)])
+
+    with pytest.raises(FailuresAfterRetrying):
+        await plan.run_async(0)
+
+    assert step.actions_taken == ["trying", "trying", "trying"]
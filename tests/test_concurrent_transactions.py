@@ -1,13 +1,19 @@
+import asyncio
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from talepy import run_transaction
 from talepy.exceptions import (
     AsyncStepFailures,
     AsyncStepUsedInSyncTransaction,
-    RetriesCannotBeUsedInConcurrent,
+    InvalidConcurrencyLimit,
 )
 from talepy.async_transactions import run_concurrent_transaction
 from talepy.retries import attempt_retries
+from talepy.steps import Step
 from tests.mocks import (
     MockCountingStep,
     MockAsyncExecuteStep,
@@ -15,6 +21,8 @@ from tests.mocks import (
     MockAsyncCompensateStep,
     AlwaysFailsStep,
     SlowMoStep,
+    MockRetryStepThatRetriesTwice,
+    AlwaysFailException,
 )
 
 
@@ -100,14 +108,19 @@ async def test_regular_transactions_can_be_async():
 
 
 @pytest.mark.asyncio
-async def test_currently_retries_cant_be_used_concurrently():
-    # TODO: Implement this functionality
-    step_1 = MockCountingStep()
+async def test_retries_can_be_used_concurrently():
+    step_1 = MockRetryStepThatRetriesTwice()
+    step_2 = MockCountingStep()
 
-    with pytest.raises(RetriesCannotBeUsedInConcurrent):
-        await run_concurrent_transaction(
-            [attempt_retries(step_1, times=2)], starting_state=0
-        )
+    results = await run_concurrent_transaction(
+        [step_1, attempt_retries(step_2, times=2)], starting_state=0
+    )
+
+    assert results == [1, 1]
+    assert step_1.actions_taken == [
+        "ran retry on state 0 after 1 failures",
+        "ran retry on state 0 after 2 failures",
+    ]
 
 
 @pytest.mark.asyncio
@@ -119,3 +132,185 @@ async def test_steps_are_treated_as_coroutines():
     results = await run_concurrent_transaction(steps, starting_state=0)
 
     assert all(r == "okay" for r in results)
+
+
+class ConcurrencyTracker:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def run(self):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.001)
+        self.running -= 1
+
+
+class TrackedStep(Step):
+    def __init__(self, tracker: ConcurrencyTracker, result):
+        self.tracker = tracker
+        self.result = result
+
+    async def execute(self, state):
+        await self.tracker.run()
+        return self.result
+
+    async def compensate(self, state):
+        await self.tracker.run()
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency_limits_how_many_steps_run_at_once():
+    tracker = ConcurrencyTracker()
+    steps = [TrackedStep(tracker, i) for i in range(100)]
+
+    results = await run_concurrent_transaction(steps, 0, max_concurrency=5)
+
+    assert results == list(range(100))
+    assert tracker.peak == 5
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency_also_limits_compensations():
+    tracker = ConcurrencyTracker()
+    steps = [TrackedStep(tracker, i) for i in range(50)]
+
+    with pytest.raises(AsyncStepFailures):
+        await run_concurrent_transaction(
+            [*steps, AlwaysFailsStep()], 0, max_concurrency=3
+        )
+
+    # 50 executions and then 50 compensations
+    assert tracker.calls == 100
+    assert tracker.peak == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [0, -1])
+async def test_max_concurrency_has_to_allow_at_least_one_step(limit):
+    step = MockCountingStep()
+
+    with pytest.raises(InvalidConcurrencyLimit):
+        await run_concurrent_transaction([step, step], 0, max_concurrency=limit)
+
+    assert step.actions_taken == []
+
+
+class SlowCountingStep(Step):
+    def __init__(self, delay: float, ignore_cancellation: bool = False):
+        self.delay = delay
+        self.ignore_cancellation = ignore_cancellation
+        self.actions_taken: typing.List[str] = []
+
+    async def execute(self, state):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.actions_taken.append("cancelled")
+            if not self.ignore_cancellation:
+                raise
+        self.actions_taken.append("executed")
+        return state + 1
+
+    async def compensate(self, state):
+        self.actions_taken.append(f"compensated: {state}")
+
+
+class FailsAfterADelay(Step):
+    async def execute(self, state):
+        await asyncio.sleep(0.01)
+        raise AlwaysFailException("slowly failed")
+
+    async def compensate(self, state):
+        pass
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(2)
+async def test_fail_fast_cancels_steps_still_running():
+    fast = MockCountingStep()
+    slow = SlowCountingStep(delay=10)
+
+    with pytest.raises(AsyncStepFailures) as caught_error:
+        await run_concurrent_transaction(
+            [fast, FailsAfterADelay(), slow], starting_state=0, fail_fast=True
+        )
+
+    [failure] = caught_error.value.inner_exceptions
+    assert str(failure) == "slowly failed"
+    assert fast.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert slow.actions_taken == ["cancelled"]
+
+
+@pytest.mark.asyncio
+async def test_fail_fast_compensates_steps_that_could_not_be_cancelled():
+    stubborn = SlowCountingStep(delay=0.1, ignore_cancellation=True)
+
+    with pytest.raises(AsyncStepFailures):
+        await run_concurrent_transaction(
+            [FailsAfterADelay(), stubborn], starting_state=0, fail_fast=True
+        )
+
+    assert stubborn.actions_taken == ["cancelled", "executed", "compensated: 1"]
+
+
+class SlowSyncStep(Step):
+    def __init__(self):
+        self.actions_taken: typing.List[str] = []
+
+    def execute(self, state):
+        time.sleep(0.1)
+        self.actions_taken.append("executed")
+        return state + 1
+
+    def compensate(self, state):
+        self.actions_taken.append(f"compensated: {state}")
+
+
+@pytest.mark.asyncio
+async def test_fail_fast_compensates_sync_steps_left_running_in_an_executor():
+    slow = SlowSyncStep()
+
+    with ThreadPoolExecutor() as executor:
+        with pytest.raises(AsyncStepFailures):
+            await run_concurrent_transaction(
+                [slow, FailsAfterADelay()],
+                starting_state=0,
+                fail_fast=True,
+                executor=executor,
+            )
+
+        for _ in range(100):
+            if len(slow.actions_taken) == 2:
+                break
+            await asyncio.sleep(0.02)
+
+    assert slow.actions_taken == ["executed", "compensated: 1"]
+
+
+@pytest.mark.asyncio
+async def test_fail_fast_with_a_concurrency_limit_starts_nothing_new():
+    never_started = MockCountingStep()
+
+    with pytest.raises(AsyncStepFailures):
+        await run_concurrent_transaction(
+            [FailsAfterADelay(), never_started],
+            starting_state=0,
+            max_concurrency=1,
+            fail_fast=True,
+        )
+
+    assert never_started.actions_taken == []
+
+
+@pytest.mark.asyncio
+async def test_fail_fast_returns_every_result_when_nothing_fails():
+    results = await run_concurrent_transaction(
+        [MockCountingStep(), SlowCountingStep(delay=0.01)],
+        starting_state=0,
+        fail_fast=True,
+    )
+
+    assert results == [1, 1]
@@ -0,0 +1,308 @@
+import asyncio
+
+import pytest
+
+from talepy import (
+    compile_transaction,
+    run_transaction,
+    run_concurrent_transaction as run_threaded_transaction,
+)
+from talepy.async_transactions import (
+    run_transaction as run_async_transaction,
+    run_concurrent_transaction,
+)
+from talepy.dead_letters import (
+    DeadLetter,
+    DeadLetterStore,
+    FileDeadLetterStore,
+    SqliteDeadLetterStore,
+)
+from talepy.exceptions import (
+    AsyncStepFailures,
+    CompensationFailure,
+    UnknownDeadLetterStep,
+    UnknownSaga,
+)
+from talepy.journal import SqliteJournal
+from talepy.replay import main, replay_dead_letters
+from talepy.retries import RetryPolicy
+from tests.mocks import MockCountingStep, AlwaysFailsStep, AlwaysFailException
+
+
+class RefundOutage(Exception):
+    pass
+
+
+class Refund:
+    # Compensation fails the first `failures` times it is called
+    def __init__(self, failures: int = 1_000):
+        self.failures = failures
+        self.refunded: list = []
+
+    def execute(self, state):
+        return state + 1
+
+    def compensate(self, state):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RefundOutage(f"refund of {state} failed")
+        self.refunded.append(state)
+
+
+class AsyncRefund(Refund):
+    async def compensate(self, state):  # type: ignore
+        super().compensate(state)
+
+
+PLANS = {"booking": compile_transaction([MockCountingStep(), Refund(0)], "booking")}
+NO_DELAY = RetryPolicy(max_attempts=3, initial_delay=0, jitter=False)
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path):
+    store: DeadLetterStore
+    if request.param == "file":
+        store = FileDeadLetterStore(str(tmp_path / "dead_letters.log"))
+    else:
+        store = SqliteDeadLetterStore(str(tmp_path / "dead_letters.db"))
+    yield store
+    store.close()
+
+
+def _letter(letter_id="a", saga_name="booking", step_index=1, step_name="Refund"):
+    return DeadLetter(
+        letter_id, "saga", saga_name, step_index, step_name, 3, ("e",), 0.0
+    )
+
+
+def test_failed_compensations_are_dead_lettered(store):
+    plan = compile_transaction(
+        [MockCountingStep(), Refund(), AlwaysFailsStep()], "booking", dead_letters=store
+    )
+
+    with pytest.raises(CompensationFailure):
+        plan.run(0)
+
+    [letter] = list(store.pending())
+    assert letter.saga_name == "booking"
+    assert letter.step_index == 1
+    assert letter.step_name == "Refund"
+    assert letter.state == 2
+    assert letter.errors == ("RefundOutage: refund of 2 failed",)
+
+
+def test_successful_compensations_are_not_dead_lettered(store):
+    with pytest.raises(AlwaysFailException):
+        run_transaction([MockCountingStep(), AlwaysFailsStep()], 0, dead_letters=store)
+
+    assert list(store.pending()) == []
+
+
+def test_letters_share_the_journal_saga_id(store, tmp_path):
+    plan = compile_transaction([Refund(), AlwaysFailsStep()], dead_letters=store)
+    with SqliteJournal(str(tmp_path / "journal.db")) as journal:
+        with pytest.raises(CompensationFailure):
+            plan.run(0, journal=journal)
+        saga_ids = {event.saga_id for event in journal.read()}
+
+    assert {letter.saga_id for letter in store.pending()} == saga_ids
+
+
+@pytest.mark.asyncio
+async def test_async_compensation_failures_are_dead_lettered(store):
+    with pytest.raises(CompensationFailure):
+        await run_async_transaction(
+            [AsyncRefund(), Refund(), AlwaysFailsStep()], 0, dead_letters=store
+        )
+
+    letters = sorted(store.pending(), key=lambda letter: letter.step_index)
+    assert [(letter.step_index, letter.state) for letter in letters] == [(0, 1), (1, 2)]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_compensation_failures_are_dead_lettered(store):
+    with pytest.raises(AsyncStepFailures):
+        await run_concurrent_transaction(
+            [MockCountingStep(), Refund(), AlwaysFailsStep()], 0, dead_letters=store
+        )
+
+    [letter] = list(store.pending())
+    assert (letter.step_index, letter.state) == (1, 1)
+
+
+class SlowRefund(Refund):
+    async def compensate(self, state):  # type: ignore
+        await asyncio.sleep(10)
+
+
+@pytest.mark.asyncio
+async def test_only_unfinished_compensations_are_dead_lettered_on_timeout(store):
+    refund = Refund(0)
+    with pytest.raises(CompensationFailure):
+        await run_async_transaction(
+            [refund, SlowRefund(), AlwaysFailsStep()],
+            0,
+            compensation_timeout=0.05,
+            dead_letters=store,
+        )
+
+    [letter] = list(store.pending())
+    assert (letter.step_index, letter.state) == (1, 2)
+    assert refund.refunded == [1]
+
+
+@pytest.mark.asyncio
+async def test_only_unfinished_concurrent_compensations_are_dead_lettered(store):
+    refund = Refund(0)
+    with pytest.raises(AsyncStepFailures):
+        await run_concurrent_transaction(
+            [refund, SlowRefund(), AlwaysFailsStep()],
+            0,
+            compensation_timeout=0.05,
+            dead_letters=store,
+        )
+
+    [letter] = list(store.pending())
+    assert (letter.step_index, letter.state) == (1, 1)
+    assert refund.refunded == [1]
+
+
+def test_threaded_compensation_failures_are_dead_lettered(store):
+    with pytest.raises(AsyncStepFailures):
+        run_threaded_transaction(
+            [MockCountingStep(), Refund(), AlwaysFailsStep()], 0, dead_letters=store
+        )
+
+    [letter] = list(store.pending())
+    assert (letter.step_index, letter.state) == (1, 1)
+
+
+class Unserializable:
+    def execute(self, state):
+        return object()
+
+    def compensate(self, state):
+        raise RefundOutage("refund failed")
+
+
+def test_a_letter_that_cannot_be_stored_doesnt_stop_compensation(store, caplog):
+    first = MockCountingStep()
+    plan = compile_transaction(
+        [first, Unserializable(), AlwaysFailsStep()], dead_letters=store
+    )
+
+    with pytest.raises(CompensationFailure):
+        plan.run(0)
+
+    assert first.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert "Could not dead letter" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_a_letter_that_cannot_be_stored_still_raises_compensation_failure(
+    store,
+):
+    first = MockCountingStep()
+
+    with pytest.raises(CompensationFailure):
+        await run_async_transaction(
+            [first, Unserializable(), AlwaysFailsStep()], 0, dead_letters=store
+        )
+
+    assert first.actions_taken == ["run execute: 0", "run compensate: 1"]
+
+
+def test_stores_keep_the_error_history_until_resolved(store):
+    store.add(_letter("a"))
+    store.add(_letter("b"))
+    store.record_failure("a", "again")
+    store.resolve("b")
+
+    [letter] = list(store.pending())
+    assert letter.letter_id == "a"
+    assert letter.errors == ("e", "again")
+    assert letter.attempts == 2
+
+
+def test_letters_survive_reopening_the_store(tmp_path):
+    path = str(tmp_path / "dead_letters.db")
+    with SqliteDeadLetterStore(path) as store:
+        store.add(_letter())
+
+    with SqliteDeadLetterStore(path) as store:
+        assert list(store.pending()) == [_letter()]
+
+
+def test_a_torn_final_line_is_cut_off_before_appending(tmp_path):
+    path = str(tmp_path / "dead_letters.log")
+    with FileDeadLetterStore(path) as store:
+        store.add(_letter("a"))
+    with open(path, "a") as store_file:
+        store_file.write('["resolved", "a"')
+
+    with FileDeadLetterStore(path) as store:
+        store.add(_letter("b"))
+        letter_ids = [letter.letter_id for letter in store.pending()]
+
+    assert letter_ids == ["a", "b"]
+
+
+def test_replay_retries_with_backoff_until_the_compensation_succeeds(store):
+    refund = Refund(failures=2)
+    plan = compile_transaction([MockCountingStep(), refund], "booking")
+    store.add(_letter())
+
+    report = replay_dead_letters(store, plan, policy=NO_DELAY)
+
+    assert report.resolved == ["a"]
+    assert refund.refunded == [3]
+    assert list(store.pending()) == []
+
+
+def test_letters_that_keep_failing_stay_with_every_failure_recorded(store):
+    plan = compile_transaction([MockCountingStep(), Refund()], "booking")
+    store.add(_letter())
+
+    report = replay_dead_letters(store, {"booking": plan}, policy=NO_DELAY)
+
+    assert [type(error) for error in report.failed["a"]] == [RefundOutage] * 3
+    [letter] = list(store.pending())
+    assert letter.attempts == 4
+
+
+def test_replay_drains_many_letters_concurrently(store):
+    refund = Refund(failures=0)
+    plan = compile_transaction([MockCountingStep(), refund], "booking")
+    for number in range(50):
+        store.add(_letter(str(number)))
+
+    report = replay_dead_letters(store, plan, max_workers=8, limit=40)
+
+    assert len(report.resolved) == 40
+    assert len(refund.refunded) == 40
+    assert len(list(store.pending())) == 10
+
+
+def test_letters_for_unknown_sagas_or_changed_steps_are_left_alone(store):
+    store.add(_letter("unknown", saga_name="hotel"))
+    store.add(_letter("changed", step_name="BookFlight"))
+
+    report = replay_dead_letters(store, PLANS)
+
+    assert isinstance(report.failed["unknown"][0], UnknownSaga)
+    assert isinstance(report.failed["changed"][0], UnknownDeadLetterStep)
+    assert len(list(store.pending())) == 2
+
+
+def test_the_command_line_lists_and_replays_letters(tmp_path, capsys):
+    path = str(tmp_path / "dead_letters.db")
+    with SqliteDeadLetterStore(path) as store:
+        store.add(_letter())
+
+    assert main([path, "--list"]) == 0
+    assert "booking step 1 (Refund): 1 failures" in capsys.readouterr().out
+
+    assert main([path, "--plans", "tests.test_dead_letters:PLANS"]) == 0
+    assert "1 resolved, 0 still failing" in capsys.readouterr().out
+    with SqliteDeadLetterStore(path) as store:
+        assert list(store.pending()) == []
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import pytest
+
+from talepy.async_transactions import run_transaction, run_concurrent_transaction
+from talepy.deadlines import remaining_time, with_timeout
+from talepy.exceptions import (
+    AsyncStepFailures,
+    CompensationFailure,
+    DeadlineExceeded,
+    StepTimedOut,
+)
+from talepy.retries import RetryPolicy, retry_with_policy
+from tests.mocks import AlwaysFailException, MockCountingStep
+
+
+class Slow:
+    def __init__(self, seconds=10.0):
+        self.seconds = seconds
+
+    async def execute(self, state):
+        await asyncio.sleep(self.seconds)
+        return state + 1
+
+    async def compensate(self, state):
+        pass
+
+
+class Check:
+    def __init__(self):
+        self.seen: List[Any] = []
+
+    async def execute(self, state):
+        self.seen.append(remaining_time())
+        return state
+
+    def compensate(self, state):
+        pass
+
+
+def test_there_is_no_time_limit_outside_of_a_step():
+    assert remaining_time() is None
+
+
+@pytest.mark.asyncio
+async def test_a_step_that_takes_too_long_is_cancelled_and_compensated():
+    counter = MockCountingStep()
+
+    with pytest.raises(StepTimedOut):
+        await run_transaction([counter, with_timeout(Slow(), 0.05)], 1)
+
+    assert counter.actions_taken == ["run execute: 1", "run compensate: 2"]
+
+
+@pytest.mark.asyncio
+async def test_a_timeout_only_applies_where_the_step_was_given_it():
+    slow = Slow(0.1)
+
+    with pytest.raises(StepTimedOut):
+        await run_transaction([with_timeout(slow, 0.05)], 0)
+
+    assert await run_transaction([slow], 0) == 1
+
+
+@pytest.mark.asyncio
+async def test_steps_with_slots_can_be_given_a_timeout():
+    class SlottedSlow:
+        __slots__ = ()
+
+        async def execute(self, state):
+            await asyncio.sleep(10)
+
+        async def compensate(self, state):
+            pass
+
+    with pytest.raises(StepTimedOut):
+        await run_transaction([with_timeout(SlottedSlow(), 0.05)], 0)
+
+
+@pytest.mark.asyncio
+async def test_retrying_steps_can_be_given_a_timeout():
+    class FailsOnce:
+        def __init__(self):
+            self.attempts = 0
+
+        def execute(self, state):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise AlwaysFailException()
+            return state + 1
+
+        def compensate(self, state):
+            pass
+
+    policy = RetryPolicy(max_attempts=2, initial_delay=0)
+    step = with_timeout(retry_with_policy(FailsOnce(), policy), 1)
+
+    assert await run_transaction([step], 0) == 1
+
+
+@pytest.mark.asyncio
+async def test_the_saga_deadline_covers_every_step():
+    with pytest.raises(DeadlineExceeded):
+        await run_transaction([Slow(0.04), Slow(0.04), Slow(0.04)], 0, timeout=0.1)
+
+
+@pytest.mark.asyncio
+async def test_steps_can_see_how_long_they_have_left():
+    limited, unlimited = Check(), Check()
+    await run_transaction([with_timeout(limited, 0.5), unlimited], 0, timeout=5)
+
+    assert 0 < limited.seen[0] <= 0.5
+    assert 0.5 < unlimited.seen[0] <= 5
+
+
+@pytest.mark.asyncio
+async def test_sync_steps_in_an_executor_can_see_how_long_they_have_left():
+    seen: List[Any] = []
+
+    def check(state):
+        seen.append(remaining_time())
+        return state
+
+    with ThreadPoolExecutor() as executor:
+        await run_transaction([check], 0, executor=executor, timeout=1)
+
+    assert 0 < seen[0] <= 1
+
+
+@pytest.mark.asyncio
+async def test_sync_steps_that_finish_after_timing_out_are_compensated():
+    undone: List[Any] = []
+
+    class SlowInAThread:
+        def execute(self, state):
+            time.sleep(0.5)
+            return state + 1
+
+        def compensate(self, state):
+            undone.append(state)
+
+    with ThreadPoolExecutor() as executor:
+        started = time.monotonic()
+        with pytest.raises(StepTimedOut):
+            await run_transaction(
+                [with_timeout(SlowInAThread(), 0.01)], 0, executor=executor
+            )
+        # The timeout isn't held up by the thread still running the step
+        assert time.monotonic() - started < 0.25
+        assert undone == []
+
+        for _ in range(100):
+            if undone:
+                break
+            await asyncio.sleep(0.02)
+
+    assert undone == [1]
+
+
+@pytest.mark.asyncio
+async def test_compensation_has_its_own_deadline():
+    compensations: List[Any] = []
+
+    class SlowToUndo:
+        def execute(self, state):
+            return state
+
+        async def compensate(self, state):
+            compensations.append(remaining_time())
+            await asyncio.sleep(10)
+
+    with pytest.raises(CompensationFailure) as failure:
+        await run_transaction(
+            [SlowToUndo(), Slow()], 0, timeout=0.05, compensation_timeout=0.05
+        )
+
+    assert 0 < compensations[0] <= 0.05
+    assert isinstance(failure.value.inner_exceptions[0], StepTimedOut)
+    assert isinstance(failure.value.__context__, DeadlineExceeded)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_steps_are_held_to_the_deadline():
+    counter = MockCountingStep()
+
+    with pytest.raises(AsyncStepFailures) as failures:
+        await run_concurrent_transaction([counter, Slow()], 1, timeout=0.05)
+
+    assert isinstance(failures.value.inner_exceptions[0], DeadlineExceeded)
+    assert counter.actions_taken == ["run execute: 1", "run compensate: 2"]
@@ -1,4 +1,6 @@
-from talepy.functional import arity, is_arity_one_pair, partition
+import functools
+
+from talepy.functional import arity, is_arity_one_pair, partition, _arity_by_code
 import pytest
 
 
@@ -33,3 +35,26 @@ def test_partition_splits_a_list():
     even, odd = partition([1, 2, 3, 4], lambda x: (x % 2) == 0)
     assert odd == [1, 3]
     assert even == [2, 4]
+
+
+def test_arity_is_cached_by_code_object():
+    def make_function():
+        return lambda x: x
+
+    first = make_function()
+    second = make_function()
+    assert arity(first) == 1
+    assert _arity_by_code[second.__code__] == 1
+    assert arity(second) == 1
+
+
+def test_wrapped_functions_use_their_real_signature():
+    def one_arg(x):
+        return x
+
+    @functools.wraps(one_arg)
+    def wrapper(*args):
+        return one_arg(*args)
+
+    assert arity(wrapper) == 1
+    assert wrapper.__code__ not in _arity_by_code  # type: ignore
@@ -0,0 +1,124 @@
+import asyncio
+import time
+import typing
+
+import pytest
+
+from talepy.exceptions import (
+    AsyncStepFailures,
+    CompensationFailure,
+    InvalidStepGraph,
+)
+from talepy.graphs import GraphStep, compile_graph, run_graph_transaction
+from talepy.steps import Step
+from tests.mocks import AlwaysFailsStep, AlwaysFailException
+
+
+class RecordingStep(Step):
+    def __init__(self, name: str, log: typing.List[str], delay: float = 0):
+        self.name = name
+        self.log = log
+        self.delay = delay
+
+    async def execute(self, state):
+        await asyncio.sleep(self.delay)
+        self.log.append(f"execute {self.name}")
+        return {**state, self.name: True}
+
+    async def compensate(self, state):
+        await asyncio.sleep(self.delay)
+        self.log.append(f"compensate {self.name}")
+
+
+def booking(log, delay=0.0, email=None):
+    return {
+        "payment": RecordingStep("payment", log),
+        "flight": GraphStep(RecordingStep("flight", log, delay), ["payment"]),
+        "hotel": GraphStep(RecordingStep("hotel", log, delay), ["payment"]),
+        "email": GraphStep(email or RecordingStep("email", log), ["flight", "hotel"]),
+    }
+
+
+@pytest.mark.asyncio
+async def test_steps_receive_their_merged_upstream_state():
+    log: typing.List[str] = []
+    result = await run_graph_transaction(booking(log), starting_state={})
+
+    assert result == {"payment": True, "flight": True, "hotel": True, "email": True}
+    assert log[0] == "execute payment"
+    assert log[-1] == "execute email"
+
+
+@pytest.mark.asyncio
+async def test_independent_branches_run_concurrently():
+    log: typing.List[str] = []
+    started = time.monotonic()
+    await run_graph_transaction(booking(log, delay=0.2), starting_state={})
+
+    # flight and hotel overlap so this is one delay, not two
+    assert time.monotonic() - started < 0.35
+
+
+@pytest.mark.asyncio
+async def test_failures_compensate_in_reverse_dependency_order():
+    log: typing.List[str] = []
+
+    with pytest.raises(AsyncStepFailures) as caught_error:
+        await run_graph_transaction(
+            booking(log, email=AlwaysFailsStep()), starting_state={}
+        )
+
+    assert isinstance(caught_error.value.inner_exceptions[0], AlwaysFailException)
+    compensations = [entry for entry in log if entry.startswith("compensate")]
+    assert sorted(compensations[:2]) == ["compensate flight", "compensate hotel"]
+    assert compensations[2] == "compensate payment"
+
+
+@pytest.mark.asyncio
+async def test_steps_after_a_failure_are_not_started():
+    log: typing.List[str] = []
+    steps: typing.Dict[str, typing.Any] = {
+        "fails": AlwaysFailsStep(),
+        "after": GraphStep(RecordingStep("after", log), ["fails"]),
+    }
+
+    with pytest.raises(AsyncStepFailures):
+        await run_graph_transaction(steps, starting_state={})
+
+    assert log == []
+
+
+@pytest.mark.asyncio
+async def test_compensation_failures_are_reported():
+    def fail(_state):
+        raise Exception("could not undo")
+
+    steps: typing.Dict[str, typing.Any] = {
+        "first": (lambda state: state, fail),
+        "second": GraphStep(AlwaysFailsStep(), ["first"]),
+    }
+
+    with pytest.raises(CompensationFailure):
+        await run_graph_transaction(steps, starting_state={})
+
+
+def test_unknown_dependencies_are_rejected():
+    with pytest.raises(InvalidStepGraph, match="unknown step `missing`"):
+        compile_graph({"a": GraphStep(lambda s: s, ["missing"])})
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(InvalidStepGraph, match="circular"):
+        compile_graph(
+            {
+                "a": GraphStep(lambda s: s, ["b"]),
+                "b": GraphStep(lambda s: s, ["a"]),
+            }
+        )
+
+
+def test_a_compiled_graph_is_ordered_topologically():
+    graph = compile_graph(booking([]))
+
+    assert graph.order[0] == "payment"
+    assert graph.order[-1] == "email"
@@ -0,0 +1,151 @@
+from typing import List
+
+import pytest
+
+from talepy import compile_transaction, run_transaction
+from talepy.async_transactions import (
+    run_transaction as run_transaction_async,
+    run_concurrent_transaction,
+)
+from talepy.exceptions import AsyncStepFailures
+from talepy.hooks import (
+    LifecycleEvent,
+    add_listener,
+    remove_listener,
+    SAGA_STARTED,
+    SAGA_ENDED,
+    EXECUTE_STARTED,
+    EXECUTE_ENDED,
+    RETRY_ATTEMPTED,
+    COMPENSATION_STARTED,
+    COMPENSATION_ENDED,
+)
+from talepy.retries import attempt_retries
+from tests.mocks import (
+    MockCountingStep,
+    MockAsyncExecuteStep,
+    AlwaysFailException,
+    AlwaysFailsStep,
+)
+
+
+@pytest.fixture
+def events():
+    seen: List[LifecycleEvent] = []
+    add_listener(seen.append)
+    yield seen
+    remove_listener(seen.append)
+
+
+def kinds(events):
+    return [(event.kind, event.step_index) for event in events]
+
+
+def test_a_successful_saga_reports_each_step(events):
+    compile_transaction([MockCountingStep(), MockCountingStep()], name="order").run(0)
+
+    assert kinds(events) == [
+        (SAGA_STARTED, None),
+        (EXECUTE_STARTED, 0),
+        (EXECUTE_ENDED, 0),
+        (EXECUTE_STARTED, 1),
+        (EXECUTE_ENDED, 1),
+        (SAGA_ENDED, None),
+    ]
+    assert {event.saga_name for event in events} == {"order"}
+    assert len({event.saga_id for event in events}) == 1
+    timestamps = [event.at for event in events]
+    assert timestamps == sorted(timestamps)
+
+
+def test_a_failing_saga_reports_compensation_and_errors(events):
+    counter = MockCountingStep()
+    with pytest.raises(AlwaysFailException):
+        run_transaction([counter, AlwaysFailsStep()], 0)
+
+    assert kinds(events) == [
+        (SAGA_STARTED, None),
+        (EXECUTE_STARTED, 0),
+        (EXECUTE_ENDED, 0),
+        (EXECUTE_STARTED, 1),
+        (EXECUTE_ENDED, 1),
+        (COMPENSATION_STARTED, 0),
+        (COMPENSATION_ENDED, 0),
+        (SAGA_ENDED, None),
+    ]
+    assert isinstance(events[4].error, AlwaysFailException)
+    assert events[5].step is counter
+    assert isinstance(events[-1].error, AlwaysFailException)
+
+
+def test_retries_are_reported_against_their_saga(events):
+    with pytest.raises(Exception):
+        run_transaction([attempt_retries(AlwaysFailsStep(), 2)], 0)
+
+    retries = [event for event in events if event.kind == RETRY_ATTEMPTED]
+    assert [event.attempt for event in retries] == [2, 3]
+    assert retries[0].saga_id == events[0].saga_id
+
+
+@pytest.mark.asyncio
+async def test_async_sagas_are_reported(events):
+    await run_transaction_async([MockAsyncExecuteStep()], 0)
+
+    assert kinds(events) == [
+        (SAGA_STARTED, None),
+        (EXECUTE_STARTED, 0),
+        (EXECUTE_ENDED, 0),
+        (SAGA_ENDED, None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sagas_are_reported(events):
+    with pytest.raises(AsyncStepFailures):
+        await run_concurrent_transaction([MockCountingStep(), AlwaysFailsStep()], 0)
+
+    assert sorted(kinds(events), key=str) == sorted(
+        [
+            (SAGA_STARTED, None),
+            (EXECUTE_STARTED, 0),
+            (EXECUTE_ENDED, 0),
+            (EXECUTE_STARTED, 1),
+            (EXECUTE_ENDED, 1),
+            (COMPENSATION_STARTED, 0),
+            (COMPENSATION_ENDED, 0),
+            (SAGA_ENDED, None),
+        ],
+        key=str,
+    )
+
+
+def test_removed_listeners_hear_nothing():
+    seen: List[LifecycleEvent] = []
+    add_listener(seen.append)
+    remove_listener(seen.append)
+
+    run_transaction([MockCountingStep()], 0)
+
+    assert seen == []
+
+
+def test_a_failing_listener_cannot_break_the_saga(caplog):
+    def broken(event):
+        if event.kind == EXECUTE_ENDED and event.step_index == 1:
+            raise RuntimeError("metrics backend is down")
+
+    step = MockCountingStep()
+    add_listener(broken)
+    try:
+        with pytest.raises(AlwaysFailException):
+            run_transaction([step, step, AlwaysFailsStep()], 0)
+    finally:
+        remove_listener(broken)
+
+    assert step.actions_taken == [
+        "run execute: 0",
+        "run execute: 1",
+        "run compensate: 2",
+        "run compensate: 1",
+    ]
+    assert "metrics backend is down" in caplog.text
@@ -0,0 +1,163 @@
+import pytest
+
+from talepy import run_transaction
+from talepy.async_transactions import run_transaction as run_async_transaction
+from talepy.exceptions import MissingIdempotencyKey
+from talepy.idempotency import (
+    ResultStore,
+    MemoryResultStore,
+    SqliteResultStore,
+    resume_point,
+)
+from tests.mocks import (
+    MockCountingStep,
+    MockAsyncExecuteAndCompensateStep,
+    AlwaysFailsStep,
+    AlwaysFailException,
+)
+
+
+class FailsOnceStep(MockCountingStep):
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+
+    def execute(self, counter_state):
+        if not self.failed:
+            self.failed = True
+            raise AlwaysFailException()
+        return super().execute(counter_state)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store: ResultStore
+    if request.param == "memory":
+        store = MemoryResultStore()
+    else:
+        store = SqliteResultStore(str(tmp_path / "results.db"))
+    yield store
+    store.close()
+
+
+def test_a_rerun_with_the_same_key_does_not_execute_steps_again(store):
+    steps = [MockCountingStep(), MockCountingStep()]
+
+    assert run_transaction(steps, 0, results=store, idempotency_key="order-1") == 2
+    assert run_transaction(steps, 0, results=store, idempotency_key="order-1") == 2
+
+    assert steps[0].actions_taken == ["run execute: 0"]
+    assert steps[1].actions_taken == ["run execute: 1"]
+
+
+def test_different_keys_run_separately(store):
+    step = MockCountingStep()
+
+    run_transaction([step], 0, results=store, idempotency_key="order-1")
+    run_transaction([step], 10, results=store, idempotency_key="order-2")
+
+    assert step.actions_taken == ["run execute: 0", "run execute: 10"]
+
+
+def test_a_rerun_resumes_at_the_first_incomplete_step(store):
+    first = MockCountingStep()
+    second = MockCountingStep()
+    store.save("order-1", 0, 1)
+
+    assert (
+        run_transaction([first, second], 0, results=store, idempotency_key="order-1")
+        == 2
+    )
+
+    assert first.actions_taken == []
+    assert second.actions_taken == ["run execute: 1"]
+
+
+def test_skipped_steps_are_still_compensated_and_the_results_discarded(store):
+    first = MockCountingStep()
+    store.save("order-1", 0, 1)
+
+    with pytest.raises(AlwaysFailException):
+        run_transaction(
+            [first, AlwaysFailsStep()], 0, results=store, idempotency_key="order-1"
+        )
+
+    assert first.actions_taken == ["run compensate: 1"]
+    assert store.load("order-1") == {}
+
+
+def test_results_after_a_gap_are_not_trusted(store):
+    step = MockCountingStep()
+    store.save("order-1", 1, 100)
+
+    run_transaction([step, step], 0, results=store, idempotency_key="order-1")
+
+    assert step.actions_taken == ["run execute: 0", "run execute: 1"]
+
+
+def test_a_result_store_needs_a_key(store):
+    with pytest.raises(MissingIdempotencyKey):
+        run_transaction([MockCountingStep()], 0, results=store)
+
+
+@pytest.mark.asyncio
+async def test_async_transactions_resume_from_stored_results(store):
+    first = MockAsyncExecuteAndCompensateStep()
+    flaky = FailsOnceStep()
+    last = MockAsyncExecuteAndCompensateStep()
+    steps = [first, flaky, last]
+
+    with pytest.raises(AlwaysFailException):
+        await run_async_transaction(steps, 0, results=store, idempotency_key="k")
+    assert store.load("k") == {}
+
+    store.save("k", 0, 1)
+    assert (
+        await run_async_transaction(steps, 0, results=store, idempotency_key="k") == 3
+    )
+    assert (
+        await run_async_transaction(steps, 0, results=store, idempotency_key="k") == 3
+    )
+
+    assert first.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert flaky.actions_taken == ["run execute: 1"]
+    assert last.actions_taken == ["run execute: 2"]
+
+
+def test_the_memory_store_evicts_the_least_recently_used_key():
+    store = MemoryResultStore(max_keys=2)
+    store.save("a", 0, "a")
+    store.save("b", 0, "b")
+    store.load("a")
+    store.save("c", 0, "c")
+
+    assert store.load("a") == {0: "a"}
+    assert store.load("b") == {}
+    assert store.load("c") == {0: "c"}
+    assert len(store) == 2
+
+
+def test_the_memory_store_forgets_expired_keys(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("talepy.idempotency.time.monotonic", lambda: now[0])
+    store = MemoryResultStore(ttl=60)
+    store.save("a", 0, "a")
+
+    now[0] += 59
+    assert store.load("a") == {0: "a"}
+    now[0] += 2
+    assert store.load("a") == {}
+
+
+def test_sqlite_results_survive_reopening(tmp_path):
+    path = str(tmp_path / "results.db")
+    with SqliteResultStore(path) as store:
+        store.save("a", 0, {"total": 1})
+
+    with SqliteResultStore(path) as store:
+        assert store.load("a") == {0: {"total": 1}}
+
+
+def test_resume_point_is_the_first_missing_step():
+    assert resume_point({}) == 0
+    assert resume_point({0: "a", 1: "b", 3: "d"}) == 2
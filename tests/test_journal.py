@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from talepy import run_transaction
+from talepy.async_transactions import run_transaction as run_async_transaction
+from talepy.exceptions import JournalClosed
+from talepy.journal import (
+    Journal,
+    FileJournal,
+    SqliteJournal,
+    GroupCommitJournal,
+    JournalEvent,
+    STEP_STARTED,
+    STEP_COMPLETED,
+    COMPENSATED,
+    SAGA_FINISHED,
+)
+from tests.mocks import MockCountingStep, AlwaysFailsStep, AlwaysFailException
+
+
+@pytest.fixture(params=["file", "sqlite", "sqlite_in_memory", "group_commit"])
+def journal(request, tmp_path):
+    journal: Journal
+    if request.param == "file":
+        journal = FileJournal(str(tmp_path / "journal.log"))
+    elif request.param == "sqlite":
+        journal = SqliteJournal(str(tmp_path / "journal.db"))
+    elif request.param == "sqlite_in_memory":
+        journal = SqliteJournal(":memory:")
+    else:
+        journal = GroupCommitJournal(
+            FileJournal(str(tmp_path / "journal.log")), max_delay=0.001
+        )
+    yield journal
+    journal.close()
+
+
+def _kinds(journal):
+    return [(event.kind, event.step_index, event.state) for event in journal.read()]
+
+
+def test_a_successful_transaction_is_journaled(journal):
+    run_transaction([MockCountingStep(), MockCountingStep()], 0, journal=journal)
+
+    assert _kinds(journal) == [
+        (STEP_STARTED, 0, None),
+        (STEP_COMPLETED, 0, 1),
+        (STEP_STARTED, 1, None),
+        (STEP_COMPLETED, 1, 2),
+        (SAGA_FINISHED, None, None),
+    ]
+    assert len({event.saga_id for event in journal.read()}) == 1
+
+
+def test_compensations_are_journaled(journal):
+    with pytest.raises(AlwaysFailException):
+        run_transaction(
+            [MockCountingStep(), MockCountingStep(), AlwaysFailsStep()],
+            0,
+            journal=journal,
+        )
+
+    assert _kinds(journal)[-4:] == [
+        (STEP_STARTED, 2, None),
+        (COMPENSATED, 1, None),
+        (COMPENSATED, 0, None),
+        (SAGA_FINISHED, None, None),
+    ]
+
+
+def test_failed_compensations_leave_the_saga_unfinished(journal):
+    def fail(_state):
+        raise Exception("could not undo")
+
+    with pytest.raises(Exception):
+        run_transaction(
+            [(lambda x: x + 1, fail), AlwaysFailsStep()], 0, journal=journal
+        )
+
+    assert SAGA_FINISHED not in [kind for (kind, _i, _s) in _kinds(journal)]
+
+
+@pytest.mark.asyncio
+async def test_async_transactions_are_journaled(journal):
+    with pytest.raises(AlwaysFailException):
+        await run_async_transaction(
+            [MockCountingStep(), AlwaysFailsStep()], 0, journal=journal
+        )
+
+    assert _kinds(journal) == [
+        (STEP_STARTED, 0, None),
+        (STEP_COMPLETED, 0, 1),
+        (STEP_STARTED, 1, None),
+        (COMPENSATED, 0, None),
+        (SAGA_FINISHED, None, None),
+    ]
+
+
+def test_group_commit_batches_writes_from_many_threads(tmp_path):
+    class CountingJournal(FileJournal):
+        writes = 0
+
+        def write(self, events):
+            self.writes += 1
+            super().write(events)
+
+    backend = CountingJournal(str(tmp_path / "journal.log"))
+    journal = GroupCommitJournal(backend, max_delay=0.01)
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        list(
+            pool.map(
+                lambda i: run_transaction([lambda x: x + 1], i, journal=journal),
+                range(100),
+            )
+        )
+    journal.close()
+
+    assert len(list(backend.read())) == 300
+    assert backend.writes < 300
+
+
+def test_a_torn_final_line_is_ignored(tmp_path):
+    path = str(tmp_path / "journal.log")
+    with FileJournal(path) as journal:
+        journal.record(JournalEvent("saga", STEP_STARTED, 0))
+    with open(path, "a") as journal_file:
+        journal_file.write('["saga", "step_compl')
+
+    assert len(list(FileJournal(path).read())) == 1
+
+
+def test_a_torn_final_line_is_cut_off_before_appending(tmp_path):
+    path = str(tmp_path / "journal.log")
+    with FileJournal(path) as journal:
+        journal.record(JournalEvent("saga", STEP_STARTED, 0))
+    with open(path, "a") as journal_file:
+        journal_file.write('["saga", "step_compl')
+
+    with FileJournal(path) as journal:
+        journal.record(JournalEvent("saga", SAGA_FINISHED))
+        kinds = [event.kind for event in journal.read()]
+
+    assert kinds == [STEP_STARTED, SAGA_FINISHED]
+
+
+def test_undecodable_lines_are_skipped(tmp_path):
+    path = str(tmp_path / "journal.log")
+    with open(path, "w") as journal_file:
+        journal_file.write(
+            '["saga", "step_compl["saga", "step_started", 0, null, null]\n'
+        )
+    with FileJournal(path) as journal:
+        journal.record(JournalEvent("saga", SAGA_FINISHED))
+        kinds = [event.kind for event in journal.read()]
+
+    assert kinds == [SAGA_FINISHED]
+
+
+def test_a_closed_group_commit_journal_rejects_events(tmp_path):
+    journal = GroupCommitJournal(FileJournal(str(tmp_path / "journal.log")))
+    journal.close()
+
+    with pytest.raises(JournalClosed):
+        journal.record(JournalEvent("saga", STEP_STARTED, 0))
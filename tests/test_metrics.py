@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from talepy import compile_transaction
+from talepy.hooks import add_listener, remove_listener
+from talepy.metrics import Histogram, MetricsRegistry
+from talepy.retries import attempt_retries
+from tests.mocks import MockCountingStep, AlwaysFailsStep, AlwaysFailException
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    add_listener(registry)
+    yield registry
+    remove_listener(registry)
+
+
+def test_histograms_count_values_into_fixed_buckets():
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.record(value)
+
+    assert histogram.counts == [1, 2, 1]
+    assert histogram.count == 4
+
+
+def test_steps_are_counted_per_saga_and_step_class(registry):
+    plan = compile_transaction([MockCountingStep(), AlwaysFailsStep()], name="order")
+    for _ in range(3):
+        with pytest.raises(AlwaysFailException):
+            plan.run(0)
+
+    snapshot = registry.snapshot()
+    counting = snapshot["steps"][("order", "MockCountingStep")]
+    failing = snapshot["steps"][("order", "AlwaysFailsStep")]
+    assert counting["successes"] == 3
+    assert counting["execute_seconds"]["count"] == 3
+    assert counting["compensate_seconds"]["count"] == 3
+    assert failing["failures"] == 3
+    assert snapshot["sagas"]["order"]["failures"] == 3
+
+
+def test_retries_are_counted_against_the_wrapped_step(registry):
+    plan = compile_transaction([attempt_retries(AlwaysFailsStep(), 2)], name="retry")
+    with pytest.raises(Exception):
+        plan.run(0)
+
+    assert registry.snapshot()["steps"][("retry", "AlwaysFailsStep")]["retries"] == 2
+
+
+def test_metrics_can_be_updated_from_threads_and_the_event_loop(registry):
+    plan = compile_transaction([MockCountingStep()], name="busy")
+
+    def run_many():
+        for _ in range(200):
+            plan.run(0)
+
+    async def run_many_async():
+        await asyncio.gather(*(plan.run_async(0) for _ in range(200)))
+
+    threads = [threading.Thread(target=run_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(run_many_async())
+    for thread in threads:
+        thread.join()
+
+    assert registry.snapshot()["sagas"]["busy"]["successes"] == 1000
+
+
+def test_metrics_export_in_prometheus_text_format(registry):
+    compile_transaction([MockCountingStep()], name='say "hi"').run(0)
+
+    exported = registry.to_prometheus()
+
+    assert "# TYPE talepy_step_execute_seconds histogram" in exported
+    assert (
+        'talepy_step_execute_seconds_count{saga="say \\"hi\\"",step="MockCountingStep"} 1'
+        in exported
+    )
+    assert (
+        'talepy_step_executions_total{saga="say \\"hi\\"",step="MockCountingStep",'
+        'outcome="success"} 1' in exported
+    )
+    assert 'talepy_sagas_total{saga="say \\"hi\\"",outcome="success"} 1' in exported
@@ -0,0 +1,184 @@
+import array
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Set
+
+import pytest
+
+from talepy import run_transaction
+from talepy.async_transactions import run_transaction as run_async_transaction
+from talepy.breakers import CircuitBreaker, with_circuit_breaker
+from talepy.deadlines import with_timeout
+from talepy.exceptions import InvalidStepDefinition
+from talepy.processes import (
+    SharedBuffer,
+    materialize_buffers,
+    process_bound,
+    share_large_buffers,
+)
+from talepy.retries import RetryPolicy, attempt_retries, retry_with_policy
+from tests.mocks import AlwaysFailsStep, AlwaysFailException, MockAsyncExecuteStep
+
+
+class RecordsPid:
+    def execute(self, state):
+        return {**state, "pid": os.getpid(), "size": len(state["document"])}
+
+    def compensate(self, state):
+        with open(state["compensation_log"], "a") as log:
+            log.write(f"{os.getpid()}\n")
+
+
+class SlowlyDoublesBytes:
+    def execute(self, state):
+        time.sleep(0.2)
+        return {"document": state["document"] * 2}
+
+    def compensate(self, state):
+        pass
+
+
+class DoublesBytes:
+    def execute(self, state):
+        return {"document": state["document"] * 2}
+
+    def compensate(self, state):
+        pass
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def test_process_bound_steps_run_in_another_process(pool):
+    result = run_transaction(
+        [process_bound(RecordsPid(), pool)], {"document": b"x" * 10}
+    )
+
+    assert result["pid"] != os.getpid()
+    assert result["size"] == 10
+
+
+def test_large_buffers_round_trip_through_shared_memory(pool):
+    document = bytes(range(256)) * 1024
+    step = process_bound(DoublesBytes(), pool, min_shared_size=1024)
+
+    result = run_transaction([step], {"document": document})
+
+    assert result == {"document": document * 2}
+
+
+def test_process_bound_compensations_run_in_another_process(pool, tmp_path):
+    log = tmp_path / "compensations.log"
+
+    with pytest.raises(AlwaysFailException):
+        run_transaction(
+            [process_bound(RecordsPid(), pool), AlwaysFailsStep()],
+            {"document": b"", "compensation_log": str(log)},
+        )
+
+    assert int(log.read_text()) != os.getpid()
+
+
+@pytest.mark.asyncio
+async def test_process_bound_steps_can_be_awaited(pool):
+    step = process_bound(DoublesBytes(), pool, min_shared_size=1)
+
+    result = await run_async_transaction([step], {"document": b"ab"})
+
+    assert result == {"document": b"abab"}
+
+
+class SlowlyAddsOne:
+    def execute(self, state):
+        time.sleep(0.3)
+        return state + 1
+
+    def compensate(self, state):
+        time.sleep(0.3)
+
+
+async def _longest_stall(saga) -> float:
+    # The longest the event loop went without running anything else
+    longest = 0.0
+    running = asyncio.ensure_future(saga)
+    while not running.done():
+        before = time.monotonic()
+        await asyncio.sleep(0.01)
+        longest = max(longest, time.monotonic() - before)
+    running.exception()
+    return longest
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "wrap",
+    [
+        lambda step: retry_with_policy(step, RetryPolicy(initial_delay=0)),
+        lambda step: with_circuit_breaker(step, CircuitBreaker("slow")),
+        lambda step: with_timeout(attempt_retries(step, 1), 5),
+    ],
+)
+async def test_wrapped_process_bound_steps_dont_block_the_event_loop(pool, wrap):
+    step = wrap(process_bound(SlowlyAddsOne(), pool))
+    # Warm the pool up so starting workers isn't measured
+    await asyncio.wrap_future(pool.submit(time.sleep, 0))
+
+    stall = await _longest_stall(run_async_transaction([step, AlwaysFailsStep()], 0))
+
+    assert stall < 0.2
+
+
+def add_pid(state):
+    return {**state, "pid": os.getpid()}
+
+
+def test_plain_functions_can_be_process_bound(pool):
+    result = run_transaction([process_bound(add_pid, pool)], {})
+
+    assert result["pid"] != os.getpid()
+
+
+def _shared_blocks() -> Set[str]:
+    return set(os.listdir("/dev/shm"))
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+async def test_shared_memory_is_released_when_the_caller_is_cancelled(pool):
+    step = process_bound(SlowlyDoublesBytes(), pool, min_shared_size=1)
+    before = _shared_blocks()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(step.execute_async({"document": b"ab"}), 0.05)
+
+    # Give the worker time to finish and hand back its result
+    await asyncio.sleep(0.5)
+    assert _shared_blocks() == before
+
+
+def test_only_large_buffers_are_shared():
+    created: List[SharedMemory] = []
+    values = array.array("d", [1.5] * 1000)
+    shared = share_large_buffers(
+        {"small": b"x", "large": [bytearray(5000), values]}, 4096, created
+    )
+
+    assert shared["small"] == b"x"
+    assert all(isinstance(buffer, SharedBuffer) for buffer in shared["large"])
+    assert len(created) == 2
+
+    restored = materialize_buffers(shared, unlink=True)
+    assert restored == {"small": b"x", "large": [bytearray(5000), values]}
+    for block in created:
+        block.close()
+
+
+def test_async_steps_cannot_be_process_bound():
+    with pytest.raises(InvalidStepDefinition):
+        process_bound(MockAsyncExecuteStep())
@@ -0,0 +1,125 @@
+import pytest
+
+from talepy import compile_transaction
+from talepy.exceptions import UnknownSaga
+from talepy.journal import FileJournal, SAGA_FINISHED, COMPENSATED
+from talepy.recovery import recover, find_incomplete_sagas
+from tests.mocks import MockCountingStep, MockAsyncExecuteAndCompensateStep
+
+
+class ProcessCrash(BaseException):
+    # Not an Exception so the runner can't compensate - just like a real crash
+    pass
+
+
+def crash(_state):
+    raise ProcessCrash()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = FileJournal(str(tmp_path / "journal.log"))
+    yield journal
+    journal.close()
+
+
+def test_incomplete_sagas_are_compensated_in_reverse_order(journal):
+    step_one = MockCountingStep()
+    step_two = MockCountingStep()
+    plan = compile_transaction([step_one, step_two, crash], name="booking")
+
+    with pytest.raises(ProcessCrash):
+        plan.run(0, journal=journal)
+
+    report = recover(journal, {"booking": plan})
+
+    assert len(report.recovered) == 1
+    assert report.failed == {}
+    assert step_one.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert step_two.actions_taken == ["run execute: 1", "run compensate: 2"]
+
+
+def test_finished_sagas_are_left_alone(journal):
+    step = MockCountingStep()
+    plan = compile_transaction([step])
+    plan.run(0, journal=journal)
+
+    assert recover(journal, plan).recovered == []
+    assert step.actions_taken == ["run execute: 0"]
+
+
+def test_recovery_is_checkpointed_in_the_journal(journal):
+    step = MockCountingStep()
+    plan = compile_transaction([step, crash])
+    with pytest.raises(ProcessCrash):
+        plan.run(0, journal=journal)
+
+    recover(journal, plan)
+    assert recover(journal, plan).recovered == []
+    assert step.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert [event.kind for event in journal.read()][-2:] == [
+        COMPENSATED,
+        SAGA_FINISHED,
+    ]
+
+
+def test_only_the_remaining_compensations_are_run_after_an_interruption(journal):
+    calls = []
+
+    def compensation_that_crashes_once(state):
+        calls.append(state)
+        if len(calls) == 1:
+            raise Exception("downstream unavailable")
+
+    step = MockCountingStep()
+    plan = compile_transaction(
+        [step, (lambda x: x + 10, compensation_that_crashes_once), crash]
+    )
+    with pytest.raises(ProcessCrash):
+        plan.run(0, journal=journal)
+
+    first_attempt = recover(journal, plan)
+    assert list(first_attempt.failed) != []
+    second_attempt = recover(journal, plan)
+
+    assert len(second_attempt.recovered) == 1
+    assert calls == [11, 11]
+    assert step.actions_taken == [
+        "run execute: 0",
+        "run compensate: 1",
+    ]
+
+
+def test_many_sagas_are_recovered_in_parallel(journal):
+    sync_plan = compile_transaction([lambda x: x + 1, crash])
+    for i in range(50):
+        with pytest.raises(ProcessCrash):
+            sync_plan.run(i, journal=journal)
+
+    report = recover(journal, sync_plan, max_workers=4)
+
+    assert len(report.recovered) == 50
+    assert list(find_incomplete_sagas(journal)) == []
+
+
+def test_async_compensations_can_be_recovered(journal):
+    step = MockAsyncExecuteAndCompensateStep()
+    crashing_plan = compile_transaction([lambda x: x + 1, crash])
+    with pytest.raises(ProcessCrash):
+        crashing_plan.run(0, journal=journal)
+
+    report = recover(journal, compile_transaction([step, crash]))
+
+    assert len(report.recovered) == 1
+    assert step.actions_taken == ["run compensate: 1"]
+
+
+def test_sagas_with_no_matching_plan_are_reported(journal):
+    plan = compile_transaction([lambda x: x + 1, crash], name="unknown")
+    with pytest.raises(ProcessCrash):
+        plan.run(0, journal=journal)
+
+    report = recover(journal, {"booking": plan})
+
+    [errors] = report.failed.values()
+    assert isinstance(errors[0], UnknownSaga)
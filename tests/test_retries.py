@@ -1,13 +1,33 @@
+import asyncio
+import sys
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from talepy import run_transaction
-from talepy.exceptions import FailuresAfterRetrying
-from talepy.retries import attempt_retries
+from talepy.async_transactions import (
+    run_transaction as run_async_transaction,
+    run_concurrent_transaction,
+)
+from talepy.exceptions import FailuresAfterRetrying, AsyncStepFailures
+from talepy.retries import (
+    attempt_retries,
+    RetryPolicy,
+    retry_with_policy,
+    StepWithRetries,
+    FailureHistory,
+    DEFAULT_MAX_HISTORY,
+)
+from talepy.steps import Step
 from tests.mocks import (
+    FirstFail,
     MockRetryStep,
     MockRetryStepThatRetriesTwice,
     MockRetryStepThatRetriesTwiceThenGivesUp,
     RegularMockStep,
+    SubsequentFailure,
 )
 
 
@@ -51,3 +71,161 @@ def test_helper_method_runs_the_step_the_expected_number_of_times():
     assert mock_step.actions_taken == ["trying", "trying", "trying"]
 
     assert str(e_info.value) == "Failed to apply step after 3 attempts"
+
+
+class FlakyStep(Step):
+    def __init__(self, failures_before_success: int):
+        self.failures_before_success = failures_before_success
+        self.attempts = 0
+
+    def compensate(self, state):
+        pass
+
+    async def execute(self, state):
+        self.attempts += 1
+        if self.attempts <= self.failures_before_success:
+            raise FirstFail("not yet")
+        return state + 1
+
+
+def test_retry_policy_backs_off_exponentially_without_jitter():
+    policy = RetryPolicy(initial_delay=0.1, backoff=2, max_delay=0.3, jitter=False)
+
+    assert [policy.delay(n) for n in range(1, 5)] == [0.1, 0.2, 0.3, 0.3]
+
+
+def test_retry_policy_jitter_stays_within_the_backoff():
+    policy = RetryPolicy(initial_delay=1, backoff=2, jitter=True)
+
+    assert all(0 <= policy.delay(3) <= 4 for _ in range(100))
+
+
+def test_retry_policy_stops_after_max_elapsed():
+    policy = RetryPolicy(max_attempts=100, max_elapsed=1)
+    started = time.monotonic()
+
+    assert policy.should_retry(1, started, 0.5)
+    assert not policy.should_retry(1, started, 2)
+    assert not policy.should_retry(100, started, 0)
+
+
+def test_a_retry_policy_can_be_used_in_sync_transactions():
+    mock_step = RegularMockStep()
+    policy = RetryPolicy(max_attempts=3, initial_delay=0)
+
+    with pytest.raises(FailuresAfterRetrying) as e_info:
+        run_transaction(steps=[retry_with_policy(mock_step, policy)], starting_state=0)
+
+    assert mock_step.actions_taken == ["trying", "trying", "trying"]
+    assert str(e_info.value) == "Failed to apply step after 3 attempts"
+
+
+@pytest.mark.asyncio
+async def test_a_retry_policy_can_be_used_in_async_transactions():
+    flaky = FlakyStep(failures_before_success=2)
+    policy = RetryPolicy(max_attempts=3, initial_delay=0.001)
+
+    result = await run_async_transaction([retry_with_policy(flaky, policy)], 0)
+
+    assert result == 1
+    assert flaky.attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_async_policies_give_up_after_max_attempts():
+    flaky = FlakyStep(failures_before_success=5)
+    policy = RetryPolicy(max_attempts=2, initial_delay=0.001)
+
+    with pytest.raises(AsyncStepFailures) as e_info:
+        await run_concurrent_transaction([retry_with_policy(flaky, policy)], 0)
+
+    [failure] = e_info.value.inner_exceptions
+    assert isinstance(failure, FailuresAfterRetrying)
+    assert flaky.attempts == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(5)
+async def test_backing_off_does_not_block_other_sagas():
+    # 1000 sagas each backing off for half a second would take minutes if the
+    # backoff blocked the loop.
+    policy = RetryPolicy(max_attempts=2, initial_delay=0.5, jitter=False)
+    sagas = [
+        run_async_transaction([retry_with_policy(FlakyStep(1), policy)], 0)
+        for _ in range(1000)
+    ]
+
+    assert await asyncio.gather(*sagas) == [1] * 1000
+
+
+class RetriesManyTimes(StepWithRetries):
+    def __init__(self, failures_before_success: int):
+        self.failures_before_success = failures_before_success
+        self.kept_failures: typing.List[int] = []
+
+    def compensate(self, state):
+        pass
+
+    def execute(self, state):
+        raise FirstFail("first attempt")
+
+    def retry(self, state, failures):
+        self.kept_failures.append(len(failures))
+        if len(failures) < self.failures_before_success:
+            raise SubsequentFailure("still failing")
+        return state + 1
+
+
+def test_many_retries_do_not_hit_the_recursion_limit():
+    step = RetriesManyTimes(failures_before_success=sys.getrecursionlimit() * 2)
+
+    assert run_transaction(steps=[step], starting_state=0) == 1
+
+
+def test_steps_with_their_own_retry_are_given_every_failure():
+    step = RetriesManyTimes(failures_before_success=DEFAULT_MAX_HISTORY + 8)
+
+    assert run_transaction(steps=[step], starting_state=0) == 1
+    assert max(step.kept_failures) == DEFAULT_MAX_HISTORY + 8
+
+
+@pytest.mark.asyncio
+async def test_async_steps_with_their_own_retry_are_given_every_failure():
+    step = RetriesManyTimes(failures_before_success=DEFAULT_MAX_HISTORY + 8)
+
+    assert await run_async_transaction(step_defs=[step], starting_state=0) == 1
+    assert max(step.kept_failures) == DEFAULT_MAX_HISTORY + 8
+
+
+def test_failure_history_is_bounded_but_counts_everything():
+    history = FailureHistory(max_kept=2)
+    errors = [FirstFail(str(i)) for i in range(5)]
+    for error in errors:
+        history.append(error)
+
+    assert list(history) == errors[-2:]
+    assert history[-1] is errors[-1]
+    assert history.total == 5
+
+
+def test_giving_up_reports_every_attempt_even_if_not_all_are_kept():
+    mock_step = RegularMockStep()
+    policy = RetryPolicy(max_attempts=10, initial_delay=0, max_history=3)
+
+    with pytest.raises(FailuresAfterRetrying) as e_info:
+        run_transaction(steps=[retry_with_policy(mock_step, policy)], starting_state=0)
+
+    assert str(e_info.value) == "Failed to apply step after 10 attempts"
+    assert len(e_info.value.inner_exceptions) == 3
+
+
+def test_a_retrying_step_can_be_shared_between_concurrent_transactions():
+    shared_step = attempt_retries(RegularMockStep(), times=2)
+
+    def run(_):
+        with pytest.raises(FailuresAfterRetrying) as e_info:
+            run_transaction(steps=[shared_step], starting_state=0)
+        return e_info.value.attempts
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert list(pool.map(run, range(50))) == [3] * 50
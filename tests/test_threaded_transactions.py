@@ -0,0 +1,155 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from talepy import run_concurrent_transaction
+from talepy.exceptions import (
+    AsyncStepFailures,
+    AsyncStepUsedInSyncTransaction,
+    InvalidConcurrencyLimit,
+)
+from talepy.retries import attempt_retries
+from talepy.threaded import shared_executor
+from tests.mocks import (
+    MockCountingStep,
+    MockAsyncExecuteStep,
+    AlwaysFailsStep,
+    MockRetryStepThatRetriesTwice,
+)
+
+
+class BlockingStep:
+    # Holds on to a worker until `release` is set
+    def __init__(self, running: list, release: threading.Event):
+        self.running = running
+        self.release = release
+        self.compensated = False
+
+    def execute(self, state):
+        self.running.append(threading.get_ident())
+        self.release.wait(1)
+        return state
+
+    def compensate(self, state):
+        self.compensated = True
+
+
+class Gate:
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=1)
+
+    def execute(self, state):
+        self.barrier.wait()
+        return state
+
+    def compensate(self, state):
+        pass
+
+
+def test_a_transaction_runs_every_step_with_the_starting_state():
+    step_1 = MockCountingStep()
+    step_2 = MockCountingStep()
+
+    results = run_concurrent_transaction([step_1, step_2], starting_state=0)
+
+    assert results == [1, 1]
+    assert step_1.actions_taken == ["run execute: 0"]
+    assert step_2.actions_taken == ["run execute: 0"]
+
+
+def test_steps_run_at_the_same_time():
+    # Every step waits for all the others so this only finishes if they all
+    # run in parallel
+    gate = Gate(4)
+
+    assert run_concurrent_transaction([gate] * 4, starting_state=0) == [0] * 4
+
+
+def test_if_any_step_fails_the_others_are_rolled_back():
+    step_1 = AlwaysFailsStep()
+    step_2 = MockCountingStep()
+    step_3 = MockCountingStep()
+
+    with pytest.raises(AsyncStepFailures) as caught_error:
+        run_concurrent_transaction([step_1, step_2, step_3], starting_state=0)
+
+    assert caught_error.value.inner_exceptions == [step_1.exception]
+    assert step_2.actions_taken == ["run execute: 0", "run compensate: 1"]
+    assert step_3.actions_taken == ["run execute: 0", "run compensate: 1"]
+
+
+def test_async_steps_are_rejected_before_anything_runs():
+    step = MockCountingStep()
+
+    with pytest.raises(AsyncStepUsedInSyncTransaction):
+        run_concurrent_transaction([step, MockAsyncExecuteStep()], starting_state=0)
+
+    assert step.actions_taken == []
+
+
+def test_max_workers_has_to_allow_at_least_one_step():
+    step = MockCountingStep()
+
+    with pytest.raises(InvalidConcurrencyLimit):
+        run_concurrent_transaction([step], starting_state=0, max_workers=0)
+
+    assert step.actions_taken == []
+
+
+def test_retries_can_be_used():
+    step_1 = MockRetryStepThatRetriesTwice()
+    step_2 = MockCountingStep()
+
+    results = run_concurrent_transaction(
+        [step_1, attempt_retries(step_2, times=2)], starting_state=0
+    )
+
+    assert results == [1, 1]
+    assert step_1.actions_taken == [
+        "ran retry on state 0 after 1 failures",
+        "ran retry on state 0 after 2 failures",
+    ]
+
+
+def test_max_workers_limits_how_many_steps_run_at_once():
+    running: list = []
+    release = threading.Event()
+    steps = [BlockingStep(running, release) for _ in range(4)]
+    timer = threading.Timer(0.1, release.set)
+    timer.start()
+
+    run_concurrent_transaction(steps, starting_state=0, max_workers=2)
+
+    assert len(set(running)) <= 2
+    assert len(running) == 4
+
+
+def test_fail_fast_starts_nothing_new_after_a_failure():
+    running: list = []
+    release = threading.Event()
+    release.set()
+    late = BlockingStep(running, release)
+
+    with pytest.raises(AsyncStepFailures):
+        run_concurrent_transaction(
+            [AlwaysFailsStep(), late], starting_state=0, max_workers=1, fail_fast=True
+        )
+
+    assert running == []
+    assert not late.compensated
+
+
+def test_the_calling_thread_works_when_the_pool_is_busy():
+    with ThreadPoolExecutor(max_workers=1) as busy:
+        busy.submit(time.sleep, 0.2)
+        step = MockCountingStep()
+
+        run_concurrent_transaction([step, step], starting_state=0, executor=busy)
+
+    assert step.actions_taken == ["run execute: 0", "run execute: 0"]
+
+
+def test_the_shared_executor_is_reused():
+    assert shared_executor() is shared_executor()